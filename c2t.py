@@ -2,7 +2,8 @@
 """ QEMU CPU Testing Tool """
 
 from sys import (
-    stderr
+    stderr,
+    exit
 )
 from os.path import (
     dirname,
@@ -13,7 +14,9 @@ from os.path import (
 from os import (
     makedirs,
     killpg,
-    setpgrp
+    setpgrp,
+    rename,
+    stat
 )
 from signal import (
     SIGTERM,
@@ -47,6 +50,15 @@ from collections import (
 from struct import (
     pack
 )
+from hashlib import (
+    sha1
+)
+from time import (
+    time
+)
+from multiprocessing.pool import (
+    ThreadPool
+)
 from common import (
     execfile,
     bstr,
@@ -57,7 +69,7 @@ from common import (
 )
 from debug import (
     get_elffile_loading,
-    InMemoryELFFile,
+    MappedELFFile,
     DWARFInfoCache,
     Runtime
 )
@@ -117,7 +129,7 @@ class DebugSession(object):
     def reset(self, srcfile, elffile):
         self.srcfile = srcfile
         self.elffile = elffile
-        self.elf = InMemoryELFFile(elffile)
+        self.elf = MappedELFFile(elffile)
         di = self.elf.get_dwarf_info()
         dic = DWARFInfoCache(di,
             symtab = self.elf.get_section_by_name(".symtab")
@@ -275,11 +287,16 @@ class TargetSession(DebugSession):
 
 
 class ProcessWithErrCatching(Process):
+    """ Runs a shell command. A failure of the command terminates whole
+testing unless `fatal` is `False`. Then the error is only printed and the
+process exit code is set.
+    """
 
-    def __init__(self, command):
+    def __init__(self, command, fatal = True):
         Process.__init__(self)
         self.cmd = command
         self.prog = command.split(' ')[0]
+        self.fatal = fatal
 
     def run(self):
         process = Popen(self.cmd,
@@ -289,7 +306,11 @@ class ProcessWithErrCatching(Process):
         )
         _, err = process.communicate()
         if process.returncode != 0:
-            c2t_exit(err, prog = self.prog)
+            if self.fatal:
+                c2t_exit(err, prog = self.prog)
+            else:
+                print(C2T_ERRMSG_FORMAT.format(prog = self.prog, msg = err))
+                exit(process.returncode)
 
 
 def oracle_tests_run(tests_queue, port_queue, res_queue, is_finish, verbose):
@@ -334,7 +355,7 @@ def oracle_tests_run(tests_queue, port_queue, res_queue, is_finish, verbose):
     res_queue.put(("oracle", None, "TEST_EXIT"))
 
 
-def run_qemu(test_elf, qemu_port, qmp_port, verbose):
+def run_qemu(test_elf, qemu_port, qmp_port, verbose, fatal = True):
     cmd = c2t_cfg.qemu.run_script.format(
         port = qemu_port,
         bin = test_elf,
@@ -348,74 +369,142 @@ def run_qemu(test_elf, qemu_port, qmp_port, verbose):
     if verbose:
         print(cmd)
 
-    qemu = ProcessWithErrCatching(cmd)
+    qemu = ProcessWithErrCatching(cmd, fatal = fatal)
     qemu.daemon = True
     qemu.start()
     return qemu
 
 
+class TargetSessionSlot(object):
+    """ A QEMU instance with a debug session connected to it. A target tests
+runner owns one slot. The slot is started by the first test and then recycled
+between tests: QEMU is reset using QMP and ELF segments of next test are loaded
+by `TargetSession.run`. A user mode QEMU is bound to the program. So, it
+cannot be recycled and it is restarted for each test. A slot whose QEMU has
+exited (e.g. crashed) or whose recycling failed is restarted too.
+    """
+
+    def __init__(self, port_queue, res_queue, reuse, verbose):
+        self.port_queue = port_queue
+        self.res_queue = res_queue
+        self.reuse = reuse and not c2t_cfg.rsp_target.user
+        self.verbose = verbose
+
+        self.qemu = None
+        self.qmp = None
+        self.session = None
+
+    @property
+    def alive(self):
+        return self.qemu is not None and self.qemu.is_alive()
+
+    def acquire(self, test_src, test_elf):
+        "Returns a session prepared for the test."
+        if self.reuse and self.qmp and self.alive:
+            try:
+                self.recycle(test_src, test_elf)
+            except Exception as e:
+                print("Restarting broken target session: %s" % e)
+                self.stop()
+                self.start(test_src, test_elf)
+        else:
+            self.stop()
+            self.start(test_src, test_elf)
+
+        session, qmp = self.session, self.qmp
+
+        if qmp and c2t_cfg.rsp_target.qemu_reset:
+            # TODO: use future 'entry' feature
+            session.rt.target[4] = pack("<I",
+                session.rt.dic.symtab.get_symbol_by_name(
+                    "main"
+                )[0].entry.st_value
+            )
+            qmp("system_reset")
+
+        return session
+
+    def start(self, test_src, test_elf):
+        port_queue = self.port_queue
+
+        qemu_port = port_queue.get(block = True)
+        if (not c2t_cfg.rsp_target.user
+            and (self.reuse or c2t_cfg.rsp_target.qemu_reset)
+        ):
+            qmp_port = port_queue.get(block = True)
+        else:
+            qmp_port = None
+
+        # A crash of a recyclable QEMU must not terminate whole testing.
+        self.qemu = run_qemu(test_elf, qemu_port, qmp_port, self.verbose,
+            fatal = not self.reuse
+        )
+
+        if not wait_for_tcp_port(qemu_port):
+            c2t_exit("qemu malfunction")
+
+        if qmp_port and wait_for_tcp_port(qmp_port):
+            self.qmp = QMP(qmp_port)
+
+        self.session = TargetSession(c2t_cfg.rsp_target.rsp, test_src,
+            str(qemu_port), test_elf, self.res_queue, self.verbose
+        )
+
+    def recycle(self, test_src, test_elf):
+        qmp = self.qmp
+        qmp("stop")
+        qmp("system_reset")
+        self.session.reset(test_src, test_elf)
+
+    def stop(self):
+        session, qemu = self.session, self.qemu
+        self.session = self.qemu = self.qmp = None
+
+        if session is not None:
+            try:
+                if qemu.is_alive():
+                    session.kill()
+                session.port_close()
+            except Exception as e:
+                # e.g. the connection is broken by a failed test
+                print("Error stopping target session: %s" % e)
+
+        if qemu is not None:
+            qemu.join()
+
+
 def target_tests_run(tests_queue, port_queue, res_queue, is_finish, reuse,
     verbose
 ):
-    qemu = None
-    session = None
-    qmp_port = None
-    qmp = None
+    slot = TargetSessionSlot(port_queue, res_queue, reuse, verbose)
+
     while True:
         try:
             test_src, test_elf = tests_queue.get(timeout = 0.1)
         except Empty:
             if is_finish.value:
-                if reuse and qemu and session:
-                    session.kill()
-                    qemu.join()
-                    session.port_close()
+                slot.stop()
                 res_queue.put(("target", None, "TEST_EXIT"))
                 break
             continue
-        else:
-            if reuse and session and qmp:
-                qmp("stop")
-                qmp("system_reset")
-                session.reset(test_src, test_elf)
-            else:
-                qemu_port = port_queue.get(block = True)
-                if (not c2t_cfg.rsp_target.user
-                    and (reuse or c2t_cfg.rsp_target.qemu_reset)
-                ):
-                    qmp_port = port_queue.get(block = True)
-
-                qemu = run_qemu(test_elf, qemu_port, qmp_port, verbose)
-
-                if not wait_for_tcp_port(qemu_port):
-                    c2t_exit("qemu malfunction")
-
-                if qmp_port and wait_for_tcp_port(qmp_port):
-                    qmp = QMP(qmp_port)
-
-                session = TargetSession(c2t_cfg.rsp_target.rsp, test_src,
-                    str(qemu_port), test_elf, res_queue, verbose
-                )
 
-            if qmp and c2t_cfg.rsp_target.qemu_reset:
-                # TODO: use future 'entry' feature
-                session.rt.target[4] = pack("<I",
-                    session.rt.dic.symtab.get_symbol_by_name(
-                        "main"
-                    )[0].entry.st_value
-                )
-                qmp("system_reset")
+        session = slot.acquire(test_src, test_elf)
 
-            res_queue.put((session.session_type, test_src, "TEST_RUN"))
+        res_queue.put((session.session_type, test_src, "TEST_RUN"))
 
+        try:
             session.run()
+        except Exception as e:
+            print("%s: target session failed: %s" % (test_src, e))
+            res_queue.put((session.session_type, test_src, "TEST_FAIL"))
+            # The target state is unknown. Next `acquire` restarts the slot.
+            slot.stop()
+            continue
 
-            res_queue.put((session.session_type, test_src, "TEST_END"))
+        res_queue.put((session.session_type, test_src, "TEST_END"))
 
-            if not reuse:
-                session.kill()
-                qemu.join()
-                session.port_close()
+        if not slot.reuse:
+            slot.stop()
 
 
 class FreePortFinder(Process):
@@ -435,11 +524,25 @@ class FreePortFinder(Process):
             start = free + 1
 
 
+def file_identity(file_name):
+    "Identifies a file by its name, size and modification time."
+    try:
+        st = stat(file_name)
+    except OSError:
+        return file_name
+    return "%s:%u:%u" % (file_name, st.st_size, int(st.st_mtime))
+
+
 class C2TTestBuilder(Process):
-    """ A helper class that builds tests """
+    """ A helper class that builds tests. Up to `jobs` tests are built at once.
+Outputs are cached in subdirectories of `C2T_TEST_BIN_DIR` (and
+`C2T_TEST_IR_DIR`) named by a hash of the test source, the compiler command
+lines and identities of compiler executables. So, only changed tests are
+rebuilt.
+    """
 
     def __init__(self, compiler, tests, tests_tail, tests_queue, is_finish,
-        verbose
+        jobs, verbose
     ):
         super(C2TTestBuilder, self).__init__()
         self.compiler = compiler
@@ -447,8 +550,19 @@ class C2TTestBuilder(Process):
         self.tests_tail = tests_tail
         self.tests_queue = tests_queue
         self.is_finish = is_finish
+        self.jobs = jobs
         self.verbose = verbose
 
+    def test_key(self, test_src):
+        h = sha1()
+        with open(test_src, "rb") as f:
+            h.update(f.read())
+        for run in self.compiler:
+            h.update(bstr(file_identity(run.executable)))
+            h.update(bstr(run.args))
+        h.update(bstr(self.tests_tail))
+        return h.hexdigest()
+
     def test_build(self, test_src, test_ir, test_bin):
         for run_script in self.compiler.run_script:
             cmd = run_script.format(
@@ -460,24 +574,67 @@ class C2TTestBuilder(Process):
             )
             if self.verbose:
                 print(cmd)
-            cmpl_unit = ProcessWithErrCatching(cmd)
-            cmpl_unit.start()
-            cmpl_unit.join()
-
-    def run(self):
-        for test in self.tests:
-            test_name = test[:-2]
-            test_src = join(C2T_TEST_DIR, test)
-            test_bin = join(C2T_TEST_BIN_DIR,
-                test_name + "_%s" % self.tests_tail
+            # The build runs in a thread of the pool, `ProcessWithErrCatching`
+            # is not needed.
+            process = Popen(cmd,
+                shell = True,
+                stdout = PIPE,
+                stderr = PIPE
             )
+            _, err = process.communicate()
+            if process.returncode != 0:
+                c2t_exit(err, prog = cmd.split(' ')[0])
+
+    def build(self, test):
+        """ Builds the test if it's not cached.
+
+    :returns: source and binary file names and build time (`None` if the
+        binary is cached)
+        """
+        test_name = test[:-2]
+        test_src = join(C2T_TEST_DIR, test)
+        key = self.test_key(test_src)
+        test_bin = join(C2T_TEST_BIN_DIR, key,
+            test_name + "_%s" % self.tests_tail
+        )
+
+        if exists(test_bin):
+            return test_src, test_bin, None
 
-            if not exists(test_bin):
-                test_ir = join(C2T_TEST_IR_DIR, test_name)
+        test_ir = join(C2T_TEST_IR_DIR, key, test_name)
 
-                self.test_build(test_src, test_ir, test_bin)
+        for sub_dir in (dirname(test_ir), dirname(test_bin)):
+            if not exists(sub_dir):
+                try:
+                    makedirs(sub_dir)
+                except OSError: # created concurrently
+                    pass
 
-            self.tests_queue.put((test_src, test_bin))
+        # An interrupted build must not leave a binary in the cache.
+        tmp_bin = test_bin + ".tmp"
+
+        t0 = time()
+        self.test_build(test_src, test_ir, tmp_bin)
+        rename(tmp_bin, test_bin)
+        return test_src, test_bin, time() - t0
+
+    def run(self):
+        pool = ThreadPool(self.jobs)
+        try:
+            for test_src, test_bin, build_time in pool.imap_unordered(
+                self.build, self.tests
+            ):
+                if build_time is not None:
+                    print("%s: BUILT (%s) in %.2f sec" % (
+                        test_src, self.tests_tail, build_time
+                    ))
+                elif self.verbose:
+                    print("%s: CACHED (%s)" % (test_src, self.tests_tail))
+
+                self.tests_queue.put((test_src, test_bin))
+        finally:
+            pool.close()
+            pool.join()
         self.is_finish.value = 1
 
 
@@ -488,10 +645,11 @@ def start_cpu_testing(tests, jobs, reuse, verbose):
     is_finish_target = Value('i', 0)
 
     oracle_tb = C2TTestBuilder(c2t_cfg.oracle_compiler, tests,
-        ORACLE_CPU, oracle_tests_queue, is_finish_oracle, verbose
+        ORACLE_CPU, oracle_tests_queue, is_finish_oracle, jobs, verbose
     )
     target_tb = C2TTestBuilder(c2t_cfg.target_compiler, tests,
-        c2t_cfg.rsp_target.march, target_tests_queue, is_finish_target, verbose
+        c2t_cfg.rsp_target.march, target_tests_queue, is_finish_target, jobs,
+        verbose
     )
 
     oracle_tb.start()
@@ -645,7 +803,15 @@ def main():
     )
     parser.add_argument("-r", "--reuse",
         action = "store_true",
-        help = "reuse debug servers after each test (now only QEMU)"
+        default = True,
+        help = ("reuse debug servers after each test (now only system mode "
+            "QEMU); it's the default, the option is kept for compatibility"
+        )
+    )
+    parser.add_argument("-R", "--no-reuse",
+        action = "store_false",
+        dest = "reuse",
+        help = "start new debug servers for each test"
     )
     parser.add_argument("-v", "--verbose",
         action = "store_true",
@@ -140,7 +140,10 @@ comparison report
                 print(MSG_FORMAT.format(msg = "wrong sender"))
                 raise RuntimeError
 
-            if dump == "TEST_EXIT" and cmp_dump == "TEST_EXIT":
+            if dump == "TEST_FAIL" or cmp_dump == "TEST_FAIL":
+                print("%s: FAIL" % test)
+                raise RuntimeError
+            elif dump == "TEST_EXIT" and cmp_dump == "TEST_EXIT":
                 self.end -= 1
             elif dump == "TEST_RUN" and cmp_dump == "TEST_RUN":
                 tests_timings[test] = time()
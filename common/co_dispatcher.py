@@ -6,14 +6,29 @@ __all__ = [
   , "CoReturn"
 # object
   , "CoTask"
+  , "CoWait"
   , "CoDispatcher"
 # function
   , "callco"
+# int
+  , "PRIORITY_BACKGROUND"
+  , "PRIORITY_DEFAULT"
+  , "PRIORITY_GUI"
 ]
 
 from time import (
     sleep
 )
+from collections import (
+    OrderedDict
+)
+from heapq import (
+    heappop,
+    heappush
+)
+from itertools import (
+    count
+)
 from types import (
     GeneratorType
 )
@@ -31,6 +46,17 @@ from traceback import (
 from .os_wrappers import (
     ee
 )
+try:
+    from multiprocessing.connection import (
+        wait as _wait
+    )
+except ImportError: # Py2
+    from select import (
+        select
+    )
+
+    def _wait(object_list, timeout = None):
+        return select(object_list, [], [], timeout)[0]
 
 
 PROFILE_COTASK = ee("QDT_PROFILE_COTASK")
@@ -53,15 +79,31 @@ class CancelledCallee(RuntimeError):
         super(CancelledCallee, self).__init__()
         self.callee = callee
 
+# `CoTask.priority` values used by QDT
+# long work, e.g. QVC building
+PRIORITY_BACKGROUND = -1
+PRIORITY_DEFAULT = 0
+# tasks a user interacts with, e.g. signal delivery
+PRIORITY_GUI = 1
+
 class CoTask(object):
     def __init__(self,
                  generator,
                  enqueued = False,
-                 description = _("Coroutine based task without description")
+                 description = _("Coroutine based task without description"),
+                 priority = PRIORITY_DEFAULT
         ):
         self.generator = generator
         self.enqueued = enqueued
         self.description = description
+        # Tasks with greater priority are activated and given control first.
+        # Use `CoDispatcher.set_priority` to change it for a scheduled task.
+        self.priority = priority
+
+        # Total time (seconds) the task have been given control and number of
+        # iterations. Time spent in callees is not accounted.
+        self.cpu_time = 0.
+        self.iterations = 0
 
         # Contains the exception if task has failed
         self.exception = None
@@ -121,6 +163,122 @@ class CoTask(object):
         # do nothing by default
         pass
 
+class CoWait(object):
+    """ A task yields it to sleep until one of `objects` is ready or
+`timeout` (seconds) is expired. An object is anything suitable for
+`multiprocessing.connection.wait`: a `Connection`, a socket, a file
+descriptor, `Process.sentinel`, etc. The `yield` returns the list of ready
+objects (empty on timeout).
+    """
+
+    def __init__(self, *objects, **kw):
+        self.objects = objects
+        self.timeout = timeout = kw.pop("timeout", None)
+        if kw:
+            raise TypeError("Unexpected arguments: " + ", ".join(kw))
+        if not objects and timeout is None:
+            raise ValueError("Nothing to wait for")
+
+        # set by dispatcher
+        self.deadline = None
+
+
+class TaskQueue(object):
+    """ Priority queue of tasks scheduled for activation. Tasks with same
+priority are kept in order they are pushed in, except ones pushed to the
+front.
+    """
+
+    def __init__(self):
+        self.heap = []
+        # task -> heap entry
+        self.entries = {}
+        self.counter = count(1)
+        self.front_counter = count(-1, -1)
+
+    def push(self, task, front = False):
+        if task in self.entries:
+            self.remove(task)
+
+        seq = next(self.front_counter if front else self.counter)
+        entry = [-task.priority, seq, task]
+        self.entries[task] = entry
+        heappush(self.heap, entry)
+
+    def remove(self, task):
+        # The entry is just marked as removed.
+        self.entries.pop(task)[2] = None
+
+    def pop(self):
+        heap = self.heap
+        while True:
+            task = heappop(heap)[2]
+            if task is not None:
+                del self.entries[task]
+                return task
+
+    def __contains__(self, task):
+        return task in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        return iter(sorted(self.entries, key = lambda t : self.entries[t][:2]))
+
+
+class ActiveTasks(object):
+    "Set of active tasks iterated by priority (greatest first)."
+
+    def __init__(self):
+        # priority -> tasks (ordered by activation)
+        self.levels = {}
+        # sorted in descending order
+        self.priorities = []
+        # task -> priority it's accounted with
+        self.tasks = {}
+
+    def add(self, task):
+        priority = task.priority
+        try:
+            level = self.levels[priority]
+        except KeyError:
+            level = self.levels[priority] = OrderedDict()
+            self.priorities = sorted(self.levels, reverse = True)
+        level[task] = None
+        self.tasks[task] = priority
+
+    def remove(self, task):
+        priority = self.tasks.pop(task)
+        level = self.levels[priority]
+        del level[task]
+        if not level:
+            del self.levels[priority]
+            self.priorities.remove(priority)
+
+    def __contains__(self, task):
+        return task in self.tasks
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def __bool__(self):
+        return bool(self.tasks)
+
+    __nonzero__ = __bool__
+
+    def __iter__(self):
+        levels = self.levels
+        for priority in self.priorities:
+            for task in levels[priority]:
+                yield task
+
+
 class CoDispatcher(object):
     """
     The dispatcher for coroutine task.
@@ -133,6 +291,10 @@ enough the user will not noticed lags.
 until returned one finished. Say, first one _calls_ another.
     - Generator yields False if it has not a work to do right now. For
 instance, if the generator waits for something (except other generator).
+    - Generator yields `CoWait` if it waits for something the dispatcher can
+wait for efficiently (a file descriptor, a process, a timer). Such a task is
+not given control until the thing is ready. The dispatcher sleeps until then
+if there is nothing to do.
     - Generator raise StopIteration when its work is finished. Finished task
 will never be given control. Note that, StopIteration is raised implicitly
 after last statement in the corresponding callable object.
@@ -141,11 +303,14 @@ after last statement in the corresponding callable object.
         -1 = unlimited
         0 = do not activate new tasks
         N = limit number of active tasks
+
+    Tasks with greater `CoTask.priority` are activated and given control
+first. A callee inherits greater priority of its caller.
     """
     def __init__(self, max_tasks = -1):
-        self.tasks = []
-        self.active_tasks = []
-        # Contains caller list per each callee.
+        self.tasks = TaskQueue()
+        self.active_tasks = ActiveTasks()
+        # Contains callers per each callee (`OrderedDict` used as ordered set).
         self.callees = {}
         # Total caller list, I.e. callers = U (callees.values()).
         self.callers = {}
@@ -153,15 +318,24 @@ after last statement in the corresponding callable object.
         self.failed_tasks = set()
         self.max_tasks = max_tasks
         self.gen2task = {}
+        # task -> `CoWait`
+        self.waiting = {}
 
     # poll returns True if at least one task is ready to proceed immediately.
     def poll(self):
         finished = []
         calls = []
+        waits = []
 
         ready = False
 
-        for task in self.active_tasks:
+        active_tasks = self.active_tasks
+
+        # A task may leave the set during the loop.
+        for task in list(active_tasks):
+            if task not in active_tasks:
+                continue
+
             generator = task.generator
             # If the generator is not started yet then just after it yields
             # a reference to its `gi_frame` must be preserved.
@@ -233,10 +407,15 @@ after last statement in the corresponding callable object.
                     # remember the call
                     calls.append((task, ret))
                     ready = True
+                elif isinstance(ret, CoWait):
+                    waits.append((task, ret))
                 elif ret:
                     ready = True
 
             ti = t1 - t0
+            task.cpu_time += ti
+            task.iterations += 1
+
             if PROFILE_COTASK and ti > 0.05:
                 sys.stderr.write("Task %s consumed %f sec during iteration "
                     # file:line is the line reference format supported by
@@ -249,6 +428,12 @@ after last statement in the corresponding callable object.
 
             task.lineno = lineno
 
+        for task, wait in waits:
+            if wait.timeout is not None:
+                wait.deadline = time() + wait.timeout
+            self.active_tasks.remove(task)
+            self.waiting[task] = wait
+
         for task, co_ret in finished:
             self.__finish__(task)
 
@@ -261,8 +446,10 @@ after last statement in the corresponding callable object.
             # All callers of finished task may continue execution.
             for caller in callers:
                 del self.callers[caller]
-                self.tasks.insert(0, caller)
+                self.tasks.push(caller, front = True)
                 caller._co_ret = co_ret
+            # So, there is no reason to wait.
+            ready = True
 
         for caller, callee in calls:
             # Cast callee to CoTask
@@ -286,10 +473,13 @@ after last statement in the corresponding callable object.
 
             # A task may call the task which is already called by other task.
             # So, remember all callers of the callee.
+            if callee.priority < caller.priority:
+                self.set_priority(callee, caller.priority)
+
             try:
                 callers = self.callees[callee]
             except KeyError:
-                self.callees[callee] = [caller]
+                self.callees[callee] = OrderedDict([(caller, None)])
                 # First call of the callee.
                 # If callee is not a caller too then it should replace its
                 # caller. Except the callee is not a new task. Because it
@@ -300,7 +490,7 @@ after last statement in the corresponding callable object.
             else:
                 # The callee is called multiple times. Hence, it is already
                 # queued. Just account its new caller.
-                callers.append(caller)
+                callers[caller] = None
 
             # Caller cannot continue execution until callee finished.
             self.active_tasks.remove(caller)
@@ -309,6 +499,76 @@ after last statement in the corresponding callable object.
 
         return ready
 
+    def check_waiting(self, timeout = 0):
+        """ Wakes up waiting tasks whose objects are ready or whose timeouts
+are expired. If there is no such tasks, it blocks for `timeout` seconds at
+most (`None` means until a task can be woken up).
+
+:returns: if a task has been woken up.
+        """
+        waiting = self.waiting
+        if not waiting:
+            if timeout:
+                sleep(timeout)
+            return False
+
+        objects = set()
+        deadline = None
+        for wait in waiting.values():
+            objects.update(wait.objects)
+            if wait.deadline is not None:
+                if deadline is None or wait.deadline < deadline:
+                    deadline = wait.deadline
+
+        if deadline is not None:
+            left = max(0., deadline - time())
+            if timeout is None or left < timeout:
+                timeout = left
+
+        if objects:
+            ready_objects = set(_wait(list(objects), timeout))
+        else:
+            if timeout:
+                sleep(timeout)
+            ready_objects = set()
+
+        now = time()
+        woken = False
+
+        for task, wait in list(waiting.items()):
+            ready = list(o for o in wait.objects if o in ready_objects)
+            if not ready and (wait.deadline is None or wait.deadline > now):
+                continue
+
+            del waiting[task]
+            task._co_ret = ready
+            self.tasks.push(task, front = True)
+            woken = True
+
+        return woken
+
+    def set_priority(self, task, priority):
+        if not isinstance(task, CoTask):
+            task = self.gen2task[task]
+
+        if task.priority == priority:
+            return
+
+        if task in self.active_tasks:
+            self.active_tasks.remove(task)
+            task.priority = priority
+            self.active_tasks.add(task)
+        elif task in self.tasks:
+            task.priority = priority
+            self.tasks.push(task)
+        else:
+            task.priority = priority
+
+        # The priority is inherited by callees.
+        callee = self.callers.get(task, None)
+        if callee is not None and callee.priority < priority:
+            self.set_priority(callee, priority)
+
     def remove(self, task):
         if not isinstance(task, CoTask):
             task = self.gen2task[task]
@@ -332,7 +592,7 @@ after last statement in the corresponding callable object.
                     # originally called. So, it must be removed as useless.
                     self.remove(callee)
             else:
-                callers.remove(task)
+                del callers[task]
 
         elif task in self.finished_tasks:
             self.finished_tasks.remove(task)
@@ -340,10 +600,20 @@ after last statement in the corresponding callable object.
             self.tasks.remove(task)
         elif task in self.active_tasks:
             self.active_tasks.remove(task)
+        elif task in self.waiting:
+            del self.waiting[task]
         elif task in self.failed_tasks:
             self.failed_tasks.remove(task)
 
         del self.gen2task[task.generator]
+
+        # Give the generator a chance to release resources (`finally` and
+        # `with` blocks).
+        try:
+            task.generator.close()
+        except (ValueError, RuntimeError):
+            # The task removes itself or ignores `GeneratorExit`.
+            pass
         # print 'Task %s was removed' % str(task)
 
     def enqueue(self, task):
@@ -358,7 +628,7 @@ after last statement in the corresponding callable object.
         task.enqueued = True
         self.gen2task[task.generator] = task
 
-        self.tasks.append(task)
+        self.tasks.push(task)
         # print 'Task %s was enqueued' % str(task)
 
     def __inject_into_callers(self, tasks, exception):
@@ -367,7 +637,7 @@ after last statement in the corresponding callable object.
             # Wake the caller up giving it a chance to catch the exception
             # around current `yield`.
             del self.callers[c]
-            self.tasks.insert(0, c)
+            self.tasks.push(c, front = True)
 
     def __failed__(self, task, exception):
         task.exception = exception
@@ -394,7 +664,7 @@ after last statement in the corresponding callable object.
 
     def __activate__(self, task):
         # print 'Activating task %s' % str(task)
-        self.active_tasks.append(task)
+        self.active_tasks.add(task)
         task.on_activated()
 
     def pull(self):
@@ -406,19 +676,22 @@ after last statement in the corresponding callable object.
             added = bool(self.tasks)
             if added:
                 while self.tasks:
-                    task = self.tasks.pop(0)
+                    task = self.tasks.pop()
                     self.__activate__(task)
         else:
             rest = self.max_tasks - len(self.active_tasks)
             while rest > 0 and self.tasks:
                 rest = rest - 1
-                task = self.tasks.pop(0)
+                task = self.tasks.pop()
                 self.__activate__(task)
                 added = True
 
         return added
 
     def iteration(self):
+        if self.waiting:
+            self.check_waiting()
+
         if self.pull() or self.active_tasks:
             ready = self.poll()
         else:
@@ -427,7 +700,7 @@ after last statement in the corresponding callable object.
         return ready
 
     def has_work(self):
-        return self.tasks or self.active_tasks
+        return self.tasks or self.active_tasks or self.waiting
 
     def dispatch_all(self, delay = 0.01):
         has_work, iteration = self.has_work, self.iteration
@@ -435,11 +708,17 @@ after last statement in the corresponding callable object.
         if delay is None:
             # No delay mode
             while has_work():
-                iteration()
+                if not iteration() and not (self.tasks or self.active_tasks):
+                    # all tasks are waiting
+                    self.check_waiting(None)
         else:
             while has_work():
                 if not iteration():
-                    sleep(delay)
+                    if self.tasks or self.active_tasks:
+                        # Some tasks are polling something by `yield False`.
+                        self.check_waiting(delay)
+                    else:
+                        self.check_waiting(None)
 
 
 class default: pass
@@ -453,7 +732,8 @@ class CLICoDispatcher(CoDispatcher):
 def callco(co, delay = default):
     """ Call `co`routine. See `CoDispatcher` for coroutine protocol.
 
-:param delay: time to wait if a coroutine `yield`ed `False`.
+:param delay: time to wait if a coroutine `yield`ed `False`. A coroutine
+    waiting for `CoWait` is woken up without that delay.
 
     """
     disp = CLICoDispatcher()
@@ -1,17 +1,26 @@
 __all__ = [
     "co_process"
+  , "CoProcessPool"
   , "FunctionFailure"
 ]
 
 from multiprocessing import (
+    cpu_count,
     Pipe,
     Process
 )
 from sys import (
     exc_info
 )
+from collections import (
+    deque
+)
+from traceback import (
+    format_exc
+)
 from .co_dispatcher import (
-    CoReturn
+    CoReturn,
+    CoWait
 )
 
 
@@ -29,17 +38,28 @@ the call.
         args = (out, function, a, kw)
     )
     proc.start()
-    while proc.is_alive():
-        yield False
+    # Only the child writes to the pipe. When the child ends (even without a
+    # result), the pipe becomes ready to read.
+    out.close()
+
+    yield CoWait(in_)
+
+    try:
+        result = in_.recv()
+    except EOFError:
+        result = None
+    in_.close()
+
+    proc.join()
 
-    if proc.exitcode:
+    if proc.exitcode or result is None:
         raise RuntimeError(
             "process with function %s has ended with return code %s" % (
                 function, proc.exitcode
             )
         )
 
-    kind, payload = in_.recv()
+    kind, payload = result
     if kind == 0: # normal return
         raise CoReturn(payload)
     else: # 1 the function failed
@@ -53,3 +73,171 @@ def caller(feedback, function, a, kw):
         feedback.send((1, exc_info()))
     else:
         feedback.send((0, ret))
+
+
+class PoolWorker(object):
+
+    def __init__(self):
+        self.conn, child_conn = Pipe()
+        self.process = Process(
+            target = pool_worker,
+            args = (child_conn,)
+        )
+        self.process.daemon = True
+        self.process.start()
+        child_conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (IOError, OSError):
+            pass
+        self.conn.close()
+        self.process.join()
+
+    def kill(self):
+        self.process.terminate()
+        self.conn.close()
+        self.process.join()
+
+
+class PoolJob(object):
+
+    def __init__(self, call):
+        self.call = call
+        self.worker = None
+        # an exception raised during job submission
+        self.error = None
+
+
+class CoProcessPool(object):
+    """ Calls functions in a bounded number of long-lived worker processes.
+Calls exceeding the number are queued.
+    """
+
+    def __init__(self, processes = None):
+        self.processes = processes or cpu_count()
+        self.workers = set()
+        self.idle = []
+        self.pending = deque()
+
+        # The pool signals queued calls using the pipe when jobs are given
+        # to workers.
+        self.bell_in, self.bell_out = Pipe(False)
+        self.bell_rung = False
+
+    def co_call(self, function, *a, **kw):
+        """ Like `co_process` but uses a worker of the pool. If the coroutine
+is closed (e.g. removed from a dispatcher), the call is cancelled. A worker
+which is running the call is killed then.
+        """
+        job = PoolJob((function, a, kw))
+        self.pending.append(job)
+        self._schedule()
+
+        result = None
+        try:
+            while job.worker is None and job.error is None:
+                yield CoWait(self.bell_in)
+                self._silence_bell()
+
+            if job.error is not None:
+                raise job.error
+
+            conn = job.worker.conn
+
+            yield CoWait(conn)
+
+            try:
+                result = conn.recv()
+            except EOFError:
+                pass
+        finally:
+            worker = job.worker
+            if worker is None:
+                # cancelled or failed before submission
+                if job in self.pending:
+                    self.pending.remove(job)
+            elif result is None:
+                # cancelled or the worker has died
+                self.workers.discard(worker)
+                worker.kill()
+            else:
+                self.idle.append(worker)
+
+            self._schedule()
+
+        if result is None:
+            raise RuntimeError(
+                "worker process with function %s has ended with return code"
+                " %s" % (function, worker.process.exitcode)
+            )
+
+        kind, payload = result
+        if kind == 0: # normal return
+            raise CoReturn(payload)
+        else: # 1 the function failed
+            raise FunctionFailure(*payload)
+
+    def _schedule(self):
+        "Gives pending jobs to idle or new workers."
+        pending, idle = self.pending, self.idle
+        given = False
+
+        while pending:
+            if idle:
+                worker = idle.pop()
+            elif len(self.workers) < self.processes:
+                worker = PoolWorker()
+                self.workers.add(worker)
+            else:
+                break
+
+            job = pending.popleft()
+            try:
+                worker.conn.send(job.call)
+            except Exception as e:
+                # Nothing is sent if the call cannot be pickled.
+                idle.append(worker)
+                job.error = e
+            else:
+                job.worker = worker
+
+            given = True
+
+        if given and not self.bell_rung:
+            self.bell_out.send_bytes(b"\0")
+            self.bell_rung = True
+
+    def _silence_bell(self):
+        if self.bell_rung:
+            self.bell_in.recv_bytes()
+            self.bell_rung = False
+
+    def close(self):
+        "Stops idle workers. The pool must not be used after."
+        for worker in self.idle:
+            self.workers.discard(worker)
+            worker.stop()
+        del self.idle[:]
+
+
+def pool_worker(conn):
+    while True:
+        try:
+            call = conn.recv()
+        except EOFError:
+            break
+
+        if call is None:
+            break
+
+        function, a, kw = call
+        try:
+            ret = function(*a, **kw)
+        except:
+            # Traceback cannot be pickled.
+            t, v, __ = exc_info()
+            conn.send((1, (t, v, format_exc())))
+        else:
+            conn.send((0, ret))
@@ -6,6 +6,7 @@ __all__ = [
 ]
 
 from .co_dispatcher import (
+    PRIORITY_GUI,
     CoTask
 )
 from .ml import (
@@ -33,7 +34,8 @@ class SignalDispatcherTask(CoTask):
         CoTask.__init__(
             self,
             self.co_deliver(),
-            description = _("Signal Dispatcher")
+            description = _("Signal Dispatcher"),
+            priority = PRIORITY_GUI
         )
         self.queue = []
 
@@ -1,26 +1,51 @@
 __all__ = [
     "GGB_IBY"
-  , "CommitDesc"
+  , "GitGraph"
+  , "git_graph_tips"
+  , "co_git_graph"
   , "iter_chunks"
   , "git_diff2delta_intervals"
   , "fast_repo_clone"
+  , "git_export_paths"
   , "git_find_commit"
 ]
 
+from array import (
+    array
+)
+from binascii import (
+    hexlify,
+    unhexlify
+)
 from collections import (
     namedtuple
 )
+import sys
 from re import (
     compile
 )
 from .intervalmap import (
     intervalmap
 )
+from .co_dispatcher import (
+    CoReturn
+)
+from .packed_file import (
+    PackedFormatError,
+    PackedReader,
+    PackedWriter
+)
 from tempfile import (
     mkdtemp
 )
+from os import (
+    makedirs,
+    symlink
+)
 from os.path import (
+    dirname,
     exists,
+    isfile,
     join
 )
 from git import (
@@ -32,6 +57,22 @@ from git import (
 # Iterations Between Yields of Git Graph Building task
 GGB_IBY = 100
 
+GG_MAGIC = b"QDTGG"
+# Increase it manually if the layout below is changed.
+GG_FORMAT_VERSION = 1
+
+# SHA1 of commits (20 bytes each)
+GG_SHAS = b"SHAS"
+# offsets of parents of commits (uint32 array)
+GG_PFST = b"PFST"
+# parent indices (uint32 array)
+GG_PARS = b"PARS"
+# SHA1 of references the graph is built for
+GG_TIPS = b"TIPS"
+
+# `array` type code for 32-bit unsigned integers
+U32 = "I" if array("I").itemsize == 4 else "L"
+
 # Unified Diff Format:
 # https://www.artima.com/weblogs/viewpost.jsp?thread=164293
 Range = namedtuple("Range", "lineno count")
@@ -96,99 +137,171 @@ def git_diff2delta_intervals(diff):
     return intervals
 
 
-class CommitDesc(object):
+class GitGraph(object):
+    """ Compact commit graph. A commit is identified by an index which is
+its serial number according to the topological sorting. I.e. parents always
+have lesser indices than children. Parents and children of commits are kept
+in flat arrays of indices.
+    """
 
-    def __init__(self, sha, parents, children):
-        self.sha = sha
+    def __init__(self, shas, parents_first, parents, tips):
+        """
+:param shas: SHA1 of commits in topological order.
+:param parents_first: `parents_first[i]` is offset of parents of `i`-th
+    commit in `parents`. There is extra element at the end.
+:param parents: `array` of parent indices.
+:param tips: SHA1 of references, see `git_graph_tips`.
+        """
+        self.shas = shas
+        self.index = dict((sha, i) for i, sha in enumerate(shas))
+        self.parents_first = parents_first
         self.parents = parents
-        self.children = children
+        self.tips = tips
+
+        n = len(shas)
+
+        # children arrays are built from parent arrays
+        counts = array(U32, [0]) * (n + 1)
+        for p in parents:
+            counts[p + 1] += 1
+
+        self.children_first = children_first = array(U32, [0]) * (n + 1)
+        for i in range(n):
+            children_first[i + 1] = children_first[i] + counts[i + 1]
+
+        fill = array(U32, children_first)
+        self.children = children = array(U32, [0]) * len(parents)
+        for i in range(n):
+            for p in parents[parents_first[i]:parents_first[i + 1]]:
+                children[fill[p]] = i
+                fill[p] += 1
+
+    def __len__(self):
+        return len(self.shas)
 
-        # serial number according to the topological sorting
-        self.num = None
+    def parents_of(self, i):
+        return self.parents[self.parents_first[i]:self.parents_first[i + 1]]
+
+    def children_of(self, i):
+        return self.children[self.children_first[i]:self.children_first[i + 1]]
 
     @classmethod
-    def co_build_git_graph(klass, repo, commit_desc_nodes):
+    def co_build(klass, repo, revs = ()):
+        """ Builds graph of all commits reachable from references and `revs`
+using single `git rev-list` invocation.
+        """
+        tips = git_graph_tips(repo)
+
         # iterations to yield
         i2y = GGB_IBY
 
-        # n is serial number according to the topology sorting
-        n = 0
-        # to_enum is used during topological sorting
-        # it contains commit to enumerate
-        to_enum = None
-        # build_stack contains edges represented by tuples
-        # (parent, child), where parent is instance of
-        # git.Commit, child is instance of QemuCommitDesc
-        build_stack = []
-        for head in repo.references:
-            # skip processed heads
-            if head.commit.hexsha in commit_desc_nodes:
-                continue
+        # children are listed before parents
+        commits = []
+        proc = repo.git.rev_list("--parents", "--topo-order", "--all",
+            *revs, as_process = True
+        )
+        for line in proc.stdout:
+            commits.append(line.split())
+
+            if i2y <= 0:
+                yield True
+                i2y = GGB_IBY
+            else:
+                i2y -= 1
+        proc.wait()
+
+        commits.reverse()
+
+        shas = list(c[0].decode("ascii") for c in commits)
+        index = dict((sha, i) for i, sha in enumerate(shas))
+
+        parents_first = array(U32, [0])
+        parents = array(U32)
+        for c in commits:
+            parents.extend(index[p.decode("ascii")] for p in c[1:])
+            parents_first.append(len(parents))
+
+        raise CoReturn(klass(shas, parents_first, parents, tips))
+
+    def save(self, file_name):
+        w = PackedWriter(GG_MAGIC, GG_FORMAT_VERSION)
+        w.section(GG_SHAS, b"".join(unhexlify(sha) for sha in self.shas))
+        w.section(GG_PFST, _pack_u32(self.parents_first))
+        w.section(GG_PARS, _pack_u32(self.parents))
+        w.value(GG_TIPS, self.tips)
+        w.write(file_name)
+
+    @classmethod
+    def load(klass, file_name):
+        r = PackedReader(file_name, GG_MAGIC, GG_FORMAT_VERSION)
+        try:
+            raw_shas = r.raw(GG_SHAS)
+            shas = list(hexlify(raw_shas[i:i + 20]).decode("ascii")
+                for i in range(0, len(raw_shas), 20)
+            )
+            return klass(shas,
+                _unpack_u32(r.raw(GG_PFST)),
+                _unpack_u32(r.raw(GG_PARS)),
+                r.value(GG_TIPS)
+            )
+        finally:
+            r.close()
 
-            head_desc = klass(head.commit.hexsha, [], [])
-            commit_desc_nodes[head.commit.hexsha] = head_desc
-            # add edges connected to head being processed
-            for p in head.commit.parents:
-                build_stack.append((p, head_desc))
-
-            while build_stack:
-                parent, child_commit_desc = build_stack.pop()
-
-                try:
-                    parent_desc = commit_desc_nodes[parent.hexsha]
-                except KeyError:
-                    parent_desc = klass(parent.hexsha, [], [])
-                    commit_desc_nodes[parent.hexsha] = parent_desc
-
-                    if parent.parents:
-                        for p in parent.parents:
-                            build_stack.append((p, parent_desc))
-                    else:
-                        # current edge parent is an elder commit in the tree,
-                        # that is why we should enumerate starting from it
-                        to_enum = parent_desc
-                else:
-                    # the existence of parent_desc means that parent has been
-                    # enumerated before. Hence, we starts enumeration from
-                    # it's child
-                    to_enum = child_commit_desc
-                finally:
-                    parent_desc.children.append(child_commit_desc)
-                    child_commit_desc.parents.append(parent_desc)
-
-                if i2y <= 0:
-                    yield True
-                    i2y = GGB_IBY
-                else:
-                    i2y -= 1
-
-                # numbering is performed from the 'to_enum' to either a leaf
-                # commit or a commit just before a merge which have at least
-                # one parent without number (except the commit)
-                while to_enum is not None:
-                    e = to_enum
-                    to_enum = None
-                    # if the number of parents in the commit_desc_nodes
-                    # is equal to the number of parents in the repo,
-                    # then all parents were numbered (added) earlier
-                    # according to the graph building algorithm,
-                    # else we cannot assign number to the commit yet
-                    if len(e.parents) == len(repo.commit(e.sha).parents):
-                        e.num = n
-                        n = n + 1
-                        # according to the algorithm, only one child
-                        # have no number. Other children either have
-                        # been enumerated already or are not added yet
-                        for c in e.children:
-                            if c.num is None:
-                                to_enum = c
-                                break
-
-                    if i2y <= 0:
-                        yield True
-                        i2y = GGB_IBY
-                    else:
-                        i2y -= 1
+
+def _pack_u32(values):
+    a = array(U32, values)
+    if sys.byteorder == "big":
+        a.byteswap()
+    try:
+        return a.tobytes()
+    except AttributeError: # Py2
+        return a.tostring()
+
+
+def _unpack_u32(data):
+    a = array(U32)
+    try:
+        a.frombytes(data)
+    except AttributeError: # Py2
+        a.fromstring(data)
+    if sys.byteorder == "big":
+        a.byteswap()
+    return a
+
+
+def git_graph_tips(repo):
+    "SHA1 of all references. A persisted `GitGraph` is valid while they are."
+    return sorted(repo.git.rev_parse("--all").split())
+
+
+def co_git_graph(repo, file_name, version = None):
+    """ Loads `GitGraph` of `repo` from `file_name` or builds it (and saves
+to that file) if references have been changed since. The coroutine returns
+the graph.
+
+:param version: a commit required to be in the graph.
+    """
+    graph = None
+
+    if isfile(file_name):
+        try:
+            graph = GitGraph.load(file_name)
+        except PackedFormatError as e:
+            print("Cannot load Git graph from %s: %s" % (file_name, e))
+        else:
+            if graph.tips != git_graph_tips(repo) or (
+                version is not None and version not in graph.index
+            ):
+                graph = None
+
+    yield True
+
+    if graph is None:
+        revs = () if version is None else (version,)
+        graph = yield GitGraph.co_build(repo, revs = revs)
+        graph.save(file_name)
+
+    raise CoReturn(graph)
 
 
 def fast_repo_clone(repo, version = None, prefix = "repo"):
@@ -233,6 +346,46 @@ as fast as possible. A clone is neither honest nor independent, so be careful.
 
     return new_repo
 
+def git_export_paths(repo, version, paths, prefix = "repo"):
+    """ Writes files at `paths` (directories inside the repository) of
+`version` to a temporal directory. Files are read from the object database
+directly. There is neither cloning nor checking out. Submodules are skipped.
+Returns the directory.
+
+Note that files are still written to the disk intentionally. The directory is
+given to PLY preprocessor. It resolves inclusions by reading files from its
+search paths and has no hook for a virtual file system.
+    """
+    commit = git_find_commit(repo, version)
+    tree = commit.tree
+
+    tmp_dir = mkdtemp(prefix = "%s-%s-" % (prefix, commit.hexsha))
+
+    for path in paths:
+        try:
+            sub_tree = tree[path]
+        except KeyError:
+            continue
+
+        for item in sub_tree.traverse():
+            if item.type != "blob":
+                continue
+
+            file_name = join(tmp_dir, *item.path.split("/"))
+            file_dir = dirname(file_name)
+            if not exists(file_dir):
+                makedirs(file_dir)
+
+            data = item.data_stream.read()
+            if item.mode == item.link_mode:
+                symlink(data.decode("utf-8"), file_name)
+            else:
+                with open(file_name, "wb") as f:
+                    f.write(data)
+
+    return tmp_dir
+
+
 def init_submodules_from_cache(repo, cache_dir):
     git = repo.git
 
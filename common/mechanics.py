@@ -1,11 +1,16 @@
 from math import (
-    sqrt
+    sqrt,
+    floor
+)
+from collections import (
+    defaultdict
 )
 
 __all__ = [
     "PhObject"
       , "PhBox"
       , "PhCircle"
+  , "PhSpatialHash"
   , "find_empty_aabb"
 ]
 
@@ -134,6 +139,95 @@ class PhCircle(PhObject):
         return True
 
 
+class PhSpatialHash(object):
+    """ Broad phase of collision detection. It's a uniform grid of square
+    cells. An object is registered in each cell its AABB (expanded by the
+    spacing, if `spaced`) intersects. Objects those do not share a cell cannot
+    collide. The grid is updated by `sync`, only moved objects are
+    re-registered. """
+
+    def __init__(self, cell_size = 128, spaced = True):
+        self.cell_size = cell_size
+        self.spaced = spaced
+        # (column, row) -> set of objects
+        self.cells = defaultdict(set)
+        # object -> (first column, first row, last column, last row)
+        self.ranges = {}
+        # object -> its index in the sequence given to last `sync`
+        self.order = {}
+
+    def cell_range(self, x0, y0, x1, y1):
+        cs = float(self.cell_size)
+        return (
+            int(floor(x0 / cs)), int(floor(y0 / cs)),
+            int(floor(x1 / cs)), int(floor(y1 / cs))
+        )
+
+    def object_range(self, o):
+        s = o.spacing if self.spaced else 0
+        x, y = o.x, o.y
+        return self.cell_range(x - s, y - s, x + o.width + s, y + o.height + s)
+
+    def sync(self, objs):
+        """ Makes the grid to contain exactly `objs` at their current
+        positions. The order of `objs` defines the order of objects returned
+        by `query`. """
+        ranges = self.ranges
+        order = {}
+
+        for i, o in enumerate(objs):
+            order[o] = i
+            r = self.object_range(o)
+            prev = ranges.get(o)
+            if prev == r:
+                continue
+            if prev is not None:
+                self._discard(o, prev)
+            self._add(o, r)
+
+        for o in [o for o in ranges if o not in order]:
+            self._discard(o, ranges.pop(o))
+
+        self.order = order
+
+    def _add(self, o, r):
+        cells = self.cells
+        c0, r0, c1, r1 = r
+        for c in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                cells[(c, row)].add(o)
+        self.ranges[o] = r
+
+    def _discard(self, o, r):
+        cells = self.cells
+        c0, r0, c1, r1 = r
+        for c in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                cell = cells[(c, row)]
+                cell.discard(o)
+                if not cell:
+                    del cells[(c, row)]
+
+    def query(self, x0, y0, x1, y1):
+        """ Returns objects those can intersect the area, in `sync` order. """
+        cells = self.cells
+        c0, r0, c1, r1 = self.cell_range(x0, y0, x1, y1)
+        found = set()
+        for c in range(c0, c1 + 1):
+            for row in range(r0, r1 + 1):
+                cell = cells.get((c, row))
+                if cell:
+                    found.update(cell)
+        return sorted(found, key = self.order.__getitem__)
+
+    def near(self, o):
+        """ Returns objects those can collide with `o` (including `o`, if it's
+        in the grid). The spacing of `o` is accounted. """
+        s = o.spacing
+        x, y = o.x, o.y
+        return self.query(x - s, y - s, x + o.width + s, y + o.height + s)
+
+
 def find_empty_aabb(objs, minw = 1, minh = 1):
     """
     :returns: empty space bounds (left, top, right, bottom) where `None` means
@@ -0,0 +1,416 @@
+__all__ = [
+    "PackedFormatError"
+  , "PackedWriter"
+  , "PackedReader"
+  , "PackedRecords"
+      , "PackedArray"
+  , "NO_STRING"
+  , "replace_file"
+]
+
+from struct import (
+    Struct
+)
+from mmap import (
+    mmap,
+    ACCESS_READ
+)
+from os import (
+    fdopen,
+    remove,
+    rename,
+    name as os_name
+)
+from os.path import (
+    abspath,
+    basename,
+    dirname
+)
+from tempfile import (
+    mkstemp
+)
+from six import (
+    binary_type,
+    integer_types,
+    text_type
+)
+
+
+# Special string index standing for `None`.
+NO_STRING = 0xFFFFFFFF
+
+# Name of section containing string table.
+STRINGS = b"STRS"
+
+# File header: magic, format version, number of sections.
+header_s = Struct("<8sII")
+# Section directory entry: tag, offset, size.
+section_s = Struct("<4sII")
+u32_s = Struct("<I")
+i64_s = Struct("<q")
+f64_s = Struct("<d")
+
+
+try:
+    from os import (
+        replace as replace_file
+    )
+except ImportError: # Py2
+    def replace_file(src, dst):
+        if os_name == "nt":
+            try:
+                remove(dst)
+            except OSError:
+                pass
+        rename(src, dst)
+
+    replace_file.__doc__ = "Py2 analogue of `os.replace`."
+
+
+class PackedFormatError(ValueError):
+    pass
+
+
+class PackedWriter(object):
+    """ Builds a sectioned binary file with a shared string table.
+
+A file consists of a header, a section directory and sections. Layout of
+sections is defined by the user. There are helpers for arrays of fixed layout
+records (`records`) and for small irregular data (`value`). Strings are
+referenced by index in the string table (see `string`).
+    """
+
+    def __init__(self, magic, version):
+        if len(magic) > 8:
+            raise ValueError("Magic is too long: %r" % magic)
+        self.magic = magic
+        self.version = version
+
+        self.sections = []
+        self.tags = set()
+
+        self.strings = []
+        self.string_idx = {}
+
+    def string(self, s):
+        "Returns index of `s` in the string table. `None` is `NO_STRING`."
+        if s is None:
+            return NO_STRING
+        try:
+            return self.string_idx[s]
+        except KeyError:
+            idx = len(self.strings)
+            self.strings.append(s)
+            self.string_idx[s] = idx
+            return idx
+
+    def section(self, tag, data):
+        if tag in self.tags or tag == STRINGS:
+            raise ValueError("Section %r is already added" % tag)
+        self.tags.add(tag)
+        self.sections.append((tag, data))
+
+    def records(self, tag, fmt, records):
+        "Adds a section with `records` (tuples) packed according to `fmt`."
+        pack = Struct(fmt).pack
+        self.section(tag, b"".join(pack(*r) for r in records))
+
+    def array(self, tag, fmt, values):
+        "Adds a section with `values` (scalars) packed according to `fmt`."
+        pack = Struct(fmt).pack
+        self.section(tag, b"".join(pack(v) for v in values))
+
+    def value(self, tag, value):
+        "Adds a section with `value` encoded by `encode_value`."
+        chunks = []
+        self.encode_value(value, chunks)
+        self.section(tag, b"".join(chunks))
+
+    def encode_value(self, value, chunks):
+        """ Serializes a small object composed of standard types: `None`,
+`bool`, `int`, `float`, strings, `list`, `tuple`, `set`, `frozenset`, `dict`.
+        """
+        if value is None:
+            chunks.append(b"N")
+        elif value is True:
+            chunks.append(b"T")
+        elif value is False:
+            chunks.append(b"F")
+        elif isinstance(value, integer_types):
+            chunks.append(b"i")
+            chunks.append(i64_s.pack(value))
+        elif isinstance(value, float):
+            chunks.append(b"f")
+            chunks.append(f64_s.pack(value))
+        elif isinstance(value, (text_type, binary_type)):
+            if isinstance(value, binary_type):
+                value = value.decode("utf-8")
+            chunks.append(b"s")
+            chunks.append(u32_s.pack(self.string(value)))
+        elif isinstance(value, dict):
+            chunks.append(b"d")
+            chunks.append(u32_s.pack(len(value)))
+            for k, v in value.items():
+                self.encode_value(k, chunks)
+                self.encode_value(v, chunks)
+        else:
+            if isinstance(value, list):
+                chunks.append(b"l")
+            elif isinstance(value, tuple):
+                chunks.append(b"t")
+            elif isinstance(value, (set, frozenset)):
+                chunks.append(b"S")
+                # order does not matter, but sorting gives reproducible files
+                try:
+                    value = sorted(value)
+                except TypeError:
+                    pass
+            else:
+                raise TypeError("Cannot pack value of type %s" % type(value))
+            chunks.append(u32_s.pack(len(value)))
+            for v in value:
+                self.encode_value(v, chunks)
+
+    def pack_strings(self):
+        offsets = []
+        blob = []
+        offset = 0
+        for s in self.strings:
+            offsets.append(offset)
+            b = s.encode("utf-8")
+            blob.append(b)
+            offset += len(b)
+        offsets.append(offset)
+
+        return b"".join(
+            [u32_s.pack(len(self.strings))]
+          + [u32_s.pack(o) for o in offsets]
+          + blob
+        )
+
+    def iter_chunks(self):
+        sections = [(STRINGS, self.pack_strings())] + self.sections
+
+        yield header_s.pack(self.magic, self.version, len(sections))
+
+        offset = header_s.size + section_s.size * len(sections)
+        for tag, data in sections:
+            yield section_s.pack(tag, offset, len(data))
+            offset += len(data)
+
+        for __, data in sections:
+            yield data
+
+    def write(self, file_name):
+        """ Writes the file atomically. A reader may have the previous
+version of the file mapped. So, the file is never overwritten in place.
+        """
+        file_name = abspath(file_name)
+        fd, tmp_name = mkstemp(
+            prefix = "." + basename(file_name) + ".",
+            dir = dirname(file_name)
+        )
+        try:
+            with fdopen(fd, "wb") as f:
+                for chunk in self.iter_chunks():
+                    f.write(chunk)
+        except:
+            remove(tmp_name)
+            raise
+        replace_file(tmp_name, file_name)
+
+
+class PackedRecords(object):
+    "Read-only sequence of fixed layout records within a buffer."
+
+    def __init__(self, buf, offset, size, fmt):
+        self.buf = buf
+        self.offset = offset
+        self.struct = s = Struct(fmt)
+        self.count, tail = divmod(size, s.size)
+        if tail:
+            raise PackedFormatError("Section size %u is not multiple of"
+                " record size %u" % (size, s.size)
+            )
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += self.count
+        if not 0 <= idx < self.count:
+            raise IndexError(idx)
+        s = self.struct
+        return s.unpack_from(self.buf, self.offset + s.size * idx)
+
+    def __iter__(self):
+        s = self.struct
+        unpack_from, size, buf = s.unpack_from, s.size, self.buf
+        for offset in range(self.offset, self.offset + size * self.count,
+            size
+        ):
+            yield unpack_from(buf, offset)
+
+    def slice(self, first, count):
+        "Iterates `count` records starting from `first`."
+        for i in range(first, first + count):
+            yield self[i]
+
+
+class PackedArray(PackedRecords):
+    "Like `PackedRecords` but a record consists of exactly one value."
+
+    def __getitem__(self, idx):
+        return super(PackedArray, self).__getitem__(idx)[0]
+
+    def __iter__(self):
+        for r in super(PackedArray, self).__iter__():
+            yield r[0]
+
+
+class PackedReader(object):
+    """ Reads a file written by `PackedWriter`. The file is memory-mapped and
+decoded on demand.
+    """
+
+    def __init__(self, file_name, magic, version):
+        self.file_name = file_name
+
+        with open(file_name, "rb") as f:
+            try:
+                buf = mmap(f.fileno(), 0, access = ACCESS_READ)
+            except ValueError: # empty file cannot be mapped
+                buf = f.read()
+        self.buf = buf
+
+        if len(buf) < header_s.size:
+            raise PackedFormatError("%s is too short" % file_name)
+
+        f_magic, f_version, n = header_s.unpack_from(buf, 0)
+        if f_magic.rstrip(b"\0") != magic.rstrip(b"\0"):
+            raise PackedFormatError("%s has incorrect magic %r" % (
+                file_name, f_magic
+            ))
+        if f_version != version:
+            raise PackedFormatError("%s has unsupported version %u" % (
+                file_name, f_version
+            ))
+        self.version = f_version
+
+        self.sections = sections = {}
+        for i in range(n):
+            tag, offset, size = section_s.unpack_from(buf,
+                header_s.size + section_s.size * i
+            )
+            if offset + size > len(buf):
+                raise PackedFormatError("%s is truncated" % file_name)
+            sections[tag] = (offset, size)
+
+        str_offset, __ = self.section(STRINGS)
+        self.strings_count = u32_s.unpack_from(buf, str_offset)[0]
+        self.strings_offsets = str_offset + u32_s.size
+        self.strings_blob = (self.strings_offsets
+            + u32_s.size * (self.strings_count + 1)
+        )
+        # decoded strings
+        self._strings = {}
+
+    def close(self):
+        buf = self.buf
+        self.buf = None
+        if isinstance(buf, mmap):
+            buf.close()
+
+    def __contains__(self, tag):
+        return tag in self.sections
+
+    def section(self, tag):
+        try:
+            return self.sections[tag]
+        except KeyError:
+            raise PackedFormatError("%s has no section %r" % (
+                self.file_name, tag
+            ))
+
+    def raw(self, tag):
+        offset, size = self.section(tag)
+        return self.buf[offset:offset + size]
+
+    def string(self, idx):
+        if idx == NO_STRING:
+            return None
+        try:
+            return self._strings[idx]
+        except KeyError:
+            pass
+
+        if idx >= self.strings_count:
+            raise PackedFormatError("String index %u is out of range" % idx)
+
+        start, end = Struct("<II").unpack_from(self.buf,
+            self.strings_offsets + u32_s.size * idx
+        )
+        blob = self.strings_blob
+        s = self.buf[blob + start:blob + end].decode("utf-8")
+        self._strings[idx] = s
+        return s
+
+    def records(self, tag, fmt):
+        offset, size = self.section(tag)
+        return PackedRecords(self.buf, offset, size, fmt)
+
+    def array(self, tag, fmt):
+        offset, size = self.section(tag)
+        return PackedArray(self.buf, offset, size, fmt)
+
+    def value(self, tag):
+        offset, __ = self.section(tag)
+        return self.decode_value(offset)[0]
+
+    def decode_value(self, offset):
+        "Returns the value at `offset` and offset of the next one."
+        buf = self.buf
+        kind = buf[offset:offset + 1]
+        offset += 1
+
+        if kind == b"N":
+            return None, offset
+        if kind == b"T":
+            return True, offset
+        if kind == b"F":
+            return False, offset
+        if kind == b"i":
+            return i64_s.unpack_from(buf, offset)[0], offset + i64_s.size
+        if kind == b"f":
+            return f64_s.unpack_from(buf, offset)[0], offset + f64_s.size
+        if kind == b"s":
+            idx = u32_s.unpack_from(buf, offset)[0]
+            return self.string(idx), offset + u32_s.size
+
+        count = u32_s.unpack_from(buf, offset)[0]
+        offset += u32_s.size
+
+        if kind == b"d":
+            res = {}
+            for __ in range(count):
+                k, offset = self.decode_value(offset)
+                v, offset = self.decode_value(offset)
+                res[k] = v
+            return res, offset
+
+        items = []
+        for __ in range(count):
+            v, offset = self.decode_value(offset)
+            items.append(v)
+
+        if kind == b"l":
+            return items, offset
+        if kind == b"t":
+            return tuple(items), offset
+        if kind == b"S":
+            return set(items), offset
+
+        raise PackedFormatError("Unknown value kind %r at %u" % (
+            kind, offset - 1
+        ))
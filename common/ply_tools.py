@@ -1,8 +1,26 @@
 __all__ = [
     "gen_tokens"
   , "def_tokens"
+  , "PLYGrammar"
 ]
 
+from .lazy import (
+    lazy
+)
+from .pypath import (
+    pypath
+)
+from sys import (
+    modules
+)
+with pypath("..ply"):
+    from ply.lex import (
+        lex
+    )
+    from ply.yacc import (
+        yacc
+    )
+
 def gen_tokens(glob):
     "Given global scope yielding PLY tokens."
     for g in list(glob):
@@ -14,3 +32,29 @@ def gen_tokens(glob):
 
 def def_tokens(glob):
     glob["tokens"] = tuple(gen_tokens(glob))
+
+
+class PLYGrammar(object):
+    """ PLY lexer and parser defined by rules of a module. Both are built on
+first use rather than during the module import. PLY saves parser tables near
+the module (`parsetab.py`) and loads them during next builds while the grammar
+is not changed.
+
+:param module_name: `__name__` of the module defining the rules
+:param yacc_kw: extra arguments for `ply.yacc.yacc`
+    """
+
+    def __init__(self, module_name, **yacc_kw):
+        self.module_name = module_name
+        self.yacc_kw = yacc_kw
+
+    @lazy
+    def lexer(self):
+        return lex(module = modules[self.module_name])
+
+    @lazy
+    def parser(self):
+        return yacc(module = modules[self.module_name], **self.yacc_kw)
+
+    def parse(self, text, **kw):
+        return self.parser.parse(text, lexer = self.lexer, **kw)
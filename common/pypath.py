@@ -15,10 +15,6 @@ from os.path import (
     join
 )
 import sys
-from inspect import (
-    stack,
-    getmodule
-)
 from os import (
     listdir
 )
@@ -43,12 +39,13 @@ def caller_file_name():
     "Returns name of file defining caller of that function caller."
     # https://stackoverflow.com/questions/13699283/how-to-get-the-callers-filename-method-name-in-python
 
-    # stack[0] - caller_file_name
-    # stack[1] - caller of `caller_file_name`
-    # stack[2] - caller which file name is requested
-    frame = stack()[2]
-    module = getmodule(frame[0])
-    return module.__file__
+    # frame 0 - caller_file_name
+    # frame 1 - caller of `caller_file_name`
+    # frame 2 - caller which file name is requested
+    # Note that `inspect.stack` is not used because it reads source files of
+    # all frames, that is too slow to be done during each import.
+    frame = sys._getframe(2)
+    return frame.f_globals["__file__"]
 
 
 def pypath(rel_path):
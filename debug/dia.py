@@ -37,8 +37,13 @@ class DWARFInfoAccelerator(object):
 pyelftools's `DWARFInfo`.
     """
 
-    def __init__(self, di):
+    def __init__(self, di, index = None):
+        """
+:param index: `DWARFIndex` of `di`. It allows to avoid sequential parsing
+    of CUs and CFI.
+        """
         self.di = di
+        self.index = index
 
         # accelerates access to compilation units (CU)
         self.idx2cu = []
@@ -111,7 +116,11 @@ pyelftools's `DWARFInfo`.
 
         """
 
-        cu_offset = self.aranges.cu_offset_at_addr(addr)
+        index = self.index
+        if index is None:
+            cu_offset = self.aranges.cu_offset_at_addr(addr)
+        else:
+            cu_offset = index.cu_offset_at_addr(addr)
         # Note: _parse_CU_at_offset caches CUs those are already parsed
         cu = self.di._parse_CU_at_offset(cu_offset)
         return cu
@@ -206,7 +215,15 @@ pyelftools's `DWARFInfo`.
         addr2fde = self.addr2fde
         fde = addr2fde[addr]
 
-        if fde is None:
+        if fde is None and self.index is not None:
+            offset = self.index.fde_offset_at_addr(addr)
+            if offset is None:
+                raise KeyError("No entry for address 0x%x" % addr)
+
+            fde = self.cfi._parse_entry_at(offset)
+            start = fde.header.initial_location
+            addr2fde[start:start + fde.header.address_range] = fde
+        elif fde is None:
             for e in self._cfi_parser_state:
                 if isinstance(e, CIE):
                     continue
@@ -361,18 +378,30 @@ pyelftools's `DWARFInfo`.
 #             ))
 
     def _cu_parser(self):
-        citer = self.di._parse_CUs_iter()
         idx2cu = self.idx2cu
 
-        for cu in citer:
+        if self.index is None:
+            citer = self._iter_CU_names()
+        else:
+            # Only headers of CUs are parsed.
+            parse = self.di._parse_CU_at_offset
+            citer = (
+                (parse(offset), name)
+                    for offset, name in self.index.iter_CUs()
+            )
+
+        for cu, name in citer:
             idx2cu.append(cu)
-            name = cu.get_top_DIE().attributes["DW_AT_name"].value
             parts = name.split(bsep)
             rparts = tuple(reversed(parts))
             self._account_cu_by_reversed_name(rparts, cu)
 
             yield cu, rparts
 
+    def _iter_CU_names(self):
+        for cu in self.di._parse_CUs_iter():
+            yield cu, cu.get_top_DIE().attributes["DW_AT_name"].value
+
     def _account_cu_by_reversed_name(self, rparts, cu):
         # print("Accounting %s" % str(rparts))
 
@@ -14,6 +14,17 @@ from common import (
 from collections import (
     defaultdict
 )
+from os import (
+    access,
+    makedirs,
+    W_OK,
+    X_OK
+)
+from os.path import (
+    abspath,
+    dirname,
+    isdir
+)
 from .type import (
     TYPE_TAGS,
     Type
@@ -23,15 +34,21 @@ from .glob import (
     Subprogram
 )
 from .elf import (
-    InMemoryELFFile
+    MappedELFFile
+)
+from .dwarf_index import (
+    dwarf_index_file_names,
+    dwarf_index_key,
+    load_dwarf_index,
+    save_dwarf_index
 )
 
 
 class DWARFInfoCache(DWARFInfoAccelerator):
     "Extends `DWARFInfoAccelerator` with caching of high level data."
 
-    def __init__(self, di, symtab = None):
-        super(DWARFInfoCache, self).__init__(di)
+    def __init__(self, di, symtab = None, index = None):
+        super(DWARFInfoCache, self).__init__(di, index = index)
 
         self.symtab = symtab
 
@@ -244,14 +261,39 @@ unit (`cu`). Adds address intervals of subprograms to `addr2subprog` mapping.
 
     @lazy
     def pubnames(self):
-        return self.di.get_pubnames()
+        if self.index is None:
+            return self.di.get_pubnames()
+        else:
+            return self.index.pubnames
 
     @lazy
     def pubtypes(self):
-        return self.di.get_pubtypes()
-
-def create_dwarf_cache(exec_file):
-    elf = InMemoryELFFile(exec_file)
+        if self.index is None:
+            return self.di.get_pubtypes()
+        else:
+            return self.index.pubtypes
+
+def _can_save(file_name):
+    "Checks that a file can be atomically written (see `PackedWriter`)."
+    dir_name = dirname(abspath(file_name))
+    if not isdir(dir_name):
+        try:
+            makedirs(dir_name)
+        except OSError:
+            return False
+    return access(dir_name, W_OK | X_OK)
+
+
+def create_dwarf_cache(exec_file, index_file = None):
+    """
+:param index_file: name of `DWARFIndex` file. It's built if absent or
+    outdated. By default, one of `dwarf_index_file_names` is used. `False`
+    disables the index.
+
+    Building of the index parses all DWARF info. It's only done if the index
+can be saved. Else, DWARF info is loaded on demand.
+    """
+    elf = MappedELFFile(exec_file)
     if not elf.has_dwarf_info():
         raise ValueError(
 "%s does not have DWARF info. Provide a debug build\n" % (exec_file)
@@ -264,6 +306,42 @@ def create_dwarf_cache(exec_file):
             " -gpubnames flag to the compiler" % exec_file
         )
 
-    return DWARFInfoCache(di,
-        symtab = elf.get_section_by_name(".symtab")
+    if index_file is None:
+        index_files = dwarf_index_file_names(exec_file)
+    elif index_file is False:
+        index_files = []
+    else:
+        index_files = [index_file]
+
+    index = None
+    if index_files:
+        key = dwarf_index_key(elf, exec_file)
+        for index_file in index_files:
+            index = load_dwarf_index(index_file, key)
+            if index is not None:
+                break
+
+    dic = DWARFInfoCache(di,
+        symtab = elf.get_section_by_name(".symtab"),
+        index = index
     )
+
+    if index is not None or not index_files:
+        return dic
+
+    for index_file in index_files:
+        if _can_save(index_file):
+            break
+    else:
+        print("Cannot save DWARF index of %s, DWARF info is loaded on"
+            " demand" % exec_file
+        )
+        return dic
+
+    print("Building DWARF index %s" % index_file)
+    try:
+        save_dwarf_index(index_file, key, dic)
+    except (IOError, OSError) as e:
+        print("Cannot save DWARF index: %s" % e)
+
+    return dic
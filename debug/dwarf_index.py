@@ -0,0 +1,280 @@
+__all__ = [
+    "DWARF_INDEX_SUFFIX"
+  , "DWARFIndex"
+  , "dwarf_index_file_names"
+  , "dwarf_index_key"
+  , "load_dwarf_index"
+  , "save_dwarf_index"
+]
+
+from common import (
+    bstr,
+    lazy,
+    PackedFormatError,
+    PackedReader,
+    PackedWriter
+)
+from bisect import (
+    bisect_left,
+    bisect_right
+)
+from hashlib import (
+    sha1
+)
+from os import (
+    environ,
+    stat
+)
+from os.path import (
+    abspath,
+    expanduser,
+    join
+)
+from elftools.dwarf.callframe import (
+    FDE
+)
+
+
+DWARF_INDEX_SUFFIX = ".qdtdwi"
+
+# Indices of executables in read-only locations (e.g. installed QEMU) are
+# saved there.
+dwarf_index_cache_dir = join(
+    environ.get("XDG_CACHE_HOME", join(expanduser("~"), ".cache")),
+    "qdt",
+    "dwarf_index"
+)
+
+DWI_MAGIC = b"QDTDWI"
+# Increase it manually if the layout below is changed.
+DWI_FORMAT_VERSION = 1
+
+# Section layouts. All string fields are string table indices.
+
+# CU offset, name; in .debug_info order
+CUS, CUS_FMT = b"CUS_", "<QI"
+# begin address, CU offset; sorted by address
+ARNG, ARNG_FMT = b"ARNG", "<QQ"
+# begin address, end address, offset of FDE in CFI; sorted by address
+FDES, FDES_FMT = b"FDES", "<QQQ"
+# name, CU offset, DIE offset; sorted by name
+PUBN, PUBT, PUB_FMT = b"PUBN", b"PUBT", "<IQQ"
+# other fields (see `save_dwarf_index`)
+MISC = b"MISC"
+
+
+def dwarf_index_key(elf, file_name):
+    """ Returns a string identifying the ELF file content: its GNU build-id if
+available or its size and modification time.
+    """
+    sec = elf.get_section_by_name(".note.gnu.build-id")
+    if sec is not None:
+        try:
+            for note in sec.iter_notes():
+                if note["n_type"] == "NT_GNU_BUILD_ID":
+                    return "build-id:%s" % note["n_desc"]
+        except AttributeError: # `iter_notes` is not supported
+            pass
+
+    st = stat(file_name)
+    return "stat:%u:%u" % (st.st_size, int(st.st_mtime))
+
+
+def dwarf_index_file_names(exec_file):
+    """ Returns possible names of index file of `exec_file` in order of
+preference: next to the executable and in `dwarf_index_cache_dir`. The latter
+is named by a hash of absolute path of the executable. Content of the
+executable is identified by the key inside the index.
+    """
+    exec_file = abspath(exec_file)
+    return [
+        exec_file + DWARF_INDEX_SUFFIX,
+        join(dwarf_index_cache_dir,
+            sha1(bstr(exec_file)).hexdigest() + DWARF_INDEX_SUFFIX
+        )
+    ]
+
+
+class PubNamesView(object):
+    """ Looks like pyelftools's `NameLUT`: getting an item returns (CU offset,
+DIE offset) or `None`.
+    """
+
+    def __init__(self, reader, records):
+        self.records = records
+        self.names = SortedNames(reader.string, records)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, name):
+        names = self.names
+        idx = bisect_left(names, name)
+        if idx < len(names) and names[idx] == name:
+            return self.records[idx][1:]
+        return None
+
+
+class SortedNames(object):
+    "Sequence of names of `PubNamesView` suitable for `bisect`."
+
+    def __init__(self, string, records):
+        self.string = string
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        return self.string(self.records[idx][0])
+
+
+class DWARFIndex(object):
+    """ DWARF lookup tables saved by `save_dwarf_index`. Tables are
+memory-mapped and decoded on demand.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.misc = reader.value(MISC)
+
+    @property
+    def key(self):
+        return self.misc["key"]
+
+    def iter_CUs(self):
+        "Yields offset and name of each CU."
+        string = self.reader.string
+        for offset, name in self.reader.records(CUS, CUS_FMT):
+            yield offset, bstr(string(name))
+
+    @lazy
+    def aranges(self):
+        return self.reader.records(ARNG, ARNG_FMT)
+
+    @lazy
+    def fdes(self):
+        return self.reader.records(FDES, FDES_FMT)
+
+    @lazy
+    def pubnames(self):
+        if self.misc["has_pubnames"]:
+            return PubNamesView(self.reader, self.reader.records(PUBN,
+                PUB_FMT
+            ))
+        return None
+
+    @lazy
+    def pubtypes(self):
+        if self.misc["has_pubtypes"]:
+            return PubNamesView(self.reader, self.reader.records(PUBT,
+                PUB_FMT
+            ))
+        return None
+
+    def cu_offset_at_addr(self, addr):
+        "Like `ARanges.cu_offset_at_addr`"
+        aranges = self.aranges
+        idx = bisect_right(AddressKeys(aranges), addr) - 1
+        if idx < 0:
+            raise KeyError("No CU for address 0x%x" % addr)
+        return aranges[idx][1]
+
+    def fde_offset_at_addr(self, addr):
+        "Returns offset of FDE covering `addr` or `None`."
+        fdes = self.fdes
+        idx = bisect_right(AddressKeys(fdes), addr) - 1
+        if idx < 0:
+            return None
+        __, end, offset = fdes[idx]
+        if addr < end:
+            return offset
+        return None
+
+    def close(self):
+        self.reader.close()
+
+
+class AddressKeys(object):
+    "Sequence of first fields of records suitable for `bisect`."
+
+    def __init__(self, records):
+        self.records = records
+
+    def __len__(self):
+        return len(self.records)
+
+    def __getitem__(self, idx):
+        return self.records[idx][0]
+
+
+def load_dwarf_index(file_name, key):
+    "Returns `DWARFIndex` or `None` if the file is absent or outdated."
+    try:
+        reader = PackedReader(file_name, DWI_MAGIC, DWI_FORMAT_VERSION)
+    except (IOError, OSError, PackedFormatError):
+        return None
+
+    index = DWARFIndex(reader)
+    if index.key != key:
+        index.close()
+        return None
+
+    return index
+
+
+def _pack_pubnames(w, tag, lut):
+    string = w.string
+    w.records(tag, PUB_FMT, list(
+        (string(name), entry[0], entry[1])
+            for name, entry in sorted(lut.items())
+    ))
+
+
+def save_dwarf_index(file_name, key, dia):
+    """ Builds the index using `DWARFInfoAccelerator` `dia` and saves it.
+Note that all CUs, CFI and name tables are parsed.
+    """
+    w = PackedWriter(DWI_MAGIC, DWI_FORMAT_VERSION)
+    string = w.string
+    di = dia.di
+
+    w.records(CUS, CUS_FMT, list(
+        (cu.cu_offset, string(
+            cu.get_top_DIE().attributes["DW_AT_name"].value.decode("utf-8")
+        )) for cu in dia.iter_CUs()
+    ))
+
+    aranges = di.get_aranges()
+    if aranges is None:
+        entries = []
+    else:
+        entries = aranges.entries
+    w.records(ARNG, ARNG_FMT, sorted(
+        (e.begin_addr, e.info_offset) for e in entries
+    ))
+
+    fdes = []
+    for e in dia._cfi_parser():
+        if not isinstance(e, FDE):
+            continue
+        start = e.header.initial_location
+        fdes.append((start, start + e.header.address_range, e.offset))
+    fdes.sort()
+    w.records(FDES, FDES_FMT, fdes)
+
+    pubnames = di.get_pubnames()
+    if pubnames is not None:
+        _pack_pubnames(w, PUBN, pubnames)
+
+    pubtypes = di.get_pubtypes()
+    if pubtypes is not None:
+        _pack_pubnames(w, PUBT, pubtypes)
+
+    w.value(MISC, dict(
+        key = key,
+        has_pubnames = pubnames is not None,
+        has_pubtypes = pubtypes is not None
+    ))
+
+    w.write(file_name)
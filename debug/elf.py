@@ -2,12 +2,28 @@
 
 __all__ = [
     "InMemoryELFFile"
+  , "MappedELFFile"
 ]
 
 from elftools.elf.elffile import (
     ELFFile
 )
+from elftools.elf.relocation import (
+    RelocationHandler
+)
+from elftools.dwarf.dwarfinfo import (
+    DebugSectionDescriptor
+)
 
+from mmap import (
+    ACCESS_READ,
+    mmap
+)
+from os import (
+    SEEK_CUR,
+    SEEK_END,
+    SEEK_SET
+)
 from sys import (
     version_info
 )
@@ -38,3 +54,85 @@ class InMemoryELFFile(ELFFile):
                     break
 
         super(InMemoryELFFile, self).__init__(stream)
+
+
+class MappedELFFile(ELFFile):
+    """ Like pyelftools's `ELFFile` but the file is memory-mapped (read-only).
+So, pages of the file are shared among all processes working with it and
+only accessed pages are resident.
+    """
+
+    def __init__(self, file_name):
+        with open(file_name, "rb") as f:
+            # The mapping remains valid after the file is closed.
+            stream = mmap(f.fileno(), 0, access = ACCESS_READ)
+
+        super(MappedELFFile, self).__init__(stream)
+
+    def _read_dwarf_section(self, section, relocate_dwarf_sections):
+        """ Unlike original, it does not copy the section content if the
+content is not changed by relocations and is not compressed.
+        """
+        if (section["sh_type"] == "SHT_NOBITS"
+            # `gcc -gz` (SHF_COMPRESSED, `compressed` is absent in older
+            # pyelftools) or legacy `.zdebug_*` (`-gz=zlib-gnu`) sections
+            or getattr(section, "compressed", False)
+            or section.name.startswith(".zdebug")
+            or relocate_dwarf_sections and (
+                RelocationHandler(self).find_relocations_for_section(section)
+                    is not None
+            )
+        ):
+            return super(MappedELFFile, self)._read_dwarf_section(section,
+                relocate_dwarf_sections
+            )
+
+        # Fields of `DebugSectionDescriptor` vary among pyelftools versions.
+        fields = dict(
+            stream = MappedSection(self.stream,
+                section["sh_offset"], section["sh_size"]
+            ),
+            name = section.name,
+            global_offset = section["sh_offset"],
+            size = section["sh_size"],
+            address = section["sh_addr"]
+        )
+        return DebugSectionDescriptor(
+            **dict((f, fields[f]) for f in DebugSectionDescriptor._fields)
+        )
+
+    def close(self):
+        self.stream.close()
+
+
+class MappedSection(object):
+    "Read-only file-like window of `size` bytes at `offset` of `buf`."
+
+    def __init__(self, buf, offset, size):
+        self.buf = buf
+        self.offset = offset
+        self.size = size
+        self.pos = 0
+
+    def seek(self, pos, whence = SEEK_SET):
+        if whence == SEEK_CUR:
+            pos += self.pos
+        elif whence == SEEK_END:
+            pos += self.size
+        if pos < 0:
+            raise ValueError("negative seek position %d" % pos)
+        self.pos = pos
+        return pos
+
+    def tell(self):
+        return self.pos
+
+    def read(self, size = -1):
+        start = min(self.pos, self.size)
+        if size is None or size < 0:
+            end = self.size
+        else:
+            end = min(start + size, self.size)
+        self.pos = end
+        offset = self.offset
+        return self.buf[offset + start:offset + end]
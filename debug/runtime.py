@@ -54,7 +54,10 @@ class Breakpoints(object):
 class Runtime(object):
     "A context of debug session with access to DWARF debug information."
 
-    def __init__(self, target, dic, return_reg_name = None):
+    def __init__(self, target, dic,
+        return_reg_name = None,
+        mem_block_size = 256
+    ):
         """
     :type target:
         pyrsp.rsp.RemoteTarget
@@ -66,6 +69,10 @@ class Runtime(object):
     :param dic:
         a global context
 
+    :param mem_block_size:
+        target memory is read by aligned blocks of that size and cached until
+        target resumption, 0 disables the read-ahead and caching
+
         """
         self.target = target
         self.dic = dic
@@ -98,6 +105,10 @@ class Runtime(object):
         # breakpoints and its handlers
         self.brs = defaultdict(lambda : Breakpoints(self))
 
+        self.mem_block_size = mem_block_size
+        # block address -> block content
+        self.mem_cache = {}
+
     def add_br(self, addr_str, cb, quiet = False):
         cbs = self.brs[addr_str]
         if not cbs:
@@ -119,6 +130,7 @@ not actual now.
         self.version += 1
 
         self.regs[:] = repeat(None, len(self.regs))
+        self.mem_cache.clear()
 
         reset_cache(self)
 
@@ -199,10 +211,61 @@ normally correct only when the target is stopped at the subprogram epilogue.
         stack.append(obj)
         return loc
 
+    def read_memory(self, addr, size):
+        """ Reads `size` bytes of target memory at `addr`. Blocks of memory
+absent in the cache are read by one request per adjacent blocks.
+        """
+        block_size = self.mem_block_size
+        if not block_size or size <= 0:
+            return self.target.dump(size, addr)
+
+        cache = self.mem_cache
+        first = addr - addr % block_size
+        end = addr + size
+
+        missing = None
+        for block in range(first, end, block_size):
+            if block in cache:
+                if missing is not None:
+                    if not self._read_blocks(missing, block):
+                        break
+                    missing = None
+            elif missing is None:
+                missing = block
+        else:
+            if missing is None or self._read_blocks(missing,
+                block + block_size
+            ):
+                offset = addr - first
+                return b"".join(
+                    cache[block] for block in range(first, end, block_size)
+                )[offset:offset + size]
+
+        # Read-ahead is impossible (e.g. the blocks cross a boundary of
+        # accessible memory). Read exactly requested bytes.
+        return self.target.dump(size, addr)
+
+    def _read_blocks(self, start, end):
+        try:
+            data = self.target.dump(end - start, start)
+        except RuntimeError:
+            return False
+
+        if len(data) != end - start:
+            return False
+
+        cache = self.mem_cache
+        block_size = self.mem_block_size
+        for block in range(start, end, block_size):
+            offset = block - start
+            cache[block] = data[offset:offset + block_size]
+
+        return True
+
     def get_val(self, addr, size):
         target = self.target
 
-        data = target.dump(size, addr)
+        data = self.read_memory(addr, size)
 
         if target.arch["endian"]:
             data = reversed(data)
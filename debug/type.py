@@ -40,8 +40,10 @@ from common import (
 )
 from .expression import (
     Plus,
+    Mul,
     ObjectAddress,
-    AddressSize
+    AddressSize,
+    Constant
 )
 from itertools import (
     count
@@ -100,6 +102,17 @@ of this field at runtime.
         return self.container.dic
 
 
+# forms of DWARF constant class
+CONSTANT_FORMS = set([
+    "DW_FORM_data1",
+    "DW_FORM_data2",
+    "DW_FORM_data4",
+    "DW_FORM_data8",
+    "DW_FORM_sdata",
+    "DW_FORM_udata",
+    "DW_FORM_implicit_const"
+])
+
 # TODO: assign values according to GDB Python API
 c = count(1)
 
@@ -287,6 +300,30 @@ attribute.
             return AddressSize()
         elif code == TYPE_CODE_TYPEDEF:
             return self.target_type.size_expr
+        elif code == TYPE_CODE_ARRAY:
+            elements = 1
+            for die in self.die.iter_children():
+                if die.tag != "DW_TAG_subrange_type":
+                    continue
+                attrs = die.attributes
+                if "DW_AT_count" in attrs:
+                    bound = attrs["DW_AT_count"]
+                    extra = 0
+                elif "DW_AT_upper_bound" in attrs:
+                    bound = attrs["DW_AT_upper_bound"]
+                    extra = 1
+                else:
+                    raise NotImplementedError("Unknown array bounds")
+                # Variable length arrays refer to a DIE or an expression.
+                if bound.form not in CONSTANT_FORMS:
+                    raise NotImplementedError(
+                        "Array bound of form %s" % bound.form
+                    )
+                elements *= bound.value + extra
+            return Mul(self.target_type.size_expr, elements)
+        elif "DW_AT_byte_size" in self.die.attributes:
+            # base types, structures, unions, enumerations
+            return Constant(self.die.attributes["DW_AT_byte_size"].value)
         else:
             raise NotImplementedError(
                 "Unknown size of type with code %u" % code
@@ -243,6 +243,16 @@ Related: `dereference`
     def fetch_pointer(self):
         return self.fetch(self.runtime.address_size)
 
+    def fetch_bytes(self):
+        """ Fetches whole value (e.g. a structure or an array) by one memory
+request. Consequent fetches of its fields and elements are served by the
+runtime memory cache (until target resumption).
+
+        :returns: `bytes`, raw content of the value
+        """
+        size = self.eval(self.type.size_expr)
+        return self.runtime.read_memory(self.address, size)
+
     def fetch_c_string(self, limit = 10, encoding = "utf-8"):
         """
         Reads C-string from remote.
@@ -261,14 +271,14 @@ Related: `dereference`
         if addr:
             value = deque()
             pos = -1
-            dump = self.runtime.target.dump
+            read_memory = self.runtime.read_memory
 
             while pos == -1:
                 if len(value) == limit:
                     raise RuntimeError("C string length limit exceeded")
 
                 try:
-                    substring = dump(64, addr)
+                    substring = read_memory(addr, 64)
                 except RuntimeError:
                     # XXX: a workaround for a non-deterministic E01 error from
                     # gdb stub because of an unidentified reason
@@ -0,0 +1,143 @@
+""" Measures import time of QDT entry points. Each import is done by a new
+Python process, i.e. without modules cached by the interpreter.
+"""
+
+from argparse import (
+    ArgumentParser
+)
+from glob import (
+    glob
+)
+from re import (
+    compile
+)
+from os.path import (
+    abspath,
+    basename,
+    dirname,
+    join
+)
+from subprocess import (
+    PIPE,
+    Popen
+)
+from sys import (
+    executable,
+    version_info
+)
+
+
+QDT_DIR = dirname(dirname(abspath(__file__)))
+
+re_main_guard = compile(r"""__name__\s*==\s*['"]__main__['"]""")
+
+# `run_name` prevents `main` invocation.
+MEASURER = """\
+from time import time
+t0 = time()
+from runpy import run_path
+run_path(%r, run_name = "import_time")
+print(time() - t0)
+"""
+
+
+def iter_entry_points():
+    "Yields Python files in `QDT_DIR` those are safe to import."
+    for file_name in sorted(glob(join(QDT_DIR, "*.py"))):
+        with open(file_name) as f:
+            if re_main_guard.search(f.read()):
+                yield file_name
+
+
+def measure(file_name):
+    "Returns import time of the file (in seconds) and `-X importtime` log."
+    cmd = [executable]
+    # `-X importtime` is available since Python 3.7.
+    if version_info[:2] >= (3, 7):
+        cmd.extend(["-X", "importtime"])
+    cmd.extend(["-c", MEASURER % file_name])
+
+    p = Popen(cmd,
+        cwd = QDT_DIR,
+        stdout = PIPE,
+        stderr = PIPE,
+        universal_newlines = True
+    )
+    out, err = p.communicate()
+    if p.returncode:
+        errors = [
+            l for l in err.splitlines() if not l.startswith("import time:")
+        ]
+        raise RuntimeError(errors[-1] if errors else p.returncode)
+
+    return float(out.splitlines()[-1]), err
+
+
+def slowest_modules(log, count):
+    "Given `-X importtime` log, yields `count` modules with longest self time."
+    records = []
+    for line in log.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[12:].split("|")
+        try:
+            self_us = int(fields[0])
+        except ValueError: # header
+            continue
+        records.append((self_us, fields[2].strip()))
+
+    records.sort(reverse = True)
+    return records[:count]
+
+
+def main():
+    ap = ArgumentParser(
+        description = "Import time of QDT entry points"
+    )
+    ap.add_argument("entry_points",
+        nargs = "*",
+        help = ("Python files (default: *.py in %s with `__main__` guard)"
+            % QDT_DIR
+        )
+    )
+    ap.add_argument("-r", "--repeat",
+        type = int,
+        default = 5,
+        help = "number of measurements per entry point"
+    )
+    ap.add_argument("-m", "--modules",
+        type = int,
+        default = 0,
+        metavar = "N",
+        help = "print N modules with longest own import time (Python 3.7+)"
+    )
+
+    args = ap.parse_args()
+
+    entry_points = args.entry_points or list(iter_entry_points())
+
+    print("%-28s %8s %8s" % ("entry point", "min, s", "median, s"))
+
+    for file_name in entry_points:
+        file_name = abspath(file_name)
+
+        try:
+            results = [measure(file_name) for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print("%-28s failed: %s" % (basename(file_name), e))
+            continue
+
+        times = sorted(t for t, _ in results)
+        print("%-28s %8.3f %8.3f" % (
+            basename(file_name), times[0], times[len(times) // 2]
+        ))
+
+        if args.modules:
+            for self_us, module in slowest_modules(results[0][1],
+                args.modules
+            ):
+                print("    %8.3f %s" % (self_us / 1e6, module))
+
+
+if __name__ == "__main__":
+    exit(main() or 0)
@@ -0,0 +1,120 @@
+""" Physics performance of `MachineDiagramWidget` on synthetic machines of
+increasing size. A display is required.
+"""
+
+from argparse import (
+    ArgumentParser
+)
+from random import (
+    Random
+)
+from time import (
+    time
+)
+from six.moves.tkinter import (
+    Tk
+)
+from qemu import (
+    BusNode,
+    DeviceNode,
+    IRQLine,
+    MachineDescription,
+    SystemBusDeviceNode,
+    SystemBusNode
+)
+from widgets import (
+    MachineDiagramWidget
+)
+
+
+def synthetic_machine(devices, seed = 0):
+    """ Each 10-th device has a child bus. Devices are randomly distributed
+among the buses. There are as many IRQ lines as devices.
+    """
+    rnd = Random(seed)
+
+    mach = MachineDescription("bench_%u" % devices, "arm")
+
+    sysbus = SystemBusNode()
+    mach.add_node(sysbus)
+
+    buses = [sysbus]
+    devs = []
+
+    for i in range(devices):
+        bus = rnd.choice(buses)
+        qom_type = "TYPE_BENCH_DEVICE_%u" % i
+        if bus is sysbus:
+            dev = SystemBusDeviceNode(qom_type, system_bus = sysbus)
+        else:
+            dev = DeviceNode(qom_type, parent = bus)
+        mach.add_node(dev)
+        devs.append(dev)
+
+        if i % 10 == 9:
+            child_bus = BusNode(parent = dev)
+            mach.add_node(child_bus)
+            buses.append(child_bus)
+
+    if len(devs) > 1:
+        for i in range(devices):
+            src, dst = rnd.sample(devs, 2)
+            mach.add_node(IRQLine(src, dst))
+
+    return mach
+
+
+def steps_per_second(mdw, duration):
+    steps = 0
+    t0 = time()
+    while True:
+        for _ in mdw.ph_iterate_co():
+            pass
+        mdw.ph_sync()
+        steps += 1
+
+        t = time() - t0
+        if t >= duration:
+            return steps / t
+
+
+def main():
+    ap = ArgumentParser(
+        description = "Machine diagram physics benchmark"
+    )
+    ap.add_argument("sizes",
+        nargs = "*",
+        type = int,
+        default = [25, 50, 100, 200, 400],
+        help = "numbers of devices in synthetic machines"
+    )
+    ap.add_argument("-t", "--time",
+        type = float,
+        default = 5.,
+        help = "seconds to simulate each machine"
+    )
+
+    args = ap.parse_args()
+
+    root = Tk()
+    root.withdraw()
+
+    print("devices objects steps/s")
+
+    for size in args.sizes:
+        mdw = MachineDiagramWidget(root, synthetic_machine(size))
+
+        objects = sum(map(len, (
+            mdw.nodes, mdw.buslabels, mdw.buses, mdw.conns, mdw.circles
+        )))
+
+        sps = steps_per_second(mdw, args.time)
+        print("%7u %7u %7.1f" % (size, objects, sps))
+
+        mdw.destroy()
+
+    root.destroy()
+
+
+if __name__ == "__main__":
+    exit(main() or 0)
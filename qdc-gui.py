@@ -60,6 +60,7 @@ from common import (
     FormatVar,
     execfile,
     CoSignal,
+    PRIORITY_BACKGROUND,
     CoTask,
     pythonize,
     mlget as _
@@ -100,7 +101,8 @@ class ProjectGeneration(CoTask):
         CoTask.__init__(
             self,
             self.main(),
-            description = _("Generation")
+            description = _("Generation"),
+            priority = PRIORITY_BACKGROUND
         )
 
     def main(self):
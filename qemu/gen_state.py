@@ -0,0 +1,177 @@
+__all__ = [
+    "GEN_STATE_FILE_NAME"
+  , "GenState"
+  , "generator_fingerprint"
+  , "qvc_fingerprint"
+]
+
+from common import (
+    PackedFormatError,
+    PackedReader,
+    PackedWriter,
+    pygenerate
+)
+from .version_description import (
+    QemuVersionDescription,
+    QVD_QH_HASH
+)
+from glob import (
+    glob
+)
+from hashlib import (
+    sha1
+)
+from os.path import (
+    abspath,
+    dirname,
+    isfile,
+    join
+)
+
+
+# The file is placed in the root of QEMU source tree.
+GEN_STATE_FILE_NAME = ".qdtgen"
+
+GEN_STATE_MAGIC = b"QDTGEN"
+# Increase it manually if the layout below is changed.
+GEN_STATE_FORMAT_VERSION = 1
+
+# environment fingerprint and `dict` of descriptions
+MISC = b"MISC"
+
+QDT_DIR = dirname(dirname(abspath(__file__)))
+
+# Packages whose code affects generated sources.
+GENERATOR_PACKAGES = ("common", "qemu", "source")
+
+_generator_fingerprint = None
+
+
+def generator_fingerprint():
+    "Returns a hash of generator code. It's computed once."
+    global _generator_fingerprint
+
+    if _generator_fingerprint is None:
+        h = sha1()
+        for package in GENERATOR_PACKAGES:
+            for file_name in sorted(glob(join(QDT_DIR, package, "*.py"))):
+                h.update(file_name[len(QDT_DIR):].encode("utf-8"))
+                with open(file_name, "rb") as f:
+                    h.update(f.read())
+        _generator_fingerprint = h.hexdigest()
+
+    return _generator_fingerprint
+
+
+def qvc_fingerprint():
+    """ Returns a string identifying QVC of current QEMU version description
+or `None` if there is no one.
+    """
+    qvd = QemuVersionDescription.current
+    if qvd is None or qvd.qvc is None:
+        return None
+
+    return "%s:%s:%s" % (
+        qvd.commit_sha,
+        QemuVersionDescription.version,
+        qvd.qvc.version_desc[QVD_QH_HASH]
+    )
+
+
+class GenState(object):
+    """ Fingerprints of descriptions generated in a QEMU source tree and paths
+of files generated for them. A description whose fingerprint is same as saved
+one needs no generation if its files exist.
+
+:param env: environment fingerprint (generator, QVC, generation settings).
+    `None` means unknown environment, descriptions are always generated then.
+    """
+
+    def __init__(self, src, env):
+        self.src = src
+        self.env = env
+        # name -> (fingerprint, paths)
+        self.descriptions = {}
+
+    @property
+    def file_name(self):
+        return join(self.src, GEN_STATE_FILE_NAME)
+
+    @classmethod
+    def load(cls, src, env):
+        """ Returns saved state of `src`. It's empty if `src` was generated
+in another environment.
+        """
+        state = cls(src, env)
+
+        if env is None:
+            return state
+
+        try:
+            reader = PackedReader(state.file_name, GEN_STATE_MAGIC,
+                GEN_STATE_FORMAT_VERSION
+            )
+        except (IOError, OSError, PackedFormatError):
+            return state
+
+        try:
+            misc = reader.value(MISC)
+        finally:
+            reader.close()
+
+        if misc["env"] == env:
+            state.descriptions.update(misc["descriptions"])
+
+        return state
+
+    def fingerprint(self, desc, *deps):
+        """ Returns fingerprint of `desc` given fingerprints of descriptions
+it depends on.
+        """
+        if self.env is None:
+            return None
+
+        h = sha1(self.env.encode("utf-8"))
+        h.update(pygenerate(desc).w.getvalue().encode("utf-8"))
+        for dep in deps:
+            h.update(dep.encode("utf-8"))
+        return h.hexdigest()
+
+    def is_actual(self, desc, fingerprint):
+        if fingerprint is None:
+            return False
+
+        try:
+            saved, paths = self.descriptions[desc.name]
+        except KeyError:
+            return False
+
+        if saved != fingerprint:
+            return False
+
+        src = self.src
+        return all(isfile(join(src, p)) for p in paths)
+
+    def account(self, desc, fingerprint, paths):
+        if fingerprint is None:
+            self.descriptions.pop(desc.name, None)
+        else:
+            self.descriptions[desc.name] = (fingerprint, list(paths))
+
+    def forget_others(self, descs):
+        "Forgets all descriptions but `descs`."
+        names = set(desc.name for desc in descs)
+        for name in list(self.descriptions):
+            if name not in names:
+                del self.descriptions[name]
+
+    def save(self):
+        if self.env is None:
+            return
+
+        w = PackedWriter(GEN_STATE_MAGIC, GEN_STATE_FORMAT_VERSION)
+        w.value(MISC, dict(
+            env = self.env,
+            descriptions = self.descriptions
+        ))
+        w.write(self.file_name)
@@ -0,0 +1,166 @@
+__all__ = [
+    "HeaderParseCache"
+]
+
+from common import (
+    PackedFormatError,
+    PackedReader,
+    PackedWriter,
+    path2tuple
+)
+from source import (
+    PP_INCLUDE
+)
+from hashlib import (
+    sha1
+)
+from os import (
+    makedirs
+)
+from os.path import (
+    isdir,
+    isfile,
+    join
+)
+
+
+HPC_MAGIC = b"QDTHPC"
+# Increase it manually if the layout or the event format is changed.
+HPC_FORMAT_VERSION = 1
+
+# The value is a `dict` with preprocessing events and Git blob SHA1 of
+# headers the events depend on.
+EVTS = b"EVTS"
+
+
+class HeaderParseCache(object):
+    """ Content addressed store of header preprocessing results. It is
+suitable for `parse_cache` argument of `Header.co_build_inclusions`.
+
+A result is keyed by Git blob SHA1 of the header and its path. So, it is
+shared by all QEMU versions having same header. Because the result also
+depends on included headers, blobs of all headers mentioned in the result are
+saved too and compared with blobs of current commit on lookup.
+    """
+
+    def __init__(self, repo, commit_sha, work_dir, include_paths, cache_dir):
+        """
+:param repo: `git.Repo` with QEMU source.
+:param commit_sha: the commit being analyzed.
+:param work_dir: directory with the source of that commit, see
+    `Header.co_build_inclusions`.
+:param include_paths: see `Header.co_build_inclusions`.
+:param cache_dir: directory for cache entries.
+        """
+        self.cache_dir = cache_dir
+
+        # absolute include directory -> its path inside Git repository
+        self.include_dirs = dict(
+            (join(work_dir, path), path) for path, __ in include_paths
+        )
+
+        # path inside Git repository -> blob SHA1
+        self.blobs = blobs = {}
+        ls = repo.git.ls_tree("-r", commit_sha, "--",
+            *list(path for path, __ in include_paths)
+        )
+        for line in ls.splitlines():
+            info, path = line.split("\t", 1)
+            blobs[path] = info.split()[2]
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def git_path(*parts):
+        return "/".join(p for part in parts for p in path2tuple(part) if p)
+
+    def header_key(self, start_dir, prefix):
+        path = self.git_path(self.include_dirs[start_dir], prefix)
+        blob = self.blobs.get(path, None)
+        if blob is None:
+            # the header is not tracked
+            return None
+
+        return sha1("\0".join([
+            blob, path, str(HPC_FORMAT_VERSION)
+        ]).encode("utf-8")).hexdigest()
+
+    def entry_name(self, key):
+        return join(self.cache_dir, key[:2], key)
+
+    def iter_dep_paths(self, events):
+        """ Yields paths inside Git repository of files which may affect
+`events`. Those are all headers mentioned in the events and all locations
+an inclusion could be found in.
+        """
+        include_dirs = list(self.include_dirs.values())
+        git_path = self.git_path
+
+        for e in events:
+            names = [e[1]]
+            if e[0] == PP_INCLUDE:
+                names.append(e[2])
+                # quoted inclusion can be relative to the includer
+                includer_dir = path2tuple(e[1])[:-1]
+                if includer_dir:
+                    for d in include_dirs:
+                        yield git_path(d, *(includer_dir + (e[2],)))
+
+            for name in names:
+                for d in include_dirs:
+                    yield git_path(d, name)
+
+    def get(self, start_dir, prefix):
+        key = self.header_key(start_dir, prefix)
+        if key is None:
+            return None
+
+        entry = self.entry_name(key)
+        if not isfile(entry):
+            self.misses += 1
+            return None
+
+        try:
+            r = PackedReader(entry, HPC_MAGIC, HPC_FORMAT_VERSION)
+            try:
+                value = r.value(EVTS)
+            finally:
+                r.close()
+        except PackedFormatError:
+            self.misses += 1
+            return None
+
+        blobs = self.blobs
+        for path, blob in value["deps"].items():
+            if blobs.get(path, None) != blob:
+                self.misses += 1
+                return None
+
+        self.hits += 1
+        return value["events"]
+
+    def put(self, start_dir, prefix, events):
+        key = self.header_key(start_dir, prefix)
+        if key is None:
+            return
+
+        blobs = self.blobs
+        deps = dict(
+            (path, blobs.get(path, None))
+                for path in self.iter_dep_paths(events)
+        )
+
+        entry = self.entry_name(key)
+        entry_dir = join(self.cache_dir, key[:2])
+        if not isdir(entry_dir):
+            try:
+                makedirs(entry_dir)
+            except OSError:
+                # created concurrently
+                if not isdir(entry_dir):
+                    raise
+
+        w = PackedWriter(HPC_MAGIC, HPC_FORMAT_VERSION)
+        w.value(EVTS, dict(events = events, deps = deps))
+        w.write(entry)
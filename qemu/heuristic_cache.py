@@ -0,0 +1,120 @@
+__all__ = [
+    "save_heuristic_cache"
+  , "load_commit_heuristics"
+]
+
+from common import (
+    PackedFormatError,
+    PackedReader,
+    PackedWriter
+)
+from .version import (
+    QVHDict
+)
+from binascii import (
+    unhexlify
+)
+
+
+QHC_MAGIC = b"QDTQHC"
+# Increase it manually if the layout below is changed.
+QHC_FORMAT_VERSION = 1
+
+# SHA1 of commits (20 bytes each), commit order defines row order
+SHAS = b"SHAS"
+# rows of value identifiers, see `save_heuristic_cache`
+ROWS = b"ROWS"
+# parameter names and values (`QVHDict` raw form)
+VALS = b"VALS"
+# heuristic DB hash and row layout
+MISC = b"MISC"
+
+
+def save_heuristic_cache(file_name, qh_hash, shas, params):
+    """ Saves heuristic parameters of all commits of a repository.
+
+:param qh_hash: see `calculate_qh_hash`.
+:param shas: SHA1 of commits.
+:param params: `dict`s of parameters (values are not converted by `QVHDict`)
+    of commits in same order.
+    """
+    names = sorted(set(name for p in params for name in p))
+
+    # value identifier 0 means the parameter is not defined for the commit
+    values = [None]
+    value_ids = {}
+
+    rows = []
+    for p in params:
+        row = []
+        for name in names:
+            try:
+                value = p[name]
+            except KeyError:
+                row.append(0)
+                continue
+
+            raw = QVHDict.pack(value)
+            try:
+                value_id = value_ids[raw]
+            except KeyError:
+                value_id = value_ids[raw] = len(values)
+                values.append(raw)
+            except TypeError: # not hashable value, it's not shared
+                value_id = len(values)
+                values.append(raw)
+
+            row.append(value_id)
+        rows.append(row)
+
+    row_fmt = "<%u%s" % (len(names), "H" if len(values) <= 0xFFFF else "I")
+
+    w = PackedWriter(QHC_MAGIC, QHC_FORMAT_VERSION)
+    w.section(SHAS, b"".join(unhexlify(sha) for sha in shas))
+    w.records(ROWS, row_fmt, rows)
+    w.value(VALS, (names, values))
+    w.value(MISC, dict(
+        qh_hash = qh_hash,
+        row_fmt = row_fmt
+    ))
+    w.write(file_name)
+
+
+def load_commit_heuristics(file_name, qh_hash, sha):
+    """ Returns parameters of commit `sha` in `QVHDict` raw form or `None`
+if the commit is not in the cache or the cache is outdated.
+    """
+    try:
+        r = PackedReader(file_name, QHC_MAGIC, QHC_FORMAT_VERSION)
+    except (IOError, OSError, PackedFormatError):
+        return None
+
+    try:
+        misc = r.value(MISC)
+        if misc["qh_hash"] != qh_hash:
+            return None
+
+        # The row is searched without decoding of SHA1 table.
+        binsha = unhexlify(sha)
+        offset, size = r.section(SHAS)
+        start, end = offset, offset + size
+        while True:
+            pos = r.buf.find(binsha, start, end)
+            if pos < 0:
+                return None
+            if (pos - offset) % 20 == 0:
+                break
+            start = pos + 1
+
+        names, values = r.value(VALS)
+        if names:
+            row = r.records(ROWS, misc["row_fmt"])[(pos - offset) // 20]
+        else:
+            row = ()
+    finally:
+        r.close()
+
+    return dict(
+        (name, values[value_id])
+            for name, value_id in zip(names, row) if value_id
+    )
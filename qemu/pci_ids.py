@@ -8,6 +8,8 @@ __all__ = [
       , "PCIDeviceId"
       , "PCIClassId"
   , "PCIClassification"
+  , "IdAllocator"
+  , "id_value"
 ]
 
 from re import (
@@ -20,8 +22,8 @@ from source import (
 from common import (
     co_find_eq
 )
-from six.moves import (
-    range as xrange
+from six import (
+    integer_types
 )
 
 re_pci_vendor = compile("PCI_VENDOR_ID_([A-Z0-9_]+)")
@@ -40,6 +42,45 @@ class PCIVendorIdNetherExistsNorCreated(RuntimeError):
 class PCIVendorIdMismatch(ValueError):
     pass
 
+
+def id_value(pci_id):
+    """ Returns integer value of a PCI identifier given by a string (e.g. a
+macro text) or an integer. `None` means that the value is unknown.
+    """
+    if isinstance(pci_id, integer_types):
+        return pci_id
+    try:
+        return int(pci_id, 0)
+    except (TypeError, ValueError):
+        return None
+
+
+class IdAllocator(object):
+    """ Tracks used integer identifiers and gives unused ones. Identifiers
+are never released. So, all identifiers below the previous result are used
+and the search continues from it. It gives O(1) amortized time.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = set()
+        self.cursor = 0
+
+    def use(self, value):
+        if value is not None:
+            self.used.add(value)
+
+    def allocate(self):
+        "Returns the least unused identifier below `limit` or `None`."
+        used, cursor = self.used, self.cursor
+        while cursor in used:
+            cursor += 1
+        self.cursor = cursor
+
+        if cursor < self.limit:
+            return cursor
+        return None
+
 """
 TODO: create named exception instead of any Exception
 """
@@ -61,15 +102,12 @@ class PCIId(object):
 
 class PCIVendorId (PCIId):
     def __init__(self, vendor_name, vendor_id):
-        if vendor_name in PCIId.db.vendors.keys():
+        if vendor_name in PCIId.db.vendors:
             raise PCIVendorIdAlreadyExists(vendor_name)
 
         PCIId.__init__(self, vendor_name, vendor_id)
 
-        self.device_pattern = compile(
-                "PCI_DEVICE_ID_%s_([A-Z0-9_]+)" % self.name)
-
-        PCIId.db.vendors[self.name] = self
+        PCIId.db.add_vendor(self)
 
     def find_macro(self):
         return Type["PCI_VENDOR_ID_%s" % self.name]
@@ -83,18 +121,18 @@ class PCIVendorId (PCIId):
 class PCIDeviceId (PCIId):
     def __init__(self, vendor_name, device_name, device_id):
         dev_key = PCIClassification.gen_device_key(vendor_name, device_name)
-        if dev_key in PCIId.db.devices.keys():
+        if dev_key in PCIId.db.devices:
             raise PCIDeviceIdAlreadyExists("Vendor %s, Device %s" % vendor_name,
                     device_name)
 
         PCIId.__init__(self, device_name, device_id)
 
-        if not vendor_name in PCIId.db.vendors.keys():
+        if not vendor_name in PCIId.db.vendors:
             self.vendor = PCIVendorId(vendor_name, 0xFFFF)
         else:
             self.vendor = PCIId.db.vendors[vendor_name]
 
-        PCIId.db.devices[dev_key] = self
+        PCIId.db.add_device(dev_key, self)
 
     def find_macro(self):
         return Type["PCI_DEVICE_ID_%s_%s" % (self.vendor.name, self.name)]
@@ -108,7 +146,7 @@ class PCIDeviceId (PCIId):
 
 class PCIClassId (PCIId):
     def __init__(self, class_name, class_id):
-        if class_name in PCIId.db.classes.keys():
+        if class_name in PCIId.db.classes:
             raise Exception("PCI class %s already exists" % class_name)
 
         PCIId.__init__(self, class_name, class_id)
@@ -126,17 +164,37 @@ class PCIClassId (PCIId):
 
 class PCIClassification(object):
     def __init__(self, built = False):
-        self.vendors = {}
-        self.devices = {}
-        self.classes = {}
+        self.clear()
         self.built = built
 
     def clear(self):
         self.vendors = {}
         self.devices = {}
         self.classes = {}
+        # `id_value` -> first registered `PCIId` with it
+        self.vendors_by_id = {}
+        self.devices_by_id = {}
+        # 0xFFFF means no vendor/device
+        self.vid_allocator = IdAllocator(0xFFFF)
+        self.did_allocator = IdAllocator(0xFFFF)
         self.built = False
 
+    def add_vendor(self, vendor):
+        self.vendors[vendor.name] = vendor
+
+        value = id_value(vendor.id)
+        if value is not None:
+            self.vendors_by_id.setdefault(value, vendor)
+            self.vid_allocator.use(value)
+
+    def add_device(self, dev_key, device):
+        self.devices[dev_key] = device
+
+        value = id_value(device.id)
+        if value is not None:
+            self.devices_by_id.setdefault(value, device)
+            self.did_allocator.use(value)
+
     def find_vendors(self, **kw):
         return co_find_eq(self.vendors.values(), **kw)
 
@@ -168,24 +226,41 @@ class PCIClassification(object):
         gen.line("del " + gen.nameof(self) + ".tmp")
 
     def gen_uniq_vid(self):
-        for i in xrange(0, 0xFFFF):
-            for v in self.vendors.values():
-                if v.id.upper() == "0x%X" % i:
-                    break;
-            else:
-                return "0x%X" % i
-        # no uniq ID
-        return "0xDEAD"
+        vid = self.vid_allocator.allocate()
+        if vid is None:
+            # no uniq ID
+            return "0xDEAD"
+        return "0x%X" % vid
 
     def gen_uniq_did(self):
-        for i in xrange(0, 0xFFFF):
-            for d in self.devices.values():
-                if d.id.upper() == "0x%X" % i:
-                    break;
-            else:
-                return "0x%X" % i
-        # no uniq ID
-        return "0xBEAF"
+        did = self.did_allocator.allocate()
+        if did is None:
+            # no uniq ID
+            return "0xBEAF"
+        return "0x%X" % did
+
+    def vendor_of_device_macro(self, name):
+        """ Given a name of device ID macro like
+`PCI_DEVICE_ID_<vendor name>_<device name>`, returns the vendor and the
+device name. A vendor name may contain underscores, the longest known one is
+preferred. `(None, None)` is returned if there is no such vendor.
+        """
+        mi = re_pci_device.match(name)
+        if mi is None:
+            return None, None
+
+        rest = mi.group(1)
+        vendors = self.vendors
+
+        sep = len(rest) - 1 # device name must not be empty
+        while True:
+            sep = rest.rfind("_", 0, sep)
+            if sep < 1: # vendor name must not be empty
+                return None, None
+
+            v = vendors.get(rest[:sep])
+            if v is not None:
+                return v, rest[sep + 1:]
 
     @staticmethod
     def build():
@@ -194,30 +269,34 @@ class PCIClassification(object):
         if db.built:
             db.clear()
 
+        devices = []
+
         for t in Type.reg.values():
-            if type(t) == Macro:
-                mi = re_pci_vendor.match(t.name)
-                if mi:
-                    PCIVendorId(mi.group(1), t.text)
-                    continue
-
-                mi = re_pci_class.match(t.name)
-                if mi:
-                    # print 'PCI class %s' % mi.group(1)
-                    PCIClassId(mi.group(1), t.text)
-                    continue
+            if type(t) != Macro:
+                continue
+
+            name = t.name
+            # Most of macros are not related to PCI.
+            if not name.startswith("PCI_"):
+                continue
+
+            mi = re_pci_vendor.match(name)
+            if mi:
+                PCIVendorId(mi.group(1), t.text)
+                continue
+
+            mi = re_pci_class.match(name)
+            if mi:
+                PCIClassId(mi.group(1), t.text)
+                continue
+
+            devices.append(t)
 
         # All PCI vendors must be defined before any device.
-        for t in Type.reg.values():
-            if type(t) == Macro:
-                mi = re_pci_device.match(t.name)
-                if mi:
-                    for v in db.vendors.values():
-                        mi = v.device_pattern.match(t.name)
-                        if mi:
-                            PCIDeviceId(v.name, mi.group(1), t.text)
-                            break;
-                    continue
+        for t in devices:
+            v, device_name = db.vendor_of_device_macro(t.name)
+            if v is not None:
+                PCIDeviceId(v.name, device_name, t.text)
 
         db.built = True
 
@@ -278,15 +357,20 @@ class PCIClassification(object):
                 if did is None:
                     raise Exception("No identification information was got!")
                 # Return first device with such ID
-                for d in self.devices.values():
-                    if did.upper() == d.id.upper():
-                        return d
+                value = id_value(did)
+                if value is None:
+                    for d in self.devices.values():
+                        if did.upper() == d.id.upper():
+                            return d
+                else:
+                    try:
+                        return self.devices_by_id[value]
+                    except KeyError:
+                        pass
                 raise Exception("No device with id %s was found!" % did.upper())
             # Try get vendor by device name
-            for v in self.vendors.values():
-                if v.device_pattern.match(name):
-                    break
-            else:
+            v, __ = self.vendor_of_device_macro(name)
+            if v is None:
                 raise Exception("Cannot get vendor by device name %s." % name)
 
         if name is not None:
@@ -328,11 +412,15 @@ class PCIClassification(object):
  exists and cannot be created because of no id is specified" % name)
             return v
         elif vid is not None:
-            v = None
-            for ven in self.vendors.values():
-                if ven.id == vid:
-                    v = ven
-                    break
+            value = id_value(vid)
+            if value is None:
+                v = None
+                for ven in self.vendors.values():
+                    if ven.id == vid:
+                        v = ven
+                        break
+            else:
+                v = self.vendors_by_id.get(value)
             if v is None:
                 raise PCIVendorIdNetherExistsNorCreated("No vendor with id %s\
  was found and no one can be created because of no name is\
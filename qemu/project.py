@@ -4,6 +4,7 @@ __all__ = [
 
 from os import (
     makedirs,
+    name as os_name,
     remove
 )
 from os.path import (
@@ -22,17 +23,29 @@ from .machine_description import (
 from common import (
     same_sets,
     callco,
-    co_find_eq
+    co_find_eq,
+    CoReturn
 )
 from .makefile_patching import (
     patch_makefile
 )
+from .gen_state import (
+    GenState,
+    generator_fingerprint,
+    qvc_fingerprint
+)
 from codecs import (
     open
 )
 from collections import (
     defaultdict
 )
+from multiprocessing import (
+    Pool
+)
+from six import (
+    StringIO
+)
 from source import (
     disable_auto_lock_sources,
     enable_auto_lock_sources,
@@ -55,6 +68,75 @@ config_flags["hw"] = "$(CONFIG_SOFTMMU)"
 # using other settings. But as this tool generates devices only. So, the
 # settings is chosen this way.
 
+try:
+    from multiprocessing import (
+        get_start_method
+    )
+except ImportError: # Python 2 forks on POSIX only
+    def get_start_method():
+        return "fork" if os_name == "posix" else "spawn"
+
+
+def render_source(s, with_chunk_graph = False):
+    """ Generates content of the source `s`. Returns it and the chunk graph
+(`None` if not requested).
+    """
+    # TODO: current value of inherit_references is dictated by Qemu
+    # coding policy. Hence, version API must be used there.
+    inherit_references = type(s) is Header
+
+    f = s.generate(inherit_references = inherit_references)
+
+    content = StringIO()
+    f.generate(content)
+
+    if with_chunk_graph:
+        graph = StringIO()
+        f.gen_chunks_gv(graph)
+        graph = graph.getvalue()
+    else:
+        graph = None
+
+    return content.getvalue(), graph
+
+
+def gen_environment(with_chunk_graph = False, known_targets = None):
+    """ Returns fingerprint of generation environment for `GenState` or
+`None` if it's unknown. Arguments are same as `QProject.co_gen` has.
+    """
+    qvc = qvc_fingerprint()
+    if qvc is None:
+        return None
+
+    return "%s:%s:%s:%s" % (generator_fingerprint(), qvc, with_chunk_graph,
+        ",".join(sorted(known_targets or ()))
+    )
+
+
+def update_file(file_name, data):
+    """ Writes `data` (`bytes`) to the file if its content differs. So,
+modification time of a file is preserved if the content is same.
+    """
+    if isfile(file_name):
+        with open(file_name, "rb") as f:
+            if f.read() == data:
+                return False
+        remove(file_name)
+
+    with open(file_name, "wb") as f:
+        f.write(data)
+
+    return True
+
+
+# Sources to be rendered by worker processes of `QProject.co_gen_parallel`.
+# Workers get them (and the rest of the model) by forking.
+_sources_to_render = None
+
+
+def _render_source(idx, with_chunk_graph):
+    return render_source(_sources_to_render[idx], with_chunk_graph)
+
 
 class QProject(object):
 
@@ -98,18 +180,72 @@ class QProject(object):
         "Backward compatibility wrapper for co_gen_all"
         callco(self.co_gen_all(*args, **kw))
 
-    def co_gen_all(self, qemu_src, **gen_cfg):
+    def co_gen_all(self, qemu_src, jobs = 1, incremental = False, **gen_cfg):
+        """
+:param jobs: number of processes generating sources of devices. If it's
+    greater than 1, then `co_gen_parallel` is used for devices.
+:param incremental: skip descriptions which are not changed since previous
+    generation (see `GenState`). A machine depends on all devices because
+    it's generated using their models.
+        """
         disable_auto_lock_sources()
 
-        # First, generate all devices, then generate machines
-        for desc in self.descriptions:
-            if not isinstance(desc, MachineNode):
-                yield self.co_gen(desc, qemu_src, **gen_cfg)
-
+        devices = []
+        machines = []
         for desc in self.descriptions:
             if isinstance(desc, MachineNode):
-                desc.link()
-                yield self.co_gen(desc, qemu_src, **gen_cfg)
+                machines.append(desc)
+            else:
+                devices.append(desc)
+
+        if incremental:
+            state = GenState.load(qemu_src, gen_environment(**gen_cfg))
+
+            fingerprints = {}
+            for desc in devices:
+                fingerprints[desc] = state.fingerprint(desc)
+            devices_fingerprints = list(fingerprints[d] for d in devices)
+            for desc in machines:
+                fingerprints[desc] = state.fingerprint(desc,
+                    *devices_fingerprints
+                )
+
+            machines = list(
+                desc for desc in machines
+                    if not state.is_actual(desc, fingerprints[desc])
+            )
+            # Models of all devices are required to generate a machine.
+            if not machines:
+                devices = list(
+                    desc for desc in devices
+                        if not state.is_actual(desc, fingerprints[desc])
+                )
+        else:
+            state = None
+
+        # First, generate all devices, then generate machines
+        if jobs > 1 and len(devices) > 1 and get_start_method() == "fork":
+            types = yield self.co_gen_parallel(devices, qemu_src, jobs,
+                **gen_cfg
+            )
+        else:
+            types = []
+            for desc in devices:
+                qom_t = yield self.co_gen(desc, qemu_src, **gen_cfg)
+                types.append(qom_t)
+
+        for desc in machines:
+            desc.link()
+            qom_t = yield self.co_gen(desc, qemu_src, **gen_cfg)
+            types.append(qom_t)
+
+        if state is not None:
+            for desc, qom_t in zip(devices + machines, types):
+                state.account(desc, fingerprints[desc],
+                    (s.path for s in qom_t.sources)
+                )
+            state.forget_others(self.descriptions)
+            state.save()
 
         enable_auto_lock_sources()
 
@@ -151,51 +287,128 @@ class QProject(object):
         yield qom_t.co_gen_sources()
 
         for s in qom_t.sources:
-            spath = join(src, s.path)
-            sdir, sname = split(spath)
+            yield True
+            content, graph = render_source(s, with_chunk_graph)
 
-            if isfile(spath):
-                yield True
-                remove(spath)
-            elif not isdir(sdir):
-                yield True
-                makedirs(sdir)
+            yield self.co_write_source(desc, src, s, content, graph,
+                known_targets
+            )
 
-            if type(s) is Source: # Exactly a compile module
-                yield
-                self.register_in_build_system(sdir, known_targets)
+        raise CoReturn(qom_t)
 
-            yield True
+    def co_gen_parallel(self, devices, src, jobs,
+        with_chunk_graph = False,
+        known_targets = None
+    ):
+        """ Generates `devices` like `co_gen` does but modules (not headers)
+are rendered by a pool of processes. Models of devices are built and headers
+are rendered by this process because models of following descriptions
+(machines) depend on them. Workers inherit the model (including the QVC) by
+forking. Files are written in same order as by `co_gen`. Descriptions in
+`devices` must not depend on each other. Returns QOM types of `devices`.
+
+    Unlike `co_gen`, all models are built and all headers are rendered
+before any module is rendered. It does not change modules. Rendering of a
+header changes the model of this header only: it adds inclusions to it and
+propagates references to its includers (`Header.propagate_references`).
+Rendering of a module changes nothing the output depends on. So, results of
+workers are complete even though changes of the model made by them are lost.
+A module of a device includes headers of this device and QEMU headers only
+because `devices` are independent. So, changes made by rendering of headers
+of other devices do not reach it. Its own headers are rendered before it in
+both orders.
+        """
+        global _sources_to_render
+
+        types = []
+        rendered = {}
+        modules = []
+
+        for desc in devices:
+            qom_t = desc.gen_type()
+
+            yield qom_t.co_gen_sources()
+
+            for s in qom_t.sources:
+                if type(s) is Source:
+                    modules.append(s)
+                else:
+                    yield True
+                    rendered[s] = render_source(s, with_chunk_graph)
+
+            types.append(qom_t)
+
+        _sources_to_render = modules
+        pool = Pool(min(jobs, len(modules)))
+        try:
+            for idx, s in enumerate(modules):
+                rendered[s] = pool.apply_async(_render_source,
+                    (idx, with_chunk_graph)
+                )
+            pool.close()
+
+            for desc, qom_t in zip(devices, types):
+                for s in qom_t.sources:
+                    res = rendered[s]
+                    if type(s) is Source:
+                        while not res.ready():
+                            yield False
+
+                        # The result must be got anyway to re-raise an
+                        # exception.
+                        res = res.get()
+
+                    content, graph = res
+
+                    yield self.co_write_source(desc, src, s, content, graph,
+                        known_targets
+                    )
+
+            pool.join()
+        finally:
+            pool.terminate()
+            _sources_to_render = None
 
-            # TODO: current value of inherit_references is dictated by Qemu
-            # coding policy. Hence, version API must be used there.
-            inherit_references = type(s) is Header
+        raise CoReturn(types)
 
-            f = s.generate(inherit_references = inherit_references)
+    def co_write_source(self, desc, src, s, content, graph, known_targets):
+        "Writes content of `s` generated by `render_source`."
+        spath = join(src, s.path)
+        sdir, sname = split(spath)
 
-            with open(spath, mode = "wb", encoding = "utf-8") as stream:
-                f.generate(stream)
+        if not isdir(sdir):
+            yield True
+            makedirs(sdir)
+
+        if type(s) is Source: # Exactly a compile module
+            yield True
+            self.register_in_build_system(sdir, known_targets)
 
-            if with_chunk_graph:
-                yield True
-                f.gen_chunks_gv_file(spath + ".chunks.gv")
+        yield True
 
-            # Only sources need to be registered in the build system
-            if type(s) is not Source:
-                continue
+        # Unchanged files are not touched to prevent their recompilation.
+        update_file(spath, content.encode("utf-8"))
 
+        if graph is not None:
             yield True
+            update_file(spath + ".chunks.gv", graph.encode("utf-8"))
 
-            sbase, _ = splitext(sname)
-            object_name = sbase + ".o"
+        # Only sources need to be registered in the build system
+        if type(s) is not Source:
+            return
 
-            hw_path = join(src, "hw")
-            class_hw_path = join(hw_path, desc.directory)
-            Makefile_objs_class_path = join(class_hw_path, "Makefile.objs")
+        yield True
 
-            patch_makefile(Makefile_objs_class_path, object_name,
-                obj_var_names[desc.directory], config_flags[desc.directory]
-            )
+        sbase, _ = splitext(sname)
+        object_name = sbase + ".o"
+
+        hw_path = join(src, "hw")
+        class_hw_path = join(hw_path, desc.directory)
+        Makefile_objs_class_path = join(class_hw_path, "Makefile.objs")
+
+        patch_makefile(Makefile_objs_class_path, object_name,
+            obj_var_names[desc.directory], config_flags[desc.directory]
+        )
 
     def __var_base__(self):
         return "project"
@@ -1,7 +1,9 @@
 __all__ = [
     "InInstr",
     "TraceInstr",
+    "TBIndex",
     "TBCache",
+    "TBSpill",
     "QTrace",
     "QEMULog",
 ]
@@ -18,6 +20,30 @@ from common import (
 from traceback import (
     print_exc
 )
+from array import (
+    array
+)
+from bisect import (
+    bisect_left,
+    bisect_right
+)
+from collections import (
+    deque,
+    OrderedDict
+)
+from sys import (
+    getsizeof
+)
+from tempfile import (
+    TemporaryFile
+)
+from weakref import (
+    WeakValueDictionary
+)
+from six.moves.cPickle import (
+    dumps,
+    loads
+)
 
 
 # less value = more info
@@ -90,81 +116,231 @@ class TraceInstr(object):
         return str(self.in_instr)
 
 
-class undefined: pass
+# `array` type code for addresses
+ADDR = "Q"
+
+class TBIndex(object):
+    """ Versioned index of all `TBCache` generations. For a key (instruction
+address, TB address or TB identifier) it remembers ascending versions of
+generations defining the key. So, a lookup through a generation and all its
+backing generations is a bisection.
+    """
+
+    def __init__(self):
+        # version -> `TBCache`
+        self.generations = []
+        # key -> versions
+        self.instrs = {}
+        self.tbs = {}
+        self.links = {}
+
+    @staticmethod
+    def _add(index, key, version):
+        versions = index.get(key, None)
+        if versions is None:
+            index[key] = [version]
+        elif versions[-1] != version:
+            versions.append(version)
+
+    @staticmethod
+    def _look(index, key, version):
+        versions = index.get(key, None)
+        if versions is None:
+            return None
+        idx = bisect_right(versions, version)
+        if idx:
+            return versions[idx - 1]
+        return None
+
+    def look_instr(self, addr, version):
+        v = self._look(self.instrs, addr, version)
+        if v is None:
+            return None
+        c = self.generations[v]
+        return (c.instr_at(addr), c)
+
+    def look_tb(self, addr, version):
+        v = self._look(self.tbs, addr, version)
+        if v is None:
+            return None
+        c = self.generations[v]
+        return (c.tbMap[addr], c)
+
+    def look_link(self, start_id, version):
+        v = self._look(self.links, start_id, version)
+        if v is None:
+            return None
+        c = self.generations[v]
+        return (c.links[start_id], c)
+
 
 class TBCache(object):
+    """ A generation of translated code cache. Instructions are kept sorted
+by address. Instructions of one generation do not overlap.
+
+A retired generation (it has newer one) can be compacted: only instruction
+start addresses are kept. Then, a compacted generation can be spilled to disk
+(see `TBSpill`).
+    """
 
     def __init__(self, back):
-        self.map = {}
         self.links = {}
         self.tbMap = {}
         self.back = back
 
-        # remembers resolutions by `back` reference
-        self.back_map_lookup_cache = {}
+        if back is None:
+            self.index = TBIndex()
+        else:
+            self.index = back.index
+
+        generations = self.index.generations
+        self.version = len(generations)
+        generations.append(self)
+
+        # sorted start addresses, end addresses and instructions
+        self.starts = array(ADDR)
+        self.ends = array(ADDR)
+        self.instrs = []
+
+        # estimated size of compacted instructions (bytes)
+        self.size = 0
+
+        # `TBSpill` keeping instructions of spilled generation
+        self.spill = None
+
+    def instr_at(self, addr):
+        "Returns instruction starting at `addr` or `None`."
+        if self.spill is None:
+            starts, instrs = self.starts, self.instrs
+        else:
+            starts, instrs = self.spill.load(self)
+
+        idx = bisect_left(starts, addr)
+        if idx < len(starts) and starts[idx] == addr:
+            return instrs[idx]
+        return None
+
+    def compact(self):
+        # Ends are only required to detect overlapping.
+        self.ends = None
+
+        instrs = self.instrs
+        self.size = getsizeof(self.starts) + getsizeof(instrs) + sum(
+            getsizeof(i) + getsizeof(i.__dict__) + getsizeof(i.l)
+          + getsizeof(i.disas) for i in instrs
+        )
+
+    def add_tb(self, addr, tb):
+        self.tbMap[addr] = tb
+        self.index._add(self.index.tbs, addr, self.version)
+
+    def add_link(self, start_id, end_id):
+        self.links[start_id] = end_id
+        self.index._add(self.index.links, start_id, self.version)
 
     def lookTBDown(self, addr):
         "Returns TB index and corresponding cache or None"
-        c = self
-        while c:
-            if addr in c.tbMap:
-                return (c.tbMap[addr], c)
-            c = c.back
-        return None
+        return self.index.look_tb(addr, self.version)
 
     def lookLinkDown(self, start_id):
-        c = self
-        while c:
-            if start_id in c.links:
-                return (c.links[start_id], c)
-            c = c.back
-        return None
+        return self.index.look_link(start_id, self.version)
 
     def lookInstrDown(self, addr):
-        upper_mlc = None
-        mlc = None
-
-        c = self
-        while c:
-            i = c.map.get(addr, None)
-            # `addr` is not at the beginning of `i`. Hence, `i` probably
-            # overwrites the instruction a caller looks for.
-            if i is not None and i.addr == addr:
-                res = (i, c)
-                if upper_mlc is not None:
-                    upper_mlc[addr] = res
-                return res
-
-            upper_mlc = mlc
-
-            mlc = c.back_map_lookup_cache
-            res = mlc.get(addr, undefined)
-            if res is not undefined:
-                if upper_mlc is not None:
-                    upper_mlc[addr] = res
-                return res
-
-            c = c.back
-
-        # Backing caches are considered constant.
-        # So, we can remember misses in too.
-        self.back_map_lookup_cache[addr] = None
-        return None
+        """ Returns the instruction starting at `addr` and the cache it
+belongs to or None. Note that if `addr` is not at the beginning of an
+instruction, then that instruction probably overwrites the instruction a
+caller looks for. So, backing caches are looked up.
+        """
+        return self.index.look_instr(addr, self.version)
 
     def commit(self, instr):
-        m = self.map
-        for addr in range(instr.addr, instr.addr + instr.size):
-            m[addr] = instr
+        addr = instr.addr
+        idx = bisect_left(self.starts, addr)
+        self.starts.insert(idx, addr)
+        self.ends.insert(idx, addr + instr.size)
+        self.instrs.insert(idx, instr)
 
-    def overlaps(self, addr, size):
-        m = self.map
-        for addr in range(addr, addr + size):
-            if addr in m:
-                return True
+        self.index._add(self.index.instrs, addr, self.version)
 
+    def overlaps(self, addr, size):
+        idx = bisect_right(self.starts, addr)
+        if idx and self.ends[idx - 1] > addr:
+            return True
+        if idx < len(self.starts) and self.starts[idx] < addr + size:
+            return True
         return False
 
 
+class TBSpill(object):
+    """ Keeps instructions of compacted `TBCache` generations in a temporary
+file. Few last used generations are kept loaded. A loaded instruction is same
+object as before spilling while it's referenced somewhere (e.g. by a
+`TraceInstr`).
+    """
+
+    def __init__(self, loaded_limit = 4):
+        self.file = TemporaryFile()
+        # cache -> (offset, size)
+        self.offsets = {}
+        # cache -> (starts, instrs)
+        self.loaded = OrderedDict()
+        self.loaded_limit = loaded_limit
+        # (cache version, addr) -> `InInstr` referenced outside
+        self.alive = WeakValueDictionary()
+
+    def put(self, cache):
+        alive = self.alive
+        version = cache.version
+        for i in cache.instrs:
+            alive[(version, i.addr)] = i
+
+        data = dumps(
+            list((i.addr, i.l, i.size, i.tb, i.first) for i in cache.instrs),
+            protocol = 2
+        )
+
+        f = self.file
+        f.seek(0, 2)
+        self.offsets[cache] = (f.tell(), len(data))
+        f.write(data)
+
+        cache.starts = cache.instrs = None
+        cache.spill = self
+
+    def load(self, cache):
+        loaded = self.loaded
+        try:
+            res = loaded.pop(cache)
+        except KeyError:
+            offset, size = self.offsets[cache]
+
+            f = self.file
+            f.seek(offset)
+
+            alive = self.alive
+            version = cache.version
+            instrs = []
+            for addr, l, isize, tb, first in loads(f.read(size)):
+                i = alive.get((version, addr))
+                if i is None:
+                    i = InInstr(l)
+                    i.size, i.tb, i.first = isize, tb, first
+                    alive[(version, addr)] = i
+                instrs.append(i)
+
+            res = (array(ADDR, (i.addr for i in instrs)), instrs)
+
+            if len(loaded) >= self.loaded_limit:
+                loaded.popitem(last = False)
+
+        loaded[cache] = res
+        return res
+
+    def close(self):
+        self.file.close()
+        self.loaded.clear()
+
+
 hexDigits = set("0123456789abcdefABCDEF")
 
 
@@ -236,11 +412,33 @@ EMPTY = tuple()
 
 class QEMULog(object):
 
-    def __init__(self, file_name, limit = None):
+    def __init__(self, file_name,
+        limit = None,
+        streaming = False,
+        memory_limit = None
+    ):
+        """
+:param limit: of log lines.
+:param streaming: traces are not retained (in `trace`) once consumed and
+    retired cache generations are compacted.
+:param memory_limit: estimated size of compacted cache generations (in
+    bytes) after which instructions of oldest of them are spilled to disk.
+    It's used in streaming mode only. Note that it only bounds memory used
+    by instructions. Generations themselves (`in_asm`), their TB maps and
+    links, the versioned index and `tbIdMap` are still kept in memory and
+    grow with the log.
+        """
         self.file_name = file_name
         self.trace = []
         self.in_asm = []
 
+        self.streaming = streaming
+        self.memory_limit = memory_limit
+        # compacted and not spilled generations, oldest first
+        self.compacted = deque()
+        self.compacted_size = 0
+        self.spill = None
+
         self.current_cache = TBCache(None)
         self.tbCounter = count(0)
         # across all caches
@@ -369,6 +567,28 @@ class QEMULog(object):
         self.in_asm.append(cur)
         self.current_cache = TBCache(cur)
 
+        if self.streaming:
+            self.retire_cache(cur)
+
+    def retire_cache(self, cache):
+        cache.compact()
+
+        compacted = self.compacted
+        compacted.append(cache)
+        self.compacted_size += cache.size
+
+        limit = self.memory_limit
+        if limit is None:
+            return
+
+        while compacted and self.compacted_size > limit:
+            if self.spill is None:
+                self.spill = TBSpill()
+
+            oldest = compacted.popleft()
+            self.compacted_size -= oldest.size
+            self.spill.put(oldest)
+
     def new_in_asm(self, in_asm):
         if DEBUG < 1:
             print("--- in_asm")
@@ -388,7 +608,7 @@ class QEMULog(object):
             instr.tb = tb
 
             if prev_instr is None:
-                self.current_cache.tbMap[instr.addr] = tb
+                self.current_cache.add_tb(instr.addr, tb)
                 self.tbIdMap[tb] = (instr.addr, len(self.in_asm))
                 instr.first = True
 
@@ -410,6 +630,11 @@ class QEMULog(object):
         t = QTrace(trace)
         t.cacheVersion = len(self.in_asm)
 
+        if self.streaming:
+            # A chain of traces would retain them all.
+            t.prev = None
+            return t
+
         t.prev = self.prevTrace
         if self.prevTrace is not None:
             self.prevTrace.next = t
@@ -457,7 +682,7 @@ class QEMULog(object):
         if link_start > self.max_linked_tb:
             self.max_linked_tb = link_start
 
-        c.links[link_start] = end_tb[0]
+        c.add_link(link_start, end_tb[0])
         if DEBUG < 1:
             print("%x:%u -> %x:%u" % (start, start_tb[0], end, end_tb[0]))
 
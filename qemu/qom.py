@@ -421,14 +421,14 @@ class QOMType(object):
             self.header = header = self.provide_header()
             sources.append(header)
 
-        yield
+        yield True
         self.source = source = self.gen_source()
         sources.append(source)
 
-        yield
+        yield True
         fill_header()
 
-        yield
+        yield True
         self.fill_source()
 
     def provide_header(self):
@@ -1,6 +1,9 @@
 __all__ = [
     "QType"
   , "co_update_device_tree"
+  , "co_build_arch_device_tree"
+  , "build_arch_device_tree"
+  , "find_free_ports"
 ]
 
 from .qemu_watcher import (
@@ -12,8 +15,11 @@ from debug import (
     GitLineVersionAdapter
 )
 from common import (
+    callco,
     pypath,
-    co_find_eq
+    co_find_eq,
+    CancelledCallee,
+    FailedCallee
 )
 from os.path import (
     join
@@ -21,6 +27,15 @@ from os.path import (
 from subprocess import (
     Popen
 )
+from sys import (
+    exc_info
+)
+from time import (
+    time
+)
+from traceback import (
+    format_exception
+)
 # use ours pyrsp
 with pypath("..pyrsp"):
     from pyrsp.rsp import (
@@ -103,8 +118,18 @@ class QType(object):
         gen.gen_end()
 
 
+def iter_children(node):
+    children = node.children
+    # `QType` has a `dict` of children while `QOMTreeReverser`'s node has a
+    # `list`.
+    if isinstance(children, dict):
+        return children.values()
+    return children
+
+
 def co_fill_children(qomtr_node, qtype_node, arch):
-    for c in qomtr_node.children:
+    "Adds children of `qomtr_node` (or another `QType`) to `qtype_node`."
+    for c in iter_children(qomtr_node):
         name = c.name
         if name in qtype_node.children:
             # Node already exists.
@@ -119,7 +144,24 @@ def co_fill_children(qomtr_node, qtype_node, arch):
         yield co_fill_children(c, qt, arch)
 
 
-def co_update_device_tree(qemu_exec, src_path, arch_name, root):
+def find_free_ports(count, start = 4321):
+    "Returns `count` different free TCP ports."
+    ports = []
+    for __ in range(count):
+        port = find_free_port(start)
+        if port is None:
+            raise RuntimeError("No free TCP port starting from %u" % start)
+        ports.append(port)
+        start = port + 1
+    return ports
+
+
+def co_update_device_tree(qemu_exec, src_path, arch_name, root,
+    port = None
+):
+    """
+:param port: for gdbserver, a free one is looked for if not given.
+    """
     dic = create_dwarf_cache(qemu_exec)
 
     gvl_adptr = GitLineVersionAdapter(src_path)
@@ -130,7 +172,8 @@ def co_update_device_tree(qemu_exec, src_path, arch_name, root):
         line_adapter = gvl_adptr
     )
 
-    port = find_free_port(4321)
+    if port is None:
+        port = find_free_port(4321)
     qemu_debug_addr = "localhost:%u" % port
     Popen(["gdbserver", qemu_debug_addr, qemu_exec])
 
@@ -158,3 +201,51 @@ def co_update_device_tree(qemu_exec, src_path, arch_name, root):
         root,
         arch_name
     )
+
+
+def co_build_arch_device_tree(binaries, src_path, arch, ports, root,
+    message
+):
+    """ Updates device tree `root` using first suitable QEMU binary from
+`binaries`. gdbserver for a binary listens corresponding port from `ports`.
+`arch` is added to `root.arches` on success. Failures are described in
+`message` (a `list` of strings).
+    """
+    for qemu_exec, port in zip(binaries, ports):
+        try:
+            yield co_update_device_tree(qemu_exec, src_path, arch, root,
+                port = port
+            )
+        except Exception as e:
+            message.extend([
+                "\n",
+                "Failure for binary '%s':\n" % qemu_exec,
+                "\n",
+            ])
+            if isinstance(e, (CancelledCallee, FailedCallee)):
+                message.extend(e.callee.traceback_lines)
+            else:
+                message.extend(format_exception(*exc_info()))
+        else:
+            root.arches.add(arch)
+            # Stop on first successful update.
+            break
+    else:
+        # All binaries are absent/useless.
+        message.insert(0, "Device Tree for %s isn't created:\n" % arch)
+
+
+def build_arch_device_tree(binaries, src_path, arch, ports):
+    """ Builds device tree of `arch` from scratch using
+`co_build_arch_device_tree`. It's intended for a worker process. Returns the
+tree, the failure message and the time spent.
+    """
+    t0 = time()
+
+    root = QType("device")
+    message = []
+    callco(co_build_arch_device_tree(binaries, src_path, arch, ports, root,
+        message
+    ))
+
+    return root, message, time() - t0
@@ -3,17 +3,10 @@ __all__ = [
 ]
 
 from common import (
+    PLYGrammar,
     def_tokens,
-    ee,
-    pypath
+    ee
 )
-with pypath("..ply"):
-    from ply.yacc import (
-        yacc
-    )
-    from ply.lex import (
-        lex
-    )
 from collections import (
     namedtuple as nt
 )
@@ -152,8 +145,8 @@ def p_digits(p):
 p_error = t_error
 
 
-lexer = lex()
-parser = yacc()
+# Lexer and parser are built on demand
+grammar = PLYGrammar(__name__)
 
 
 class QemuTypeName(object):
@@ -167,7 +160,7 @@ class QemuTypeName(object):
 
     @name.setter
     def name(self, value):
-        result = parser.parse(value, lexer = lexer, debug = QTN_DEBUG)
+        result = grammar.parse(value, debug = QTN_DEBUG)
 
         self.for_id_name, \
         self.for_header_name, \
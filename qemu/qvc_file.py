@@ -0,0 +1,310 @@
+__all__ = [
+    "QVC_MAGIC"
+  , "QVC_FORMAT_VERSION"
+  , "HeaderDBView"
+  , "save_qvc_file"
+  , "load_qvc_file"
+  , "load_qvc_header_db"
+]
+
+from common import (
+    PackedWriter,
+    PackedReader
+)
+from source import (
+    HDB_HEADER_PATH,
+    HDB_HEADER_IS_GLOBAL,
+    HDB_HEADER_INCLUSIONS,
+    HDB_HEADER_MACROS,
+    HDB_MACRO_NAME,
+    HDB_MACRO_TEXT,
+    HDB_MACRO_ARGS
+)
+from .pci_ids import (
+    PCIId,
+    PCIVendorId,
+    PCIDeviceId,
+    PCIClassId,
+    PCIClassification
+)
+from .qom_hierarchy import (
+    QType
+)
+
+
+QVC_MAGIC = b"QDTQVC"
+# Increase it manually if the layout below is changed.
+QVC_FORMAT_VERSION = 1
+
+# Section layouts. All string fields are string table indices.
+
+# path, is_global, first inclusion, inclusions count, first macro, macros count
+HDRS, HDRS_FMT = b"HDRS", "<IIIIII"
+# path of included header
+INCS, INCS_FMT = b"INCS", "<I"
+# name, text, first argument, arguments count (-1 means `None` arguments)
+MCRS, MCRS_FMT = b"MCRS", "<IIIi"
+# argument name
+MARG, MARG_FMT = b"MARG", "<I"
+# name, parent index (-1 for root), first macro, macros count, first arch,
+# arches count
+DTRE, DTRE_FMT = b"DTRE", "<IiIIII"
+# macro names and architectures of `DTRE`
+DTLS, DTLS_FMT = b"DTLS", "<I"
+# vendors, devices and classes (see `_pack_pci_classification`)
+PCIS = b"PCIS"
+# other fields (see `save_qvc_file`)
+MISC = b"MISC"
+
+
+class HeaderDBView(object):
+    """ Read-only sequence of header descriptions backed by a QVC file. It
+looks like the list returned by `SourceTreeContainer.create_header_db`. But
+a description is decoded only when accessed.
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+        self.headers = reader.records(HDRS, HDRS_FMT)
+        self.inclusions = reader.array(INCS, INCS_FMT)
+        self.macros = reader.records(MCRS, MCRS_FMT)
+        self.macro_args = reader.array(MARG, MARG_FMT)
+
+    def __len__(self):
+        return len(self.headers)
+
+    def __getitem__(self, idx):
+        return self.decode(self.headers[idx])
+
+    def __iter__(self):
+        for rec in self.headers:
+            yield self.decode(rec)
+
+    def path(self, idx):
+        return self.reader.string(self.headers[idx][0])
+
+    def iter_paths(self):
+        string = self.reader.string
+        for rec in self.headers:
+            yield string(rec[0])
+
+    def iter_index(self):
+        "Yields path and macro names of each header. It's faster than decode."
+        string = self.reader.string
+        macros = self.macros
+        for rec in self.headers:
+            yield string(rec[0]), list(
+                string(m[0]) for m in macros.slice(rec[4], rec[5])
+            )
+
+    def decode(self, rec):
+        string = self.reader.string
+        path, is_global, inc_first, inc_count, mac_first, mac_count = rec
+
+        inclusions = self.inclusions
+        macros = []
+
+        for name, text, args_first, args_count in self.macros.slice(
+            mac_first, mac_count
+        ):
+            m = { HDB_MACRO_NAME : string(name) }
+            text = string(text)
+            if text is not None:
+                m[HDB_MACRO_TEXT] = text
+            if args_count >= 0:
+                m[HDB_MACRO_ARGS] = list(
+                    string(self.macro_args[i])
+                        for i in range(args_first, args_first + args_count)
+                )
+            macros.append(m)
+
+        return {
+            HDB_HEADER_PATH : string(path),
+            HDB_HEADER_IS_GLOBAL : bool(is_global),
+            HDB_HEADER_INCLUSIONS : list(
+                string(inclusions[i])
+                    for i in range(inc_first, inc_first + inc_count)
+            ),
+            HDB_HEADER_MACROS : macros
+        }
+
+
+def _pack_header_db(w, list_headers):
+    string = w.string
+
+    headers = []
+    inclusions = []
+    macros = []
+    macro_args = []
+
+    for h in list_headers:
+        inc_first, mac_first = len(inclusions), len(macros)
+
+        for inc in h[HDB_HEADER_INCLUSIONS]:
+            inclusions.append(string(inc))
+
+        for m in h[HDB_HEADER_MACROS]:
+            args = m.get(HDB_MACRO_ARGS, None)
+            if args is None:
+                args_first, args_count = 0, -1
+            else:
+                args_first, args_count = len(macro_args), len(args)
+                macro_args.extend(string(a) for a in args)
+
+            macros.append((
+                string(m[HDB_MACRO_NAME]),
+                string(m.get(HDB_MACRO_TEXT, None)),
+                args_first,
+                args_count
+            ))
+
+        headers.append((
+            string(h[HDB_HEADER_PATH]),
+            1 if h[HDB_HEADER_IS_GLOBAL] else 0,
+            inc_first, len(inclusions) - inc_first,
+            mac_first, len(macros) - mac_first
+        ))
+
+    w.records(HDRS, HDRS_FMT, headers)
+    w.array(INCS, INCS_FMT, inclusions)
+    w.records(MCRS, MCRS_FMT, macros)
+    w.array(MARG, MARG_FMT, macro_args)
+
+
+def _pack_device_tree(w, root):
+    string = w.string
+
+    nodes = []
+    lists = []
+
+    # (node, parent index), parent is always before its children
+    stack = [(root, -1)]
+    while stack:
+        node, parent_idx = stack.pop()
+
+        macros_first = len(lists)
+        lists.extend(string(m) for m in node.macros)
+        arches_first = len(lists)
+        lists.extend(string(a) for a in sorted(node.arches))
+
+        idx = len(nodes)
+        nodes.append((
+            string(node.name),
+            parent_idx,
+            macros_first, len(node.macros),
+            arches_first, len(node.arches)
+        ))
+
+        for c in sorted(node.children.values(), key = lambda c : c.name,
+            reverse = True
+        ):
+            stack.append((c, idx))
+
+    w.records(DTRE, DTRE_FMT, nodes)
+    w.array(DTLS, DTLS_FMT, lists)
+
+
+def _unpack_device_tree(r):
+    string = r.string
+    lists = r.array(DTLS, DTLS_FMT)
+
+    def strings(first, count):
+        return list(string(lists[i]) for i in range(first, first + count))
+
+    nodes = []
+    for name, parent_idx, mf, mc, af, ac in r.records(DTRE, DTRE_FMT):
+        node = QType(string(name),
+            parent = None if parent_idx < 0 else nodes[parent_idx],
+            macros = strings(mf, mc),
+            arches = set(strings(af, ac))
+        )
+        nodes.append(node)
+
+    return nodes[0] if nodes else None
+
+
+def _pack_pci_classification(w, pci_c):
+    # Note that an identifier is not always a string. So, the tables are
+    # encoded as values.
+    w.value(PCIS, (
+        list((v.name, v.id) for v in pci_c.vendors.values()),
+        list((d.vendor.name, d.name, d.id) for d in pci_c.devices.values()),
+        list((c.name, c.id) for c in pci_c.classes.values()),
+        pci_c.built
+    ))
+
+
+def _unpack_pci_classification(r):
+    vendors, devices, classes, built = r.value(PCIS)
+    pci_c = PCIClassification(built = built)
+
+    # Like code generated by `PCIClassification.__gen_code__`
+    tmp, PCIId.db = PCIId.db, pci_c
+    try:
+        for args in vendors:
+            PCIVendorId(*args)
+        for args in devices:
+            PCIDeviceId(*args)
+        for args in classes:
+            PCIClassId(*args)
+    finally:
+        PCIId.db = tmp
+
+    return pci_c
+
+
+def save_qvc_file(qvc, file_name):
+    "Saves `QemuVersionCache` `qvc` to binary file."
+
+    w = PackedWriter(QVC_MAGIC, QVC_FORMAT_VERSION)
+
+    has_header_db = qvc.list_headers is not None
+    if has_header_db:
+        _pack_header_db(w, qvc.list_headers)
+
+    has_device_tree = qvc.device_tree is not None
+    if has_device_tree:
+        _pack_device_tree(w, qvc.device_tree)
+
+    _pack_pci_classification(w, qvc.pci_c)
+
+    w.value(MISC, dict(
+        has_header_db = has_header_db,
+        has_device_tree = has_device_tree,
+        known_targets = qvc.known_targets,
+        # raw content of `QVHDict`
+        version_desc = None if qvc.version_desc is None else
+            dict(qvc.version_desc.items())
+    ))
+
+    w.write(file_name)
+
+
+def load_qvc_file(file_name):
+    """ Loads fields of `QemuVersionCache` from binary file. Returns a `dict`
+of its constructor arguments. Header DB is decoded on demand.
+    """
+
+    r = PackedReader(file_name, QVC_MAGIC, QVC_FORMAT_VERSION)
+
+    misc = r.value(MISC)
+
+    return dict(
+        list_headers = HeaderDBView(r) if misc["has_header_db"] else None,
+        device_tree = _unpack_device_tree(r) if misc["has_device_tree"]
+            else None,
+        known_targets = misc["known_targets"],
+        version_desc = misc["version_desc"],
+        pci_classes = _unpack_pci_classification(r)
+    )
+
+
+def load_qvc_header_db(file_name):
+    "Loads only header DB from binary QVC file. It can be `None`."
+
+    r = PackedReader(file_name, QVC_MAGIC, QVC_FORMAT_VERSION)
+
+    if r.value(MISC)["has_header_db"]:
+        return HeaderDBView(r)
+    else:
+        return None
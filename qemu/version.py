@@ -40,11 +40,16 @@ def b(value):
 
 # QEMU Version Heuristic Dictionary
 class QVHDict(dict):
-    def __setitem__(self, key, value):
+    @staticmethod
+    def pack(value):
+        "Returns raw form of the `value` (it's how the value is stored)."
         if callable(value):
-            super(QVHDict, self).__setitem__(key, ("c", value.__name__))
+            return ("c", value.__name__)
         else:
-            super(QVHDict, self).__setitem__(key, ("b", value))
+            return ("b", value)
+
+    def __setitem__(self, key, value):
+        super(QVHDict, self).__setitem__(key, QVHDict.pack(value))
 
     def __getitem__(self, key):
         converter, value = super(QVHDict, self).__getitem__(key)
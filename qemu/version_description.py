@@ -4,6 +4,8 @@ __all__ = [
   , "QVCWasNotInitialized"
   , "BadBuildPath"
   , "QVCIsNotReady"
+  , "QemuVersionCache"
+  , "load_legacy_qvc_file"
   , "QemuVersionDescription"
   , "qvd_get"
   , "qvds_load"
@@ -16,6 +18,9 @@ __all__ = [
 ]
 
 from source import (
+    HDB_HEADER_PATH,
+    HDB_HEADER_INCLUSIONS,
+    HDB_HEADER_MACROS,
     SourceTreeContainer,
     Header,
     Macro
@@ -25,20 +30,23 @@ from common import (
     co_process,
     get_cleaner,
     lazy,
-    CancelledCallee,
-    FailedCallee,
-    fast_repo_clone,
+    git_export_paths,
     fixpath,
-    CommitDesc,
+    path2tuple,
+    co_git_graph,
     mlget as _,
     callco,
     remove_file,
     execfile,
-    pythonize
+    pythonize,
+    PackedFormatError
 )
 from collections import (
     defaultdict
 )
+from itertools import (
+    chain
+)
 from .version import (
     QVHDict,
     initialize_version,
@@ -48,7 +56,10 @@ from .version import (
 )
 from .qom_hierarchy import (
     QType,
-    co_update_device_tree
+    co_build_arch_device_tree,
+    co_fill_children,
+    build_arch_device_tree,
+    find_free_ports
 )
 from os import (
     listdir
@@ -62,7 +73,20 @@ from .pci_ids import (
     PCIId,
     PCIClassification
 )
+from .header_cache import (
+    HeaderParseCache
+)
+from .heuristic_cache import (
+    save_heuristic_cache,
+    load_commit_heuristics
+)
+from .qvc_file import (
+    save_qvc_file,
+    load_qvc_file,
+    load_qvc_header_db
+)
 from git import (
+    GitCommandError,
     Repo
 )
 from six import (
@@ -71,15 +95,22 @@ from six import (
 from shutil import (
     rmtree
 )
-from traceback import (
-    format_exception
+from multiprocessing import (
+    Pool
 )
-from sys import (
-    exc_info
+from time import (
+    time
 )
 
 
 bp_file_name = "build_path_list"
+# Header preprocessing results shared by all QEMU versions.
+header_cache_dir = "qvc_header_cache"
+# Persistent `GitGraph` of QEMU repository (in its Git directory).
+git_graph_file_name = "qdt_git_graph"
+# Heuristic parameters of all commits of QEMU repository (in its Git
+# directory too).
+heuristic_cache_file_name = "qdt_heuristics"
 
 # Two level dict:
 # 1. path (of Qemu Git repo)
@@ -172,9 +203,9 @@ def qvd_get(path, version = None):
         # QVD instead of just created one.
         return qvds.setdefault(qvd.commit_sha, qvd)
 
-def qvd_load_with_cache(build_path, version = None):
+def qvd_load_with_cache(build_path, version = None, jobs = 1):
     qvd = qvd_get(build_path, version = version)
-    qvd.init_cache()
+    qvd.init_cache(jobs = jobs)
     return qvd
 
 def qvds_load():
@@ -196,15 +227,6 @@ def qvds_load_with_cache():
     qvds_load()
     qvds_init_cache()
 
-class QemuCommitDesc(CommitDesc):
-    def __init__(self, sha, parents, children):
-        super(QemuCommitDesc, self).__init__(sha, parents, children)
-
-        # dict of QEMUVersionParameterDescription new_value parameters
-        self.param_nval = {}
-        # dict of QEMUVersionParameterDescription old_value parameters
-        self.param_oval = {}
-
 class QemuVersionCache(object):
     current = None
 
@@ -225,28 +247,66 @@ class QemuVersionCache(object):
         self.pci_c = PCIClassification() if pci_classes is None else pci_classes
 
     def co_computing_parameters(self, repo, version):
+        version = repo.commit(version).hexsha
+
+        qh_hash = calculate_qh_hash()
+        cache_file_name = join(repo.git_dir, heuristic_cache_file_name)
+
+        param = load_commit_heuristics(cache_file_name, qh_hash, version)
+        if param is not None:
+            print("Heuristic parameters were loaded from " + cache_file_name)
+            self.version_desc = QVHDict(param)
+            return
+
         print("Build QEMU Git graph ...")
-        self.commit_desc_nodes = {}
-        yield QemuCommitDesc.co_build_git_graph(repo, self.commit_desc_nodes)
+        self.git_graph = yield co_git_graph(repo,
+            join(repo.git_dir, git_graph_file_name),
+            version = version
+        )
         print("QEMU Git graph was built")
 
+        n = len(self.git_graph)
+        # dicts of QEMUVersionParameterDescription new_value parameters of
+        # commits (by index in the graph)
+        self.param_nval = list({} for __ in range(n))
+        # dicts of QEMUVersionParameterDescription old_value parameters
+        self.param_oval = list({} for __ in range(n))
+
         yield self.co_propagate_param()
 
-        c = self.commit_desc_nodes[repo.commit(version).hexsha]
+        params = []
+        for nval, oval in zip(self.param_nval, self.param_oval):
+            p = dict(nval)
+            p.update(oval)
+            params.append(p)
+
+        yield True
+
+        save_heuristic_cache(cache_file_name, qh_hash, self.git_graph.shas,
+            params
+        )
+
+        c = self.git_graph.index[version]
         param = self.version_desc = QVHDict()
-        for k, v in c.param_nval.items():
+        for k, v in self.param_nval[c].items():
             param[k] = v
-        for k, v in c.param_oval.items():
+        for k, v in self.param_oval[c].items():
             param[k] = v
 
-    def co_propagate_param(self):
-        vd = qemu_heuristic_db
+    def co_propagate_param(self, vd = None):
+        """
+:param vd: heuristic DB, `qemu_heuristic_db` by default.
+        """
+        if vd is None:
+            vd = qemu_heuristic_db
         vd_list = []
 
+        index = self.git_graph.index
+
         unknown_vd_keys = set()
         for k in vd.keys():
-            if k in self.commit_desc_nodes:
-                vd_list.append((k, self.commit_desc_nodes[k].num))
+            if k in index:
+                vd_list.append((k, index[k]))
             else:
                 unknown_vd_keys.add(k)
                 print("WARNING: Unknown SHA1 %s in QEMU heuristic database" % k)
@@ -267,21 +327,25 @@ class QemuVersionCache(object):
         in graph of commits. It must be called before old_value propagation.
 
     :param sorted_vd_keys:
-        keys of qemu_heuristic_db sorted in ascending order by num of
-        QemuCommitDesc. It's necessary to optimize the graph traversal.
+        keys of qemu_heuristic_db sorted in ascending order by index in
+        the Git graph. It's necessary to optimize the graph traversal.
 
     :param vd:
         qemu_heuristic_db
         """
 
+        graph = self.git_graph
+        index = graph.index
+        param_nval = self.param_nval
+
         # iterations to yield
         i2y = QVD_HP_IBY
 
         for key in sorted_vd_keys:
             cur_vd = vd[key]
-            cur_node = self.commit_desc_nodes[key]
+            cur_nval = param_nval[index[key]]
             for vpd in cur_vd:
-                cur_node.param_nval[vpd.name] = vpd.new_value
+                cur_nval[vpd.name] = vpd.new_value
 
             if i2y == 0:
                 yield True
@@ -289,13 +353,13 @@ class QemuVersionCache(object):
             else:
                 i2y -= 1
 
-        # vd_keys_set is used to accelerate propagation
-        vd_keys_set = set(sorted_vd_keys)
+        # vd_nodes is used to accelerate propagation
+        vd_nodes = set(index[key] for key in sorted_vd_keys)
 
         # old_val contains all old_value that are in ancestors
         old_val = {}
         for key in sorted_vd_keys:
-            stack = [self.commit_desc_nodes[key]]
+            stack = [index[key]]
             for vpd in vd[key]:
                 try:
                     old_val[vpd.name].append(vpd.old_value)
@@ -303,24 +367,26 @@ class QemuVersionCache(object):
                     old_val[vpd.name] = [vpd.old_value]
             while stack:
                 cur_node = stack.pop()
-                for c in cur_node.children:
-                    if c.sha in vd_keys_set:
+                cur_nval = param_nval[cur_node]
+                for c in graph.children_of(cur_node):
+                    c_nval = param_nval[c]
+                    if c in vd_nodes:
                         # if the child is vd, only the parameters that are not
                         # in vd's param_nval are added
-                        for p in cur_node.param_nval:
-                            if p not in c.param_nval:
-                                c.param_nval[p] = cur_node.param_nval[p]
+                        for p in cur_nval:
+                            if p not in c_nval:
+                                c_nval[p] = cur_nval[p]
                         # no need to add element to stack, as it's in the sorted_vd_keys
                     else:
                         # the child is't vd
-                        for p in cur_node.param_nval:
-                            if p in c.param_nval:
-                                if cur_node.param_nval[p] != c.param_nval[p]:
+                        for p in cur_nval:
+                            if p in c_nval:
+                                if cur_nval[p] != c_nval[p]:
                                     exc_raise = False
                                     if p in old_val:
-                                        if cur_node.param_nval[p] not in old_val[p]:
-                                            if c.param_nval[p] in old_val[p]:
-                                                c.param_nval[p] = cur_node.param_nval[p]
+                                        if cur_nval[p] not in old_val[p]:
+                                            if c_nval[p] in old_val[p]:
+                                                c_nval[p] = cur_nval[p]
                                                 stack.append(c)
                                             else:
                                                 exc_raise = True
@@ -328,10 +394,10 @@ class QemuVersionCache(object):
                                         exc_raise = True
                                     if exc_raise:
                                         raise Exception("Contradictory definition of param " \
-"'%s' in commit %s (%s != %s)" % (p, c.sha, cur_node.param_nval[p], c.param_nval[p])
+"'%s' in commit %s (%s != %s)" % (p, graph.shas[c], cur_nval[p], c_nval[p])
                                         )
                             else:
-                                c.param_nval[p] = cur_node.param_nval[p]
+                                c_nval[p] = cur_nval[p]
                                 stack.append(c)
 
                 if i2y == 0:
@@ -345,11 +411,11 @@ class QemuVersionCache(object):
         in graph of commits. It must be called after new_value propagation.
 
     :param sorted_vd_keys:
-        keys of qemu_heuristic_db sorted in ascending order by num of
-        QemuCommitDesc. It's necessary to optimize the graph traversal.
+        keys of qemu_heuristic_db sorted in ascending order by index in
+        the Git graph. It's necessary to optimize the graph traversal.
 
     :param unknown_vd_keys:
-        set of keys which are not in commit_desc_nodes.
+        set of keys which are not in the Git graph.
 
     :param vd:
         qemu_heuristic_db
@@ -358,12 +424,17 @@ class QemuVersionCache(object):
         # message for exceptions
         msg = "Conflict with param '%s' in commit %s (old_val (%s) != old_val (%s))"
 
+        graph = self.git_graph
+        index = graph.index
+        param_nval = self.param_nval
+        param_oval = self.param_oval
+
         # iterations to yield
         i2y = QVD_HP_IBY
 
         # Assume unknown SHA1 corresponds to an ancestor of a known node.
         # Therefore, old value must be used for all commits.
-        for commit in self.commit_desc_nodes.values():
+        for commit in range(len(graph)):
             for vd_keys in unknown_vd_keys:
                 self.init_commit_old_val(commit, vd[vd_keys])
 
@@ -372,28 +443,33 @@ class QemuVersionCache(object):
                     yield True
                     i2y = QVD_HP_IBY
 
-        vd_keys_set = set(sorted_vd_keys)
+        # vd_nodes is used to accelerate propagation
+        vd_nodes = set(index[key] for key in sorted_vd_keys)
         visited_vd = set()
         for key in sorted_vd_keys[::-1]:
+            node = index[key]
+
             stack = []
             # used to avoid multiple processing of one node
-            visited_nodes = set([key])
-            visited_vd.add(key)
+            visited_nodes = set([node])
+            visited_vd.add(node)
 
-            node = self.commit_desc_nodes[key]
-            for p in node.parents:
+            node_oval = param_oval[node]
+            for p in graph.parents_of(node):
                 stack.append(p)
 
                 # propagate old_val from node to their parents
-                p.param_oval.update()
-                for param, oval in node.param_oval.items():
+                p_oval = param_oval[p]
+                for param, oval in node_oval.items():
                     try:
-                        other = p.param_oval[param]
+                        other = p_oval[param]
                     except KeyError:
-                        p.param_oval[param] = oval
+                        p_oval[param] = oval
                     else:
                         if other != oval:
-                            raise Exception(msg % (param, p.sha, oval, other))
+                            raise Exception(msg % (
+                                param, graph.shas[p], oval, other
+                            ))
 
                 # init old_val of nodes that consist of vd's parents
                 # and check conflicts
@@ -406,27 +482,32 @@ class QemuVersionCache(object):
 
             while stack:
                 cur_node = stack.pop()
-                visited_nodes.add(cur_node.sha)
+                visited_nodes.add(cur_node)
 
-                for commit in cur_node.parents + cur_node.children:
-                    if commit.sha in visited_nodes:
+                cur_oval = param_oval[cur_node]
+                for commit in chain(graph.parents_of(cur_node),
+                    graph.children_of(cur_node)
+                ):
+                    if commit in visited_nodes:
                         continue
-                    for param_name in cur_node.param_oval:
-                        if param_name in commit.param_nval:
+                    c_nval = param_nval[commit]
+                    c_oval = param_oval[commit]
+                    for param_name in cur_oval:
+                        if param_name in c_nval:
                             continue
-                        elif param_name in commit.param_oval:
-                            if commit.param_oval[param_name] != cur_node.param_oval[param_name]:
+                        elif param_name in c_oval:
+                            if c_oval[param_name] != cur_oval[param_name]:
                                 raise Exception(msg % (
-param_name, commit.sha, commit.param_oval[param_name], cur_node.param_oval[param_name]
+param_name, graph.shas[commit], c_oval[param_name], cur_oval[param_name]
                                 ))
                         else:
-                            commit.param_oval[param_name] = cur_node.param_oval[param_name]
-                            if commit.sha not in vd_keys_set:
+                            c_oval[param_name] = cur_oval[param_name]
+                            if commit not in vd_nodes:
                                 stack.append(commit)
                             # if we have visited vd before, it is necessary
                             # to propagate the param, otherwise we do it
                             # in the following iterations of the outer loop
-                            elif commit.sha in visited_vd:
+                            elif commit in visited_vd:
                                 stack.append(commit)
 
                 i2y -= 1
@@ -435,23 +516,29 @@ param_name, commit.sha, commit.param_oval[param_name], cur_node.param_oval[param
                     i2y = QVD_HP_IBY
 
     def init_commit_old_val(self, commit, vd):
+        """
+:param commit: index of commit in the Git graph.
+        """
         # messages for exceptions
         msg1 = "Conflict with param '%s' in commit %s (old_val (%s) != new_val (%s))"
         msg2 = "Conflict with param '%s' in commit %s (old_val (%s) != old_val (%s))"
 
+        c_nval = self.param_nval[commit]
+        c_oval = self.param_oval[commit]
+
         for param in vd:
-            if param.name in commit.param_nval:
-                if commit.param_nval[param.name] != param.old_value:
+            if param.name in c_nval:
+                if c_nval[param.name] != param.old_value:
                     raise Exception(msg1 % (
-param.name, commit.sha, param.old_value, commit.param_nval[param.name]
+param.name, self.git_graph.shas[commit], param.old_value, c_nval[param.name]
                     ))
-            elif param.name in commit.param_oval:
-                if commit.param_oval[param.name] != param.old_value:
+            elif param.name in c_oval:
+                if c_oval[param.name] != param.old_value:
                     raise Exception(msg2 % (
-param.name, commit.sha, param.old_value, commit.param_oval[param.name]
+param.name, self.git_graph.shas[commit], param.old_value, c_oval[param.name]
                     ))
             else:
-                commit.param_oval[param.name] = param.old_value
+                c_oval[param.name] = param.old_value
 
     __pygen_deps__ = ("pci_c", "device_tree")
 
@@ -465,7 +552,9 @@ param.name, commit.sha, param.old_value, commit.param_oval[param.name]
         gen.pprint(self.known_targets)
 
         gen.gen_field("list_headers = ")
-        gen.pprint(self.list_headers)
+        list_headers = self.list_headers
+        # It can be a view of binary cache file.
+        gen.pprint(None if list_headers is None else list(list_headers))
 
         gen.gen_field("version_desc = ")
         gen.pprint(self.version_desc)
@@ -483,6 +572,29 @@ param.name, commit.sha, param.old_value, commit.param_oval[param.name]
         QemuVersionCache.current = self
         return previous
 
+def load_legacy_qvc_file(file_name):
+    "Loads `QemuVersionCache` from a Python script (legacy QVC format)."
+    variables = {}
+    context = {
+        "QemuVersionCache": QemuVersionCache,
+        "QVHDict": QVHDict
+    }
+
+    import qemu
+    context.update(qemu.__dict__)
+
+    execfile(file_name, context, variables)
+
+    for v in variables.values():
+        if isinstance(v, QemuVersionCache):
+            qvc = v
+            break
+    else:
+        raise Exception("No QemuVersionCache was loaded from %s." % file_name)
+
+    qvc.version_desc = QVHDict(qvc.version_desc)
+    return qvc
+
 class ConfigHost(object):
 
     def __init__(self, config_host_path):
@@ -572,8 +684,8 @@ class QemuVersionDescription(object):
         QemuVersionDescription.current = self
         return previous
 
-    def init_cache(self):
-        callco(self.co_init_cache())
+    def init_cache(self, jobs = 1):
+        callco(self.co_init_cache(jobs = jobs))
 
     def forget_cache(self):
         if self.qvc is None:
@@ -590,65 +702,126 @@ class QemuVersionDescription(object):
             self.qvc = None
             self.qvc_is_ready = False
             remove_file(self.qvc_path)
+            remove_file(self.legacy_qvc_path)
+
+    def export_cache(self, file_name):
+        "Saves the QVC as a Python script (legacy QVC format)."
+        if self.qvc is None:
+            raise QVCWasNotInitialized()
+        pythonize(self.qvc, file_name)
 
     @lazy
     def qvc_file_name(self):
+        return (u"qvc" + QemuVersionDescription.version + u"_" +
+            self.commit_sha + u".qvc"
+        )
+
+    @lazy
+    def legacy_qvc_file_name(self):
+        "Name of QVC file in Python script format used before."
         return (u"qvc" + QemuVersionDescription.version + u"_" +
             self.commit_sha + u".py"
         )
 
-    def co_init_cache(self):
+    def co_init_cache(self, jobs = 1):
+        """
+:param jobs: number of processes for header analysis and device tree
+    extraction.
+        """
         if self.qvc is not None:
             print("Multiple QVC initialization " + self.src_path)
             self.qvc = None
 
         qvc_path = self.qvc_path = join(self.build_path, self.qvc_file_name)
+        self.legacy_qvc_path = join(self.build_path,
+            self.legacy_qvc_file_name
+        )
 
         qemu_heuristic_hash = calculate_qh_hash()
 
         yield True
 
-        if not isfile(qvc_path):
+        if isfile(qvc_path):
+            try:
+                self.load_cache()
+            except PackedFormatError as e:
+                print("Cannot load QVC from %s: %s" % (qvc_path, e))
+                self.qvc = None
+        elif isfile(self.legacy_qvc_path):
+            self.load_legacy_cache()
+            # Convert to current format.
+            save_qvc_file(self.qvc, qvc_path)
+
+        if self.qvc is None:
             self.qvc = QemuVersionCache()
 
-            # Check out Qemu source to a temporary directory and analyze it
+            # Export Qemu headers to a temporary directory and analyze them
             # there. This avoids problems with user changes in main working
             # directory.
+            # Only include paths are exported. Headers are read from Git
+            # object database directly. I.e. the source tree is neither
+            # checked out nor its submodules are initialized.
 
-            print("Checking out temporary source tree...")
+            print("Exporting Qemu headers...")
 
-            # Note. Alternatively, checking out can be performed without
-            # cloning. Instead, a magic might be casted on GIT_DIR and
-            # GIT_WORK_TREE environment variables. But, this approach resets
-            # staged files in src_path repository which can be inconvenient
-            # for a user.
-            # `fast_repo_clone` relies on external library functions which
+            # `git_export_paths` relies on external library functions which
             # grab control for a long time. Hence, we should call it in a
             # dedicated process.
-            tmp_repo = yield co_process(
-                fast_repo_clone,
-                self.repo, self.commit_sha, "qdt-qemu"
+            tmp_work_dir = yield co_process(
+                git_export_paths,
+                self.repo, self.commit_sha,
+                list(path for path, _ in self.include_paths),
+                "qdt-qemu"
             )
-            tmp_work_dir = tmp_repo.working_tree_dir
 
-            # Qemu source tree analysis is too long process and temporary
-            # clone of Qemu is big enough. If the process is terminated, the
-            # clone junks file system. Use `Cleaner`, a dedicated process,
-            # to remove the clone in that case.
+            # Qemu source tree analysis is too long process. If the process
+            # is terminated, the temporary directory junks file system. Use
+            # `Cleaner`, a dedicated process, to remove it in that case.
             clean_work_dir_task = get_cleaner().rmtree(tmp_work_dir)
 
-            print("Temporary source tree: %s" % tmp_work_dir)
+            print("Temporary header tree: %s" % tmp_work_dir)
 
             # make new QVC active and begin construction
             prev_qvc = self.qvc.use()
-            yield Header.co_build_inclusions(tmp_work_dir, self.include_paths)
+
+            parse_cache = HeaderParseCache(self.repo, self.commit_sha,
+                tmp_work_dir, self.include_paths, header_cache_dir
+            )
+
+            base = self.find_base_qvc()
+            if base is not None:
+                base_sha, base_path = base
+                try:
+                    base_headers = load_qvc_header_db(base_path)
+                except PackedFormatError as e:
+                    print("Cannot load QVC from %s: %s" % (base_path, e))
+                    base_headers = None
+            else:
+                base_headers = None
+
+            if base_headers is None:
+                yield Header.co_build_inclusions(tmp_work_dir,
+                    self.include_paths,
+                    jobs = jobs,
+                    parse_cache = parse_cache
+                )
+            else:
+                yield self.co_update_header_db(base_sha, base_headers,
+                    tmp_work_dir,
+                    jobs = jobs,
+                    parse_cache = parse_cache
+                )
+
+            print("Header parse cache: %u hit(s), %u miss(es)" % (
+                parse_cache.hits, parse_cache.misses
+            ))
 
             self.qvc.list_headers = self.qvc.stc.create_header_db()
 
             rmtree(tmp_work_dir)
             get_cleaner().cancel(clean_work_dir_task)
 
-            yield self.co_init_device_tree()
+            yield self.co_init_device_tree(jobs = jobs)
 
             yield self.co_gen_known_targets()
 
@@ -661,16 +834,19 @@ class QemuVersionDescription(object):
 
             yield True
 
-            pythonize(self.qvc, qvc_path)
+            save_qvc_file(self.qvc, qvc_path)
         else:
-            self.load_cache()
             # make just loaded QVC active
             prev_qvc = self.qvc.use()
 
             if self.qvc.list_headers is not None:
                 yield True
 
-                yield self.qvc.stc.co_load_header_db(self.qvc.list_headers)
+                # Most of headers are never used. So, they are loaded on
+                # demand.
+                yield self.qvc.stc.co_load_header_db(self.qvc.list_headers,
+                    lazy = True
+                )
 
             yield True
 
@@ -700,10 +876,10 @@ class QemuVersionDescription(object):
                 has_new_target = True
 
             if has_new_target:
-                yield self.co_init_device_tree(new_targets)
+                yield self.co_init_device_tree(new_targets, jobs = jobs)
 
             if is_outdated or has_new_target:
-                pythonize(self.qvc, qvc_path)
+                save_qvc_file(self.qvc, qvc_path)
 
         yield True
 
@@ -721,31 +897,143 @@ class QemuVersionDescription(object):
 
         self.qvc_is_ready = True
 
-    def load_cache(self):
-        if not isfile(self.qvc_path):
-            raise Exception("%s does not exists." % self.qvc_path)
-        else:
-            print("Loading QVC from " + self.qvc_path)
-            variables = {}
-            context = {
-                "QemuVersionCache": QemuVersionCache,
-                "QVHDict": QVHDict
-            }
+    def find_base_qvc(self):
+        """ Looks for a QVC of an ancestor of the commit. The nearest ancestor
+is preferred. Returns its SHA1 and QVC file name or `None`.
+        """
+        prefix, suffix = self.qvc_file_name.split(self.commit_sha)
 
-            import qemu
-            context.update(qemu.__dict__)
+        best = None
+        for name in listdir(self.build_path):
+            if not (name.startswith(prefix) and name.endswith(suffix)):
+                continue
+            sha = name[len(prefix):-len(suffix)]
+            if sha == self.commit_sha:
+                continue
 
-            execfile(self.qvc_path, context, variables)
+            try:
+                if not self.repo.is_ancestor(sha, self.commit_sha):
+                    continue
+                distance = int(self.repo.git.rev_list("--count",
+                    sha + ".." + self.commit_sha
+                ))
+            except GitCommandError:
+                # the commit is unknown
+                continue
+
+            if best is None or distance < best[0]:
+                best = (distance, sha, join(self.build_path, name))
+
+        if best is None:
+            return None
+
+        print("QVC of ancestor %s is %u commit(s) behind" % (
+            best[1], best[0]
+        ))
+        return best[1:]
+
+    def header_prefix(self, path):
+        """ Converts a path of a file inside Git repository to a path of
+header in the header DB. Returns `None` if the file is not a header or it is
+not inside an include path.
+        """
+        if not path.endswith(".h"):
+            return None
+
+        for include, recursive in self.include_paths:
+            include += "/"
+            if not path.startswith(include):
+                continue
+            prefix = path[len(include):]
+            if not recursive and "/" in prefix:
+                continue
+            return sep.join(prefix.split("/"))
+
+        return None
+
+    def co_update_header_db(self, base_sha, base_headers, work_dir,
+        jobs = 1,
+        parse_cache = None
+    ):
+        """ Builds header DB of current QVC using header DB of an ancestor
+commit. Only headers added and changed since the ancestor are analyzed.
+Macros and inclusions of removed headers are forgotten.
+
+:param base_sha: SHA1 of the ancestor commit.
+:param base_headers: header DB of the ancestor commit.
+:param work_dir: working directory with QEMU source of current commit.
+:param parse_cache: see `Header.co_build_inclusions`.
+        """
+        changed, removed = set(), set()
 
-            for v in variables.values():
-                if isinstance(v, QemuVersionCache):
-                    self.qvc = v
-                    break
+        diffs = self.repo.commit(base_sha).diff(self.commit_sha,
+            paths = list(include for include, _ in self.include_paths)
+        )
+        for d in diffs:
+            if d.change_type in ("D", "R"):
+                prefix = self.header_prefix(d.a_path)
+                if prefix is not None:
+                    removed.add(path2tuple(prefix))
+            if d.change_type != "D":
+                prefix = self.header_prefix(d.b_path)
+                if prefix is not None:
+                    changed.add(path2tuple(prefix))
+
+        # a renamed header may be added back
+        removed -= changed
+
+        print("Updating header DB since %s: %u changed/added, %u removed" % (
+            base_sha, len(changed), len(removed)
+        ))
+
+        yield True
+
+        outdated = changed | removed
+
+        list_headers = []
+        included = set()
+        for dict_h in base_headers:
+            if path2tuple(dict_h[HDB_HEADER_PATH]) in outdated:
+                dict_h[HDB_HEADER_INCLUSIONS] = []
+                dict_h[HDB_HEADER_MACROS] = []
             else:
-                raise Exception(
-"No QemuVersionCache was loaded from %s." % self.qvc_path
+                included.update(
+                    path2tuple(i) for i in dict_h[HDB_HEADER_INCLUSIONS]
                 )
-            self.qvc.version_desc = QVHDict(self.qvc.version_desc)
+            list_headers.append(dict_h)
+
+        # A removed header is still kept if it's included by another one.
+        list_headers = list(dict_h for dict_h in list_headers
+            if not (
+                path2tuple(dict_h[HDB_HEADER_PATH]) in removed
+            and path2tuple(dict_h[HDB_HEADER_PATH]) not in included
+            )
+        )
+
+        yield self.qvc.stc.co_load_header_db(list_headers)
+
+        if changed:
+            yield Header.co_build_inclusions(work_dir, self.include_paths,
+                jobs = jobs,
+                prefixes = list(sep.join(p) for p in changed),
+                parse_cache = parse_cache
+            )
+
+    def load_cache(self):
+        if not isfile(self.qvc_path):
+            raise Exception("%s does not exists." % self.qvc_path)
+
+        print("Loading QVC from " + self.qvc_path)
+        self.qvc = QemuVersionCache(**load_qvc_file(self.qvc_path))
+        self.qvc.version_desc = QVHDict(self.qvc.version_desc)
+
+    def load_legacy_cache(self):
+        "Loads QVC from a Python script (see `export_cache`)."
+        if not isfile(self.legacy_qvc_path):
+            raise Exception("%s does not exists." % self.legacy_qvc_path)
+        else:
+            print("Loading QVC from " + self.legacy_qvc_path)
+            self.qvc = load_legacy_qvc_file(self.legacy_qvc_path)
 
     def co_check_modified_files(self):
         # A diff between the index and the working tree
@@ -812,10 +1100,18 @@ class QemuVersionDescription(object):
         print("Known targets set was made")
         self.qvc.known_targets = kts
 
-    def co_init_device_tree(self, targets = None):
+    def co_init_device_tree(self, targets = None, jobs = 1):
+        """
+:param jobs: number of processes extracting device trees of targets
+    concurrently.
+        """
         if not targets:
             targets = self.softmmu_targets
 
+        # Trees of targets are merged in this order. So, the result does not
+        # depend on the order in which the extractions end.
+        targets = sorted(targets)
+
         yield True
 
         print("Creating Device Tree for " +
@@ -826,49 +1122,70 @@ class QemuVersionDescription(object):
         if root is None:
             root = QType("device")
 
-        arches_count = len(root.arches)
-        for arch in targets:
-            # Try to get QOM tree using binaries from different places.
-            # Installed binary is tried first because in this case Qemu
-            # launched as during normal operation.
-            # However, if user did not install Qemu, we should try to use
-            # binary from build directory.
-            install_dir = join(fixpath(self.config_host.prefix), "bin")
-            build_dir = join(self.build_path, arch + "-softmmu")
+        # Try to get QOM tree using binaries from different places.
+        # Installed binary is tried first because in this case Qemu
+        # launched as during normal operation.
+        # However, if user did not install Qemu, we should try to use
+        # binary from build directory.
+        install_dir = join(fixpath(self.config_host.prefix), "bin")
 
+        # Each gdbserver must listen its own port. Concurrent extractions
+        # cannot look for free ports independently.
+        ports = find_free_ports(2 * len(targets))
+
+        tasks = []
+        for i, arch in enumerate(targets):
             binaries = [
                 join(install_dir, "qemu-system-" + arch),
-                join(build_dir, "qemu-system-" + arch)
+                join(self.build_path, arch + "-softmmu", "qemu-system-" + arch)
             ]
+            tasks.append(
+                (binaries, self.src_path, arch, ports[2 * i:2 * i + 2])
+            )
 
-            message = []
+        arches_count = len(root.arches)
 
-            for qemu_exec in binaries:
-                try:
-                    yield co_update_device_tree(
-                        qemu_exec,
-                        self.src_path,
-                        arch,
-                        root
+        t0 = time()
+
+        if jobs > 1 and len(tasks) > 1:
+            pool = Pool(min(jobs, len(tasks)))
+            try:
+                results = list(
+                    pool.apply_async(build_arch_device_tree, task)
+                        for task in tasks
+                )
+                pool.close()
+
+                for (__, __, arch, __), res in zip(tasks, results):
+                    while not res.ready():
+                        yield False
+
+                    arch_root, message, arch_time = res.get()
+
+                    yield self.co_merge_arch_device_tree(root, arch,
+                        arch_root, message, arch_time
                     )
-                except Exception as e:
-                    message.extend([
-                        "\n",
-                        "Failure for binary '%s':\n" % qemu_exec,
-                        "\n",
-                    ])
-                    if isinstance(e, (CancelledCallee, FailedCallee)):
-                        message.extend(e.callee.traceback_lines)
-                    else:
-                        message.extend(format_exception(*exc_info()))
-                else:
-                    root.arches.add(arch)
-                    # Stop on first successful update.
-                    break
-            else:
-                # All binaries are absent/useless.
-                message.insert(0, "Device Tree for %s isn't created:\n" % arch)
-                print("".join(message))
+
+                pool.join()
+            finally:
+                pool.terminate()
+        else:
+            jobs = 1
+            for task in tasks:
+                arch = task[2]
+                arch_root = QType("device")
+                message = []
+                arch_t0 = time()
+
+                yield co_build_arch_device_tree(*(task + (arch_root, message)))
+
+                yield self.co_merge_arch_device_tree(root, arch, arch_root,
+                    message, time() - arch_t0
+                )
+
+        print("Device Trees of %u target(s) were processed in %.2f sec by %u"
+            " process(es)" % (len(tasks), time() - t0, jobs)
+        )
 
         if not root.children:
             # Device Tree was not built
@@ -889,6 +1206,22 @@ class QemuVersionDescription(object):
         yield self.co_add_dt_macro(self.qvc.device_tree.children, t2m)
         print("Macros were added to device tree")
 
+    def co_merge_arch_device_tree(self, root, arch, arch_root, message,
+        arch_time
+    ):
+        "Merges device tree of `arch` into `root` and reports timing."
+        if arch not in arch_root.arches:
+            print("".join(message))
+            print("Device Tree for %s failed in %.2f sec" % (arch, arch_time))
+            return
+
+        print("Device Tree for %s was extracted in %.2f sec" % (
+            arch, arch_time
+        ))
+
+        yield co_fill_children(arch_root, root, arch)
+        root.arches.add(arch)
+
     def co_text2macros(self, text2macros):
         """
             Creates text-to-macros `text2macros` dictionary.
@@ -901,6 +1234,9 @@ class QemuVersionDescription(object):
         i2y = QVD_DTM_IBY
         print("Building text to macros mapping...")
 
+        # all macros are required
+        yield self.qvc.stc.co_load_lazy_headers()
+
         for t in self.qvc.stc.reg_type.values():
             if i2y == 0:
                 yield True
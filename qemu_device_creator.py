@@ -45,6 +45,15 @@ def main():
         " Overrides project's target_version."
     )
 
+    parser.add_argument(
+        "--jobs", "-j",
+        default = 1,
+        type = int,
+        metavar = "N",
+        help = "Use N processes to analyze QEMU headers during QEMU version"
+        " cache building and to generate sources of devices."
+    )
+
     parser.add_argument(
         "--gen-header-tree",
         default = None,
@@ -52,6 +61,13 @@ def main():
         help = "Output QEMU header inclusion graph in Graphviz format."
     )
 
+    parser.add_argument(
+        "--export-qvc",
+        default = None,
+        metavar = "qvc.py",
+        help = "Export QEMU version cache as a Python script."
+    )
+
     parser.add_argument(
         "--gen-chunk-graphs",
         action = "store_true",
@@ -59,6 +75,13 @@ def main():
         "generated source."
     )
 
+    parser.add_argument(
+        "--incremental", "-i",
+        action = "store_true",
+        help = "Skip descriptions not changed since previous generation."
+        " Files are only written if their content is changed."
+    )
+
     parser.add_argument(
         "script",
         help = "A Python script containing definition of a project to generate."
@@ -66,6 +89,9 @@ def main():
 
     arguments = parser.parse_args()
 
+    if arguments.jobs < 1:
+        parser.error("wrong number of jobs: %s" % arguments.jobs)
+
     script = arguments.script
 
     loaded = dict(qdt.__dict__)
@@ -97,7 +123,10 @@ def main():
         version = getattr(project, "target_version", None)
 
     try:
-        qvd = qvd_load_with_cache(qemu_build_path, version = version)
+        qvd = qvd_load_with_cache(qemu_build_path,
+            version = version,
+            jobs = arguments.jobs
+        )
     except:
         print("QVD loading failed")
         print_exc()
@@ -105,10 +134,15 @@ def main():
 
     qvd.use()
 
+    if arguments.export_qvc is not None:
+        qvd.export_cache(arguments.export_qvc)
+
     if arguments.gen_header_tree is not None:
         qvd.qvc.stc.gen_header_inclusion_dot_file(arguments.gen_header_tree)
 
     project.gen_all(qvd.src_path,
+        jobs = arguments.jobs,
+        incremental = arguments.incremental,
         with_chunk_graph = arguments.gen_chunk_graphs
     )
 
@@ -607,6 +607,14 @@ def main():
         default = DEFAULT_LIMIT,
         help = "limit number of log lines (default %s)" % DEFAULT_LIMIT
     )
+    ap.add_argument("-M", "--memory-limit",
+        metavar = "MiB",
+        type = int,
+        help = "reduce memory usage: do not retain consumed traces and spill "
+            "instructions of translated code cache generations to disk when "
+            "their estimated size exceeds the limit (indices of the cache "
+            "still grow with the log)"
+    )
     # Note, code below assumes that there is at least one log.
     ap.add_argument("qlog", nargs = "+")
 
@@ -616,7 +624,13 @@ def main():
     for qlogFN in args.qlog:
         print("Start feeding of " + qlogFN)
 
-        qlog = QEMULog(qlogFN, int(args.l))
+        if args.memory_limit is None:
+            qlog = QEMULog(qlogFN, int(args.l))
+        else:
+            qlog = QEMULog(qlogFN, int(args.l),
+                streaming = True,
+                memory_limit = args.memory_limit << 20
+            )
 
         qlogs.append(qlog)
 
@@ -17,22 +17,18 @@ from string import (
     ascii_uppercase
 )
 from common import (
-    pypath,
+    PLYGrammar,
     def_tokens
 )
 from six import (
     integer_types
 )
-# PLY is used to parse C constants
-with pypath("..ply"):
-    from ply.lex import lex
-    from ply.yacc import yacc
 
 class CConst(object):
     @staticmethod
     def parse(s):
         try:
-            return parser.parse(s, lexer = lexer)
+            return grammar.parse(s)
         except (QCParserError, QCLexerError):
             return CSTR(s)
 
@@ -93,7 +89,7 @@ class CINT(CConst):
             if value == "":
                 raise ValueError("No integer can be an empty string")
             try:
-                new = parser.parse(value, lexer = lexer)
+                new = grammar.parse(value)
             except (QCParserError, QCLexerError):
                 # an integer may be given by a macro
                 self.v = value
@@ -355,6 +351,5 @@ def p_digits(p):
 
 def_tokens(globals())
 
-# Build lexer and parser
-lexer = lex()
-parser = yacc()
+# PLY is used to parse C constants. Lexer and parser are built on demand.
+grammar = PLYGrammar(__name__)
@@ -3,11 +3,9 @@ __all__ = [
 ]
 
 from common import (
-    pypath,
+    PLYGrammar,
     def_tokens
 )
-with pypath("..ply"):
-    from ply.lex import lex
 
 # escape @ (for C boilerplate generator)
 def t_C_GEN_ESCAPE(t):
@@ -53,10 +51,11 @@ def t_error(t):
 
 def_tokens(globals())
 
-# Build lexer
-lexer = lex()
+# The lexer is built on demand
+grammar = PLYGrammar(__name__)
 
 def str2c(s):
     "Adapts a Python string for both C language and QDT boilerplate generator"
+    lexer = grammar.lexer
     lexer.input(s)
     return '"' + "".join(t.value for t in lexer) + '"'
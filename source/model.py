@@ -42,6 +42,15 @@ __all__ = [
       , "OpaqueChunk"
   , "SourceFile"
   , "SourceTreeContainer"
+  , "HDB_HEADER_PATH"
+  , "HDB_HEADER_IS_GLOBAL"
+  , "HDB_HEADER_INCLUSIONS"
+  , "HDB_HEADER_MACROS"
+  , "HDB_MACRO_NAME"
+  , "HDB_MACRO_TEXT"
+  , "HDB_MACRO_ARGS"
+  , "PP_INCLUDE"
+  , "PP_DEFINE"
   , "TypeReferencesVisitor"
   , "NodeVisitor"
   , "ANC"
@@ -112,6 +121,9 @@ from .tools import (
 from collections import (
     deque
 )
+from multiprocessing import (
+    Pool
+)
 
 
 # List of coding style specific code generation settings.
@@ -695,7 +707,9 @@ class Header(Source):
         self.protection = protection
 
         tpath = path2tuple(path)
-        if tpath in Header.reg:
+        if (tpath in Header.reg
+        or SourceTreeContainer.current._load_lazy_header(tpath)
+        ):
             raise RuntimeError("Header %s is already registered" % path)
 
         Header.reg[tpath] = self
@@ -713,93 +727,190 @@ class Header(Source):
 
     @staticmethod
     def _on_define(definer, macro):
-        # macro is ply.cpp.Macro
+        Header._define_macro(*_macro_event(definer, macro)[1:])
 
-        if "__FILE__" == macro.name:
+    @staticmethod
+    def _define_macro(definer, name, args, text):
+        if "__FILE__" == name:
             return
 
         h = Header[definer]
 
         try:
-            m = Type[macro.name]
+            m = Type[name]
             if not m.definer.path == definer:
                 print("Info: multiple definitions of macro %s in %s and %s" % (
-                    macro.name, m.definer.path, definer
+                    name, m.definer.path, definer
                 ))
         except:
             m = Macro(
-                name = macro.name,
-                args = (
-                    None if macro.arglist is None else list(macro.arglist)
-                ),
-                text = "".join(tok.value for tok in macro.value)
+                name = name,
+                args = args,
+                text = text
             )
             h.add_type(m)
 
     @staticmethod
-    def _build_inclusions(start_dir, prefix, recursive):
+    def _iter_header_files(start_dir, prefix, recursive):
+        "Yields prefixes of headers inside `start_dir`."
         full_name = join(start_dir, prefix)
         if isdir(full_name):
             if not recursive:
                 return
             for entry in listdir(full_name):
-                yield Header._build_inclusions(
+                for h in Header._iter_header_files(
                     start_dir,
                     join(prefix, entry),
                     True
-                )
+                ):
+                    yield h
         else:
             (name, ext) = splitext(prefix)
             if ext == ".h":
-                if path2tuple(prefix) not in Header.reg:
-                    h = Header(path = prefix, is_global = False)
-                    h.parsed = False
-                else:
-                    h = Header[prefix]
+                yield prefix
+
+    @staticmethod
+    def _parse_started(prefix):
+        """ Checks that the header must be parsed and marks it as parsed.
+Headers found as inclusions of other headers are considered parsed.
+        """
+        if path2tuple(prefix) not in Header.reg:
+            h = Header(path = prefix, is_global = False)
+            h.parsed = False
+        else:
+            h = Header[prefix]
 
-                if not h.parsed:
-                    h.parsed = True
-                    print("Info: parsing " + prefix)
+        if h.parsed:
+            return False
 
-                    p = Preprocessor(lex())
-                    p.add_path(start_dir)
+        h.parsed = True
+        print("Info: parsing " + prefix)
+        return True
 
-                    global cpp_search_paths
-                    for path in cpp_search_paths:
-                        p.add_path(path)
+    @staticmethod
+    def _apply_events(events):
+        "Applies events recorded by `_preprocess_header`."
+        for e in events:
+            if e[0] == PP_INCLUDE:
+                Header._on_include(*e[1:])
+            else:
+                Header._define_macro(*e[1:])
 
-                    p.on_include = Header._on_include
-                    p.all_inclusions = True
-                    p.on_define.append(Header._on_define)
+    @staticmethod
+    def _build_inclusions(start_dir, prefix, parse_cache = None):
+        if not Header._parse_started(prefix):
+            return
 
-                    if sys.version_info[0] == 3:
-                        header_input = (
-                            open(full_name, "r", encoding = "UTF-8").read()
-                        )
-                    else:
-                        header_input = (
-                            open(full_name, "rb").read().decode("UTF-8")
-                        )
+        if parse_cache is None:
+            events = None
+        else:
+            events = parse_cache.get(start_dir, prefix)
+            if events is not None:
+                Header._apply_events(events)
+                return
+            events = []
 
-                    p.parse(input = header_input, source = prefix)
+        p = _new_preprocessor(start_dir, cpp_search_paths)
 
-                    yields_per_current_header = 0
+        if events is None:
+            p.on_include = Header._on_include
+            p.on_define.append(Header._on_define)
+        else:
+            # record events for the cache
+            def on_include(*args):
+                events.append((PP_INCLUDE,) + args)
+                Header._on_include(*args)
 
-                    tokens_before_yield = 0
-                    while p.token():
-                        if not tokens_before_yield:
+            def on_define(definer, macro):
+                e = _macro_event(definer, macro)
+                events.append(e)
+                Header._define_macro(*e[1:])
 
-                            yields_per_current_header += 1
+            p.on_include = on_include
+            p.on_define.append(on_define)
 
-                            yield True
-                            tokens_before_yield = 1000 # an adjusted value
-                        else:
-                            tokens_before_yield -= 1
+        p.parse(input = _read_header(join(start_dir, prefix)),
+            source = prefix
+        )
+
+        yields_per_current_header = 0
+
+        tokens_before_yield = 0
+        while p.token():
+            if not tokens_before_yield:
+
+                yields_per_current_header += 1
+
+                yield True
+                tokens_before_yield = 1000 # an adjusted value
+            else:
+                tokens_before_yield -= 1
 
-                    Header.yields_per_header.append(yields_per_current_header)
+        Header.yields_per_header.append(yields_per_current_header)
+
+        if events is not None:
+            parse_cache.put(start_dir, prefix, events)
 
     @staticmethod
-    def co_build_inclusions(work_dir, include_paths):
+    def _co_build_inclusions_parallel(headers, jobs, parse_cache = None):
+        """ Headers are preprocessed by a pool of processes. Preprocessing
+events are then applied in same order as `_build_inclusions` does.
+        """
+        pool = Pool(jobs)
+        try:
+            results = []
+            for start_dir, prefix in headers:
+                if parse_cache is not None:
+                    events = parse_cache.get(start_dir, prefix)
+                    if events is not None:
+                        results.append((True, events))
+                        continue
+
+                results.append((False, pool.apply_async(_preprocess_header,
+                    (start_dir, prefix, cpp_search_paths)
+                )))
+            pool.close()
+
+            for (start_dir, prefix), (cached, res) in zip(headers, results):
+                if cached:
+                    events = res
+                else:
+                    while not res.ready():
+                        yield False
+
+                    # The result must be got anyway to re-raise an exception.
+                    events = res.get()
+
+                    if parse_cache is not None:
+                        parse_cache.put(start_dir, prefix, events)
+
+                if not Header._parse_started(prefix):
+                    continue
+
+                Header._apply_events(events)
+
+                yield True
+
+            pool.join()
+        finally:
+            pool.terminate()
+
+    @staticmethod
+    def co_build_inclusions(work_dir, include_paths,
+        jobs = 1,
+        prefixes = None,
+        parse_cache = None
+    ):
+        """
+:param jobs: number of processes preprocessing headers. If it's greater
+    than 1, then a process pool is used.
+:param prefixes: if given, only headers with those paths are analyzed.
+    Other headers are considered already analyzed.
+:param parse_cache: an object providing preprocessing results (events) of
+    headers analyzed before. It must have methods `get(start_dir, prefix)`,
+    returning `None` if there is no result, and
+    `put(start_dir, prefix, events)`.
+        """
         # Default include search folders should be specified to
         # locate and parse standard headers.
         # parse `cpp -v` output to get actual list of default
@@ -812,13 +923,33 @@ class Header(Source):
         if not isinstance(sys.stdout, ParsePrintFilter):
             sys.stdout = ParsePrintFilter(sys.stdout)
 
-        for h in Header.reg.values():
-            h.parsed = False
+        if prefixes is None:
+            for h in Header.reg.values():
+                h.parsed = False
+        else:
+            prefixes = set(path2tuple(p) for p in prefixes)
+            for tpath, h in Header.reg.items():
+                h.parsed = tpath not in prefixes
 
+        headers = []
         for path, recursive in include_paths:
             dname = join(work_dir, path)
             for entry in listdir(dname):
-                yield Header._build_inclusions(dname, entry, recursive)
+                for prefix in Header._iter_header_files(dname, entry,
+                    recursive
+                ):
+                    if prefixes is None or path2tuple(prefix) in prefixes:
+                        headers.append((dname, prefix))
+
+        if jobs > 1:
+            yield Header._co_build_inclusions_parallel(headers, jobs,
+                parse_cache = parse_cache
+            )
+        else:
+            for start_dir, prefix in headers:
+                yield Header._build_inclusions(start_dir, prefix,
+                    parse_cache = parse_cache
+                )
 
         for h in Header.reg.values():
             del h.parsed
@@ -840,8 +971,12 @@ class Header(Source):
     yields_total / float(len(Header.yields_per_header))
 )
             )
-        else:
+        elif not headers:
             print("Headers not found")
+        else:
+            print("%d headers were preprocessed by %d processes" % (
+                len(headers), jobs
+            ))
 
         del Header.yields_per_header
 
@@ -849,7 +984,9 @@ class Header(Source):
     def lookup(path):
         tpath = path2tuple(path)
 
-        if tpath not in Header.reg:
+        if (tpath not in Header.reg
+        and not SourceTreeContainer.current._load_lazy_header(tpath)
+        ):
             raise RuntimeError("Header with path %s is not registered" % path)
         return Header.reg[tpath]
 
@@ -929,6 +1066,60 @@ transitively includes definer of ref)"""
                         continue
                     Header._propagate_reference(u, ref)
 
+# Preprocessing event kinds, see `_preprocess_header`.
+PP_INCLUDE = "include"
+PP_DEFINE = "define"
+
+
+def _read_header(full_name):
+    if sys.version_info[0] == 3:
+        return open(full_name, "r", encoding = "UTF-8").read()
+    else:
+        return open(full_name, "rb").read().decode("UTF-8")
+
+
+def _new_preprocessor(start_dir, search_paths):
+    p = Preprocessor(lex())
+    p.add_path(start_dir)
+
+    for path in search_paths:
+        p.add_path(path)
+
+    p.all_inclusions = True
+    return p
+
+
+def _macro_event(definer, macro):
+    # macro is ply.cpp.Macro
+    return (PP_DEFINE, definer, macro.name,
+        None if macro.arglist is None else list(macro.arglist),
+        "".join(tok.value for tok in macro.value)
+    )
+
+
+def _preprocess_header(start_dir, prefix, search_paths):
+    """ Preprocesses a header in a worker process. Returns a list of events
+to be applied by `Header._on_include` and `Header._define_macro`.
+    """
+    events = []
+
+    def on_include(includer, inclusion, is_global):
+        events.append((PP_INCLUDE, includer, inclusion, is_global))
+
+    def on_define(definer, macro):
+        events.append(_macro_event(definer, macro))
+
+    p = _new_preprocessor(start_dir, search_paths)
+    p.on_include = on_include
+    p.on_define.append(on_define)
+
+    p.parse(input = _read_header(join(start_dir, prefix)), source = prefix)
+
+    while p.token():
+        pass
+
+    return events
+
 # Type models
 
 
@@ -951,7 +1142,9 @@ class Type(object):
 
     @staticmethod
     def lookup(name):
-        if name not in Type.reg:
+        if (name not in Type.reg
+        and not SourceTreeContainer.current._load_lazy_type(name)
+        ):
             raise TypeNotRegistered("Type with name %s is not registered"
                 % name
             )
@@ -980,7 +1173,9 @@ class Type(object):
             self.name = name
             self.c_name = name.split('.', 1)[0]
 
-            if name in Type.reg:
+            if (name in Type.reg
+            or SourceTreeContainer.current._load_lazy_type(name)
+            ):
                 raise RuntimeError("Type %s is already registered" % name)
 
             Type.reg[name] = self
@@ -2932,6 +3127,114 @@ def sort_chunks(chunks):
     return new_chunks
 
 
+class ChunkReachability(object):
+    """ Transitive closure of `SourceChunk.references` relation. A set of
+chunks reachable from a chunk is kept as a bit set (`int`). It's computed on
+demand and shared by all chunks it passes through. Loops of references
+(allowed for header inclusions) are accounted.
+    """
+
+    def __init__(self):
+        # chunk -> its bit
+        self.bits = {}
+        # chunk -> bit set of reachable chunks
+        self.reach = {}
+
+    def bit(self, chunk):
+        bits = self.bits
+        try:
+            return bits[chunk]
+        except KeyError:
+            b = bits[chunk] = 1 << len(bits)
+            return b
+
+    def after(self, chunk, another):
+        "Same as `chunk.after(another)`."
+        reach = self.reach
+        if chunk not in reach:
+            self._close((chunk,))
+        return bool(reach[chunk] & self.bit(another))
+
+    def remove_dup_chunk(self, ch, ch_remove):
+        """ Updates the closure after `SourceFile.remove_dup_chunk`. Only
+chunks from which `ch_remove` was reachable must be accounted again. `ch` must
+not be after `ch_remove`.
+        """
+        reach = self.reach
+        b = self.bit(ch_remove)
+        for c in [c for c, r in reach.items() if r & b]:
+            del reach[c]
+        reach.pop(ch_remove, None)
+
+    def _close(self, roots):
+        """ Computes `reach` for `roots` and chunks referenced by them
+transitively whose `reach` is not known yet. It's Tarjan's strongly connected
+components algorithm.
+        """
+        reach = self.reach
+        bit = self.bit
+
+        index = {}
+        low = {}
+        scc_stack = []
+        on_stack = set()
+
+        def enter(ch):
+            index[ch] = low[ch] = len(index)
+            scc_stack.append(ch)
+            on_stack.add(ch)
+            return (ch, iter(ch.references))
+
+        for root in roots:
+            if root in reach or root in index:
+                continue
+
+            work = [enter(root)]
+            while work:
+                ch, refs = work[-1]
+                for r in refs:
+                    if r in reach:
+                        continue
+                    if r not in index:
+                        work.append(enter(r))
+                        break
+                    if r in on_stack:
+                        low[ch] = min(low[ch], index[r])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[ch])
+
+                    if low[ch] != index[ch]:
+                        continue
+
+                    # `ch` is the root of a strongly connected component
+                    scc = set()
+                    while True:
+                        c = scc_stack.pop()
+                        on_stack.remove(c)
+                        scc.add(c)
+                        if c is ch:
+                            break
+
+                    scc_bits = 0
+                    bits = 0
+                    looped = len(scc) > 1
+                    for c in scc:
+                        scc_bits |= bit(c)
+                        for r in c.references:
+                            if r in scc:
+                                looped = True
+                            else:
+                                bits |= bit(r) | reach[r]
+                    if looped:
+                        bits |= scc_bits
+
+                    for c in scc:
+                        reach[c] = bits
+
+
 class SourceFile(object):
 
     def __init__(self, origin, protection = True):
@@ -3008,11 +3311,13 @@ digraph Chunks {
 
         w.write("}\n")
 
-    def gen_chunks_gv_file(self, file_name):
+    def gen_chunks_gv(self, w):
         chunks = sort_chunks(OrderedSet(sorted(self.chunks)))
+        self.gen_chunks_graph(w, chunks)
 
+    def gen_chunks_gv_file(self, file_name):
         f = open(file_name, "w")
-        self.gen_chunks_graph(f, chunks)
+        self.gen_chunks_gv(f)
         f.close()
 
     def remove_dup_chunk(self, ch, ch_remove):
@@ -3065,14 +3370,21 @@ digraph Chunks {
         for ch in chunks:
             self.add_chunk(ch)
 
-    def add_chunk(self, chunk):
+    def add_chunk(self, chunk, visited = None):
         if chunk.source is None:
+            # Referenced chunks are often shared. Each is visited once.
+            if visited is None:
+                visited = set()
+            elif chunk in visited:
+                return
+            visited.add(chunk)
+
             self.sort_needed = True
             self.chunks.add(chunk)
 
             # Also add referenced chunks into the source
             for ref in chunk.references:
-                self.add_chunk(ref)
+                self.add_chunk(ref, visited)
         elif not chunk.source == self:
             raise RuntimeError("The chunk %s is already in %s"
                 % (chunk.name, chunk.source.name)
@@ -3089,6 +3401,8 @@ digraph Chunks {
         # Dictionary is used for fast lookup `HeaderInclusion` by `Header`.
         # Assuming only one inclusion per header.
         included_headers = {}
+        # Reverse of `included_headers`: `HeaderInclusion` -> headers
+        inclusion_headers = {}
 
         for ch in self.chunks:
             if isinstance(ch, HeaderInclusion):
@@ -3098,6 +3412,7 @@ digraph Chunks {
                         " before inclusion optimization."
                     )
                 included_headers[h] = ch
+                inclusion_headers[ch] = [h]
                 # Initially, each header provides its inclusion by self.
                 effective_includers[h] = h
 
@@ -3118,6 +3433,9 @@ digraph Chunks {
             reverse = True
         ))
 
+        # Substitution loop checks are frequent.
+        reachability = ChunkReachability()
+
         while stack:
             h = stack.pop()
 
@@ -3154,7 +3472,7 @@ digraph Chunks {
                     # Because of references between headers, inclusion of `s`
                     # can be required by another header inclusion and
                     # (transitively) by the `substitution` itself.
-                    if substitution.after(redundant):
+                    if reachability.after(substitution, redundant):
                         log("%s includes %s but substitution creates loop,"
                             " skipping" % (h_provider.path, s.path)
                         )
@@ -3166,6 +3484,7 @@ digraph Chunks {
                     ))
 
                     self.remove_dup_chunk(substitution, redundant)
+                    reachability.remove_dup_chunk(substitution, redundant)
 
                     # The inclusion of `s` was removed but `s` can include
                     # a header (`hdr`) also included by current file.
@@ -3178,9 +3497,10 @@ digraph Chunks {
                     # there could be several references to `redundant`
                     # inclusion of `s` in `included_headers`. All of them must
                     # be replaced with currently actual inclusion of `h`.
-                    for hdr, chunk in included_headers.items():
-                        if chunk is redundant:
-                            included_headers[hdr] = substitution
+                    moved = inclusion_headers.pop(redundant)
+                    for hdr in moved:
+                        included_headers[hdr] = substitution
+                    inclusion_headers[substitution].extend(moved)
 
                 if s not in effective_includers:
                     stack.append(s)
@@ -3325,6 +3645,13 @@ class SourceTreeContainer(object):
         self.reg_header = {}
         self.reg_type = {}
 
+        # Header DB entries which are not loaded yet (lazy mode of
+        # `co_load_header_db`).
+        # path tuple -> (header DB, index of the entry)
+        self.lazy_headers = {}
+        # macro name -> path tuple of defining header
+        self.lazy_macros = {}
+
         # add preprocessor macros those are always defined
         prev = self.set_cur_stc()
 
@@ -3336,7 +3663,7 @@ class SourceTreeContainer(object):
             prev.set_cur_stc()
 
     def type_lookup(self, name):
-        if name not in self.reg_type:
+        if name not in self.reg_type and not self._load_lazy_type(name):
             raise TypeNotRegistered("Type with name %s is not registered"
                 % name
             )
@@ -3352,11 +3679,13 @@ class SourceTreeContainer(object):
     def header_lookup(self, path):
         tpath = path2tuple(path)
 
-        if tpath not in self.reg_header:
+        if tpath not in self.reg_header and not self._load_lazy_header(tpath):
             raise RuntimeError("Header with path %s is not registered" % path)
         return self.reg_header[tpath]
 
     def gen_header_inclusion_dot_file(self, dot_file_name):
+        self.load_lazy_headers()
+
         dot_writer = open(dot_file_name, "w")
 
         dot_writer.write("""\
@@ -3388,7 +3717,15 @@ digraph HeaderInclusion {
 
         dot_writer.close()
 
-    def co_load_header_db(self, list_headers):
+    def co_load_header_db(self, list_headers, lazy = False):
+        """
+:param lazy: only index the header DB. A header is loaded (with all its
+    inclusions) on first lookup of it or of a macro it defines.
+        """
+        if lazy:
+            yield self._co_index_header_db(list_headers)
+            return
+
         # Create all headers
         for dict_h in list_headers:
             path = dict_h[HDB_HEADER_PATH]
@@ -3415,7 +3752,108 @@ digraph HeaderInclusion {
             for m in dict_h[HDB_HEADER_MACROS]:
                 h.add_type(Macro.new_from_dict(m))
 
+    def _co_index_header_db(self, list_headers):
+        try:
+            index = list_headers.iter_index()
+        except AttributeError:
+            index = ((dict_h[HDB_HEADER_PATH],
+                list(m[HDB_MACRO_NAME] for m in dict_h[HDB_HEADER_MACROS])
+            ) for dict_h in list_headers)
+
+        lazy_headers = self.lazy_headers
+        lazy_macros = self.lazy_macros
+
+        for idx, (path, macros) in enumerate(index):
+            yield
+
+            tpath = path2tuple(path)
+            if tpath in self.reg_header or tpath in lazy_headers:
+                # Check if existing header equals the one from database?
+                continue
+
+            lazy_headers[tpath] = (list_headers, idx)
+            for name in macros:
+                lazy_macros.setdefault(name, tpath)
+
+    def _load_lazy_header(self, tpath):
+        """ Loads the header from lazy header DB together with headers it
+includes (recursively). Returns `False` if there is no such header.
+        """
+        lazy_headers = self.lazy_headers
+        if tpath not in lazy_headers:
+            return False
+
+        # `Header` and `Macro` are registered in current container.
+        prev = self.set_cur_stc()
+        try:
+            self._load_lazy_headers_closure(tpath)
+        finally:
+            if prev is not None:
+                prev.set_cur_stc()
+
+        return True
+
+    def _load_lazy_headers_closure(self, tpath):
+        lazy_headers = self.lazy_headers
+
+        # Headers must be registered before macros because `Macro`
+        # constructor can look a header up.
+        loaded = []
+        stack = [tpath]
+        while stack:
+            try:
+                list_headers, idx = lazy_headers.pop(stack.pop())
+            except KeyError:
+                # already loaded or not in the DB
+                continue
+
+            dict_h = list_headers[idx]
+            h = Header(
+                path = dict_h[HDB_HEADER_PATH],
+                is_global = dict_h[HDB_HEADER_IS_GLOBAL]
+            )
+            loaded.append((h, dict_h))
+
+            stack.extend(map(path2tuple, dict_h[HDB_HEADER_INCLUSIONS]))
+
+        lazy_macros = self.lazy_macros
+
+        for h, dict_h in loaded:
+            for inc in dict_h[HDB_HEADER_INCLUSIONS]:
+                h.add_inclusion(self.header_lookup(inc))
+
+            h_tpath = path2tuple(h.path)
+            for m in dict_h[HDB_HEADER_MACROS]:
+                name = m[HDB_MACRO_NAME]
+                if lazy_macros.get(name, None) == h_tpath:
+                    del lazy_macros[name]
+                h.add_type(Macro.new_from_dict(m))
+
+    def _load_lazy_type(self, name):
+        "Returns `False` if there is no such macro in lazy header DB."
+        try:
+            tpath = self.lazy_macros[name]
+        except KeyError:
+            return False
+
+        self._load_lazy_header(tpath)
+        return name in self.reg_type
+
+    def co_load_lazy_headers(self):
+        "Loads all headers remaining in lazy header DB."
+        lazy_headers = self.lazy_headers
+        while lazy_headers:
+            yield
+            self._load_lazy_header(next(iter(lazy_headers)))
+
+    def load_lazy_headers(self):
+        lazy_headers = self.lazy_headers
+        while lazy_headers:
+            self._load_lazy_header(next(iter(lazy_headers)))
+
     def create_header_db(self):
+        self.load_lazy_headers()
+
         list_headers = []
         for h in self.reg_header.values():
             dict_h = {}
@@ -0,0 +1,198 @@
+from unittest import (
+    TestCase,
+    main
+)
+from common import (
+    CoDispatcher,
+    CoProcessPool,
+    CoReturn,
+    CoTask,
+    CoWait,
+    co_process,
+    FailedCallee,
+    FunctionFailure
+)
+from multiprocessing import (
+    Pipe
+)
+from collections import (
+    deque
+)
+from time import (
+    sleep,
+    time
+)
+
+
+def double(value):
+    return value * 2
+
+
+def slow_double(value):
+    sleep(0.1)
+    return value * 2
+
+
+def fail():
+    raise ValueError("failure")
+
+
+class CoWaitTest(TestCase):
+
+    def setUp(self):
+        self.disp = CoDispatcher()
+        self.results = []
+
+    def test_timeout(self):
+        def co_sleep():
+            t0 = time()
+            ready = yield CoWait(timeout = 0.1)
+            self.results.append((ready, time() - t0))
+
+        self.disp.enqueue(co_sleep())
+        self.disp.dispatch_all()
+
+        (ready, t), = self.results
+        self.assertEqual(ready, [])
+        self.assertGreaterEqual(t, 0.1)
+
+    def test_connection(self):
+        in_, out = Pipe(False)
+
+        def co_reader():
+            ready = yield CoWait(in_)
+            self.results.append((ready, in_.recv()))
+
+        def co_writer():
+            yield CoWait(timeout = 0.05)
+            out.send("data")
+
+        self.disp.enqueue(co_reader())
+        self.disp.enqueue(co_writer())
+        self.disp.dispatch_all()
+
+        self.assertEqual(self.results, [([in_], "data")])
+
+    def test_process(self):
+        def co_caller():
+            res = yield co_process(double, 21)
+            self.results.append(res)
+
+        self.disp.enqueue(co_caller())
+        self.disp.dispatch_all()
+
+        self.assertEqual(self.results, [42])
+
+
+class CoProcessPoolTest(TestCase):
+
+    def setUp(self):
+        self.disp = CoDispatcher()
+        self.pool = CoProcessPool(processes = 2)
+        self.results = []
+
+    def tearDown(self):
+        self.pool.close()
+
+    def co_caller(self, function, *a):
+        try:
+            res = yield self.pool.co_call(function, *a)
+        except FailedCallee as e:
+            failure = e.callee.exception
+            self.assertIsInstance(failure, FunctionFailure)
+            res = failure.args[0]
+        self.results.append(res)
+
+    def test_queue(self):
+        for i in range(5):
+            self.disp.enqueue(self.co_caller(double, i))
+        self.disp.enqueue(self.co_caller(fail))
+        self.disp.dispatch_all()
+
+        self.assertIn(ValueError, self.results)
+        self.results.remove(ValueError)
+        self.assertEqual(sorted(self.results), [0, 2, 4, 6, 8])
+        # workers are reused
+        self.assertEqual(len(self.pool.workers), 2)
+
+    def test_cancel(self):
+        disp = self.disp
+        caller = self.co_caller(slow_double, 1)
+        disp.enqueue(caller)
+        disp.enqueue(self.co_caller(double, 2))
+        disp.enqueue(self.co_caller(double, 3))
+
+        disp.iteration()
+        disp.iteration()
+        disp.remove(caller)
+        disp.dispatch_all()
+
+        self.assertEqual(sorted(self.results), [4, 6])
+        self.assertEqual(self.pool.pending, deque())
+        # the worker running cancelled call is replaced
+        self.assertEqual(set(self.pool.idle), self.pool.workers)
+        for worker in self.pool.workers:
+            self.assertTrue(worker.process.is_alive())
+
+
+class CallTest(TestCase):
+
+    def test_return_without_delay(self):
+        disp = CoDispatcher()
+        results = []
+
+        def co_callee(value):
+            yield True
+            raise CoReturn(value * 2)
+
+        def co_caller():
+            for i in range(5):
+                res = yield co_callee(i)
+                results.append(res)
+
+        disp.enqueue(co_caller())
+        t0 = time()
+        # The caller must resume right after its callee returned rather than
+        # after `delay`.
+        disp.dispatch_all(delay = 1)
+
+        self.assertLess(time() - t0, 1)
+        self.assertEqual(results, [0, 2, 4, 6, 8])
+
+
+class PriorityTest(TestCase):
+
+    def setUp(self):
+        self.disp = CoDispatcher(max_tasks = 1)
+        self.order = []
+
+    def co_step(self, name, callee = None):
+        if callee is not None:
+            yield callee
+        self.order.append(name)
+        yield True
+
+    def test_activation_order(self):
+        disp = self.disp
+        disp.enqueue(CoTask(self.co_step("batch")))
+        disp.enqueue(CoTask(self.co_step("gui"), priority = 1))
+        disp.enqueue(CoTask(self.co_step("batch2")))
+        disp.dispatch_all()
+
+        self.assertEqual(self.order, ["gui", "batch", "batch2"])
+
+    def test_priority_inheritance(self):
+        disp = self.disp
+        callee = CoTask(self.co_step("callee"))
+        disp.enqueue(CoTask(self.co_step("batch")))
+        gui = CoTask(self.co_step("gui", callee = callee), priority = 1)
+        disp.enqueue(gui)
+        disp.dispatch_all()
+
+        self.assertEqual(callee.priority, 1)
+        self.assertEqual(self.order, ["callee", "gui", "batch"])
+        self.assertEqual(gui.iterations, 3)
+
+
+if __name__ == "__main__":
+    main()
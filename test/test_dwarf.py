@@ -0,0 +1,357 @@
+from unittest import (
+    TestCase,
+    main,
+    skipUnless
+)
+from debug import (
+    DWARF_INDEX_SUFFIX,
+    DWARFInfoAccelerator,
+    InMemoryELFFile,
+    MappedELFFile,
+    create_dwarf_cache,
+    dic,
+    dwarf_index,
+    load_dwarf_index,
+    save_dwarf_index
+)
+from subprocess import (
+    PIPE,
+    Popen
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os import (
+    chmod,
+    listdir,
+    makedirs,
+    stat
+)
+from os.path import (
+    join
+)
+
+try:
+    from os import (
+        geteuid
+    )
+except ImportError: # Windows, read-only directories are not checked there
+    def geteuid():
+        return 0
+
+
+SOURCES = {
+    "a.c" : """\
+struct point { int x, y; };
+typedef struct point point_t;
+int counter = 1;
+static int hidden;
+int add(point_t *p)
+{
+    return p->x + p->y + counter + hidden;
+}
+""",
+    "b.c" : """\
+struct point;
+extern int add(struct point *);
+typedef unsigned long word_t;
+word_t words[4];
+int main(void)
+{
+    return (int)words[0];
+}
+"""
+}
+
+# pyelftools supports DWARF up to version 4
+CFLAGS = ["-g", "-gdwarf-4", "-gpubnames", "-O0"]
+
+
+def build_elf(tmp_dir, flags = [], name = "test"):
+    "Compiles `SOURCES` and returns the executable name or `None` on error."
+    c_files = []
+    for c_name, code in sorted(SOURCES.items()):
+        c_file = join(tmp_dir, c_name)
+        with open(c_file, "w") as f:
+            f.write(code)
+        c_files.append(c_file)
+
+    exe = join(tmp_dir, name)
+    try:
+        gcc = Popen(["gcc"] + CFLAGS + flags + ["-o", exe] + c_files,
+            stdout = PIPE,
+            stderr = PIPE
+        )
+    except OSError: # no compiler
+        return None
+    gcc.communicate()
+
+    if gcc.returncode:
+        return None
+    return exe
+
+
+def _gcc_works():
+    tmp_dir = mkdtemp(prefix = "qdt-test-gcc-")
+    try:
+        return build_elf(tmp_dir) is not None
+    finally:
+        rmtree(tmp_dir)
+
+gcc_works = _gcc_works()
+
+TYPE_TAGS = set([
+    "DW_TAG_base_type",
+    "DW_TAG_structure_type",
+    "DW_TAG_typedef"
+])
+
+NAME_TAGS = set([
+    "DW_TAG_subprogram",
+    "DW_TAG_variable"
+])
+
+
+def has_cfi_parsers(di):
+    """ `DWARFInfoAccelerator` requires pyelftools with CFI parser objects
+(see `debug/pyelftools` submodule).
+    """
+    return hasattr(di, "cfi" if di.has_CFI() else "eh_cfi")
+
+
+def attr_value(die, name):
+    attr = die.attributes.get(name, None)
+    return None if attr is None else attr.value
+
+
+@skipUnless(gcc_works, "no working gcc")
+class DWARFIndexTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-dwarf-index-")
+        self.index = None
+        exe = build_elf(self.tmp_dir)
+
+        self.elf = elf = MappedELFFile(exe)
+        self.di = di = elf.get_dwarf_info()
+
+        if not has_cfi_parsers(di):
+            self.tearDown()
+            self.skipTest("pyelftools without CFI parser objects")
+
+        index_file = join(self.tmp_dir, "test.qdtdwi")
+        save_dwarf_index(index_file, "key", DWARFInfoAccelerator(di))
+        self.index = load_dwarf_index(index_file, "key")
+
+    def tearDown(self):
+        if self.index is not None:
+            self.index.close()
+        self.elf.close()
+        rmtree(self.tmp_dir)
+
+    def test_CUs(self):
+        self.assertEqual(list(self.index.iter_CUs()), list(
+            (cu.cu_offset, attr_value(cu.get_top_DIE(), "DW_AT_name"))
+                for cu in self.di.iter_CUs()
+        ))
+
+    def test_cu_offset_at_addr(self):
+        index = self.index
+
+        lowest = None
+        for cu in self.di.iter_CUs():
+            top = cu.get_top_DIE()
+            low = attr_value(top, "DW_AT_low_pc")
+            # DWARF 4 encodes it as a size
+            high = low + attr_value(top, "DW_AT_high_pc")
+
+            for addr in (low, (low + high) // 2, high - 1):
+                self.assertEqual(index.cu_offset_at_addr(addr), cu.cu_offset)
+
+            if lowest is None or low < lowest:
+                lowest = low
+
+        with self.assertRaises(KeyError):
+            index.cu_offset_at_addr(lowest - 1)
+
+    def test_names(self):
+        names, types = {}, {}
+        for cu in self.di.iter_CUs():
+            for die in cu.get_top_DIE().iter_children():
+                name = attr_value(die, "DW_AT_name")
+                if name is None or "DW_AT_declaration" in die.attributes:
+                    continue
+                name = name.decode("utf-8")
+                entry = (cu.cu_offset, die.offset)
+                if die.tag in NAME_TAGS:
+                    names[name] = entry
+                elif die.tag in TYPE_TAGS:
+                    # e.g. `int` is defined in each CU
+                    types.setdefault(name, set()).add(entry)
+
+        pubnames = self.index.pubnames
+        self.assertEqual(len(pubnames), len(names))
+        for name, entry in names.items():
+            self.assertEqual(tuple(pubnames[name]), entry)
+        self.assertIsNone(pubnames["absent"])
+
+        pubtypes = self.index.pubtypes
+        self.assertEqual(len(pubtypes), len(types))
+        for name, entries in types.items():
+            self.assertIn(tuple(pubtypes[name]), entries)
+        self.assertIsNone(pubtypes["absent"])
+
+
+@skipUnless(gcc_works, "no working gcc")
+class DWARFIndexLocationTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tmp_dir = mkdtemp(prefix = "qdt-test-dwarf-location-")
+        self.exec_dir = exec_dir = join(tmp_dir, "bin")
+        makedirs(exec_dir)
+        self.exe = exe = build_elf(exec_dir)
+
+        elf = MappedELFFile(exe)
+        try:
+            supported = has_cfi_parsers(elf.get_dwarf_info())
+        finally:
+            elf.close()
+
+        if not supported:
+            rmtree(tmp_dir)
+            self.skipTest("pyelftools without CFI parser objects")
+
+        self._cache_dir = dwarf_index.dwarf_index_cache_dir
+        self.cache_dir = join(tmp_dir, "cache", "dwarf_index")
+        dwarf_index.dwarf_index_cache_dir = self.cache_dir
+
+        self.builds = 0
+        self._save_dwarf_index = save = dic.save_dwarf_index
+
+        def count_and_save(*a, **kw):
+            self.builds += 1
+            return save(*a, **kw)
+
+        dic.save_dwarf_index = count_and_save
+
+    def tearDown(self):
+        dwarf_index.dwarf_index_cache_dir = self._cache_dir
+        dic.save_dwarf_index = self._save_dwarf_index
+        for dir_name in (self.exec_dir, self.tmp_dir):
+            chmod(dir_name, 0o755)
+        rmtree(self.tmp_dir)
+
+    def open(self):
+        "Returns whether the index is used."
+        cache = create_dwarf_cache(self.exe)
+        ret = cache.index is not None
+        if ret:
+            cache.index.close()
+        return ret
+
+    def index_files(self, dir_name):
+        try:
+            file_names = listdir(dir_name)
+        except OSError:
+            return []
+        return list(
+            join(dir_name, f) for f in file_names
+                if f.endswith(DWARF_INDEX_SUFFIX)
+        )
+
+    def test_exec_dir(self):
+        self.assertFalse(self.open())
+        self.assertEqual(self.index_files(self.exec_dir),
+            [self.exe + DWARF_INDEX_SUFFIX]
+        )
+        self.assertTrue(self.open())
+        self.assertEqual(self.index_files(self.cache_dir), [])
+        self.assertEqual(self.builds, 1)
+
+    @skipUnless(geteuid(), "read-only directories are writable for root")
+    def test_read_only_exec_dir(self):
+        chmod(self.exec_dir, 0o555)
+
+        self.assertFalse(self.open())
+        self.assertEqual(self.index_files(self.exec_dir), [])
+        index_file, = self.index_files(self.cache_dir)
+        mtime = stat(index_file).st_mtime
+
+        # the index is loaded rather than built again
+        self.assertTrue(self.open())
+        self.assertEqual(self.index_files(self.cache_dir), [index_file])
+        self.assertEqual(stat(index_file).st_mtime, mtime)
+        self.assertEqual(self.builds, 1)
+
+    @skipUnless(geteuid(), "read-only directories are writable for root")
+    def test_no_writable_location(self):
+        # the cache directory cannot be created too
+        chmod(self.exec_dir, 0o555)
+        chmod(self.tmp_dir, 0o555)
+
+        # DWARF info is loaded on demand without building the index
+        self.assertFalse(self.open())
+        self.assertFalse(self.open())
+        self.assertEqual(self.builds, 0)
+        self.assertEqual(self.index_files(self.exec_dir), [])
+        self.assertEqual(self.index_files(self.cache_dir), [])
+
+
+def dwarf_tuple(elf):
+    "Returns all DIEs of all CUs with attributes."
+    ret = []
+    for cu in elf.get_dwarf_info().iter_CUs():
+        ret.append((cu.cu_offset, list(
+            (die.offset, die.tag, list(
+                (a.name, a.form, a.value) for a in die.attributes.values()
+            )) for die in cu.iter_DIEs()
+        )))
+    return ret
+
+
+@skipUnless(gcc_works, "no working gcc")
+class ELFFileTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-elf-")
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def check_same_CUs(self, flags):
+        exe = build_elf(self.tmp_dir, flags)
+        if exe is None:
+            self.skipTest("gcc does not support " + " ".join(flags))
+
+        try:
+            in_memory = dwarf_tuple(InMemoryELFFile(exe))
+        except Exception as e:
+            self.skipTest("pyelftools cannot read %s: %s" % (
+                " ".join(flags), e
+            ))
+
+        self.assertTrue(in_memory)
+
+        elf = MappedELFFile(exe)
+        try:
+            self.assertEqual(dwarf_tuple(elf), in_memory)
+        finally:
+            elf.close()
+
+    def test_uncompressed(self):
+        self.check_same_CUs([])
+
+    def test_compressed(self):
+        # SHF_COMPRESSED sections
+        self.check_same_CUs(["-gz"])
+
+    def test_zdebug(self):
+        # legacy `.zdebug_*` sections
+        self.check_same_CUs(["-gz=zlib-gnu"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+from unittest import (
+    TestCase,
+    main
+)
+from qemu import (
+    GenState,
+    SysBusDeviceDescription
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os import (
+    remove
+)
+from os.path import (
+    join
+)
+
+
+class GenStateTest(TestCase):
+
+    def setUp(self):
+        self.src = mkdtemp(prefix = "qdt-test-gen-state-")
+        self.desc = SysBusDeviceDescription(name = "dev", directory = "misc")
+        self.file_name = join(self.src, "dev.c")
+        open(self.file_name, "w").close()
+
+    def tearDown(self):
+        rmtree(self.src)
+
+    def generate(self, env = "env"):
+        state = GenState.load(self.src, env)
+        fp = state.fingerprint(self.desc)
+        actual = state.is_actual(self.desc, fp)
+        state.account(self.desc, fp, ["dev.c"])
+        state.save()
+        return actual
+
+    def test_skip(self):
+        self.assertFalse(self.generate())
+        self.assertTrue(self.generate())
+
+    def test_changes(self):
+        self.generate()
+        self.desc.mmio_num = 1
+        self.assertFalse(self.generate())
+        self.assertTrue(self.generate())
+        self.assertFalse(self.generate(env = "another env"))
+        remove(self.file_name)
+        self.assertFalse(self.generate(env = "another env"))
+
+    def test_unknown_env(self):
+        self.assertFalse(self.generate(env = None))
+        self.assertFalse(self.generate(env = None))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+from unittest import (
+    TestCase,
+    main
+)
+from common import (
+    GitGraph,
+    callco,
+    co_git_graph
+)
+from qemu import (
+    QemuVersionCache
+)
+from qemu.version import (
+    QEMUVersionParameterDescription
+)
+from git import (
+    Actor,
+    Repo
+)
+from array import (
+    array
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os.path import (
+    join
+)
+
+
+AUTHOR = Actor("QDT test", "qdt@example.com")
+
+
+def graph_tuple(graph):
+    return (graph.shas, list(graph.parents_first), list(graph.parents),
+        graph.tips
+    )
+
+
+def new_graph(parents):
+    "Creates `GitGraph` given parent indices of commits."
+    shas = list("%040x" % (i + 1) for i in range(len(parents)))
+    parents_first = array("I", [0])
+    flat_parents = array("I")
+    for commit_parents in parents:
+        flat_parents.extend(commit_parents)
+        parents_first.append(len(flat_parents))
+    return GitGraph(shas, parents_first, flat_parents, [])
+
+
+class GitGraphTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-git-graph-")
+        self.file_name = join(self.tmp_dir, "graph")
+        self.repo = repo = Repo.init(join(self.tmp_dir, "repo"))
+        self.commits = 0
+
+        root = self.commit([])
+        master = self.commit([root])
+        side = self.commit([root])
+        repo.create_head("side", side)
+        merge = self.commit([master, side])
+        repo.create_tag("v1", master)
+        repo.head.reference.commit = merge
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def commit(self, parents):
+        # different messages give different SHA1 to commits with same parents
+        self.commits += 1
+        return self.repo.index.commit("commit %u" % self.commits,
+            parent_commits = parents,
+            head = False,
+            author = AUTHOR,
+            committer = AUTHOR
+        )
+
+    def git_graph(self, **kw):
+        ret = []
+
+        def co_get():
+            graph = yield co_git_graph(self.repo, self.file_name, **kw)
+            ret.append(graph)
+
+        callco(co_get())
+        return ret[0]
+
+    def check_graph(self, graph):
+        repo = self.repo
+
+        self.assertEqual(sorted(graph.shas),
+            sorted(repo.git.rev_list("--all").split())
+        )
+        for i, sha in enumerate(graph.shas):
+            self.assertEqual(graph.index[sha], i)
+
+            parents = graph.parents_of(i)
+            self.assertEqual(list(graph.shas[p] for p in parents),
+                list(p.hexsha for p in repo.commit(sha).parents)
+            )
+            for p in parents:
+                # topological order
+                self.assertLess(p, i)
+                self.assertIn(i, graph.children_of(p))
+
+            for c in graph.children_of(i):
+                self.assertIn(i, graph.parents_of(c))
+
+    def test_build(self):
+        graph = self.git_graph()
+        self.check_graph(graph)
+        self.assertEqual(len(graph), 4)
+
+        # saved
+        self.assertEqual(graph_tuple(GitGraph.load(self.file_name)),
+            graph_tuple(graph)
+        )
+
+    def test_reload(self):
+        graph = self.git_graph()
+
+        # A valid saved graph is loaded rather than built. This one lacks
+        # commits but has actual references.
+        partial = GitGraph(graph.shas[:1], array("I", [0, 0]), array("I"),
+            graph.tips
+        )
+        partial.save(self.file_name)
+        self.assertEqual(graph_tuple(self.git_graph()), graph_tuple(partial))
+
+        # required commit is absent
+        graph = self.git_graph(version = graph.shas[-1])
+        self.check_graph(graph)
+        self.assertEqual(len(graph), 4)
+
+        # references are changed
+        self.repo.create_head("new", self.commit([self.repo.head.commit]))
+        graph = self.git_graph()
+        self.check_graph(graph)
+        self.assertEqual(len(graph), 5)
+
+
+def propagate(graph, vd):
+    "Returns `new_value`s and `old_value`s of parameters of all commits."
+    qvc = QemuVersionCache()
+    qvc.git_graph = graph
+    qvc.param_nval = list({} for __ in range(len(graph)))
+    qvc.param_oval = list({} for __ in range(len(graph)))
+    callco(qvc.co_propagate_param(vd))
+    return qvc.param_nval, qvc.param_oval
+
+
+class ParamPropagationTest(TestCase):
+
+    def setUp(self):
+        #     1 - 3
+        #    /     \
+        #   0       4
+        #    \     /
+        #     2 ---
+        #      \
+        #       5
+        self.graph = new_graph([[], [0], [0], [1], [3, 2], [2]])
+        self.sha = self.graph.shas
+
+    def test_propagation(self):
+        nval, oval = propagate(self.graph, {
+            self.sha[1] : [
+                QEMUVersionParameterDescription("a",
+                    new_value = 1,
+                    old_value = 0
+                )
+            ],
+            self.sha[5] : [
+                QEMUVersionParameterDescription("b",
+                    new_value = "new",
+                    old_value = "old"
+                )
+            ],
+            # unknown commit, its old values are used for all commits
+            "f" * 40 : [
+                QEMUVersionParameterDescription("c", old_value = 2)
+            ]
+        })
+
+        self.assertEqual(nval, [
+            {},
+            { "a" : 1 },
+            {},
+            { "a" : 1 },
+            { "a" : 1 },
+            { "b" : "new" }
+        ])
+        self.assertEqual(oval, [
+            { "a" : 0, "b" : "old", "c" : 2 },
+            { "b" : "old", "c" : 2 },
+            { "a" : 0, "b" : "old", "c" : 2 },
+            { "b" : "old", "c" : 2 },
+            { "b" : "old", "c" : 2 },
+            { "a" : 0, "c" : 2 }
+        ])
+
+    def test_later_value(self):
+        # `a` is changed twice: at 1 and at 3
+        nval, oval = propagate(self.graph, {
+            self.sha[1] : [
+                QEMUVersionParameterDescription("a",
+                    new_value = 1,
+                    old_value = 0
+                )
+            ],
+            self.sha[3] : [
+                QEMUVersionParameterDescription("a",
+                    new_value = 2,
+                    old_value = 1
+                )
+            ]
+        })
+
+        self.assertEqual(list(n.get("a", None) for n in nval),
+            [None, 1, None, 2, 2, None]
+        )
+        self.assertEqual(list(o.get("a", None) for o in oval),
+            [0, None, 0, None, None, 0]
+        )
+
+    def test_vd_commit_barrier(self):
+        # 0 - 1 - 2
+        #  \
+        #   3
+        graph = new_graph([[], [0], [1], [0]])
+        sha = graph.shas
+
+        nval, oval = propagate(graph, {
+            sha[0] : [
+                QEMUVersionParameterDescription("a",
+                    new_value = 2,
+                    old_value = 2
+                )
+            ],
+            sha[2] : [
+                QEMUVersionParameterDescription("b",
+                    new_value = 1,
+                    old_value = 0
+                )
+            ]
+        })
+
+        # Old values are not propagated through a heuristic commit (0) which
+        # is processed later. So, 3 gets no `b`. It's how the propagation
+        # worked before `GitGraph`.
+        self.assertEqual(oval, [{ "b" : 0 }, { "b" : 0 }, {}, {}])
+        self.assertEqual(nval, [
+            { "a" : 2 },
+            { "a" : 2 },
+            { "a" : 2, "b" : 1 },
+            { "a" : 2 }
+        ])
+
+
+if __name__ == "__main__":
+    main()
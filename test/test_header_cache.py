@@ -0,0 +1,208 @@
+from unittest import (
+    TestCase,
+    main,
+    skipUnless
+)
+from source import (
+    HDB_HEADER_PATH,
+    PP_DEFINE,
+    PP_INCLUDE,
+    SourceTreeContainer,
+    Header
+)
+from source.model import (
+    _new_preprocessor
+)
+from common import (
+    callco,
+    git_export_paths
+)
+from qemu import (
+    HeaderParseCache
+)
+from git import (
+    Actor,
+    Repo
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os import (
+    makedirs
+)
+from os.path import (
+    dirname,
+    exists,
+    join
+)
+
+
+AUTHOR = Actor("QDT test", "qdt@example.com")
+
+INCLUDE_PATHS = (("include", True),)
+
+FILES = {
+    "include/a.h" : """\
+#include "b.h"
+#define A B
+""",
+    "include/b.h" : """\
+#define B 1
+""",
+    "include/dir/c.h" : """\
+#define C 2
+""",
+    "include/dir/x.h" : """\
+#include "b.h"
+"""
+}
+
+# preprocessing events of `FILES`
+EVENTS = {
+    "a.h" : [
+        (PP_INCLUDE, "a.h", "b.h", False),
+        (PP_DEFINE, "b.h", "B", None, "1"),
+        (PP_DEFINE, "a.h", "A", None, "B")
+    ],
+    "b.h" : [
+        (PP_DEFINE, "b.h", "B", None, "1")
+    ],
+    "dir/c.h" : [
+        (PP_DEFINE, "dir/c.h", "C", None, "2")
+    ],
+    "dir/x.h" : [
+        (PP_INCLUDE, "dir/x.h", "b.h", False),
+        (PP_DEFINE, "b.h", "B", None, "1")
+    ]
+}
+
+
+def sorted_db(list_headers):
+    return sorted(list_headers, key = lambda dict_h : dict_h[HDB_HEADER_PATH])
+
+
+# Header analysis requires PLY with preprocessor events (see `ply` submodule).
+ply_has_events = hasattr(_new_preprocessor(".", []), "on_define")
+
+
+class HeaderParseCacheTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-header-cache-")
+        self.cache_dir = join(self.tmp_dir, "cache")
+        self.repo = Repo.init(join(self.tmp_dir, "qemu"))
+        self.base_sha = self.commit(FILES)
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def commit(self, files):
+        repo = self.repo
+        for path, content in files.items():
+            file_name = join(repo.working_tree_dir, *path.split("/"))
+            if not exists(dirname(file_name)):
+                makedirs(dirname(file_name))
+            with open(file_name, "w") as f:
+                f.write(content)
+            repo.index.add([path])
+
+        return repo.index.commit("test",
+            author = AUTHOR,
+            committer = AUTHOR
+        ).hexsha
+
+    def cache(self, sha, work_dir = None):
+        if work_dir is None:
+            # the cache does not read files
+            work_dir = self.tmp_dir
+        return HeaderParseCache(self.repo, sha, work_dir, INCLUDE_PATHS,
+            self.cache_dir
+        )
+
+    def test_get_put(self):
+        start_dir = join(self.tmp_dir, "include")
+
+        cache = self.cache(self.base_sha)
+        for prefix in EVENTS:
+            self.assertIsNone(cache.get(start_dir, prefix))
+        for prefix, events in EVENTS.items():
+            cache.put(start_dir, prefix, events)
+
+        # another commit with same headers
+        sha = self.commit({ "include/other.h" : "" })
+        cache = self.cache(sha)
+        for prefix, events in EVENTS.items():
+            self.assertEqual(cache.get(start_dir, prefix), events)
+        self.assertEqual((cache.hits, cache.misses), (len(EVENTS), 0))
+
+        # not tracked header
+        self.assertIsNone(cache.get(start_dir, "none.h"))
+
+    def test_dependency_change(self):
+        start_dir = join(self.tmp_dir, "include")
+
+        cache = self.cache(self.base_sha)
+        for prefix, events in EVENTS.items():
+            cache.put(start_dir, prefix, events)
+
+        # Blob of "a.h" is same but the result depends on "b.h".
+        sha = self.commit({ "include/b.h" : "#define B 3\n" })
+        cache = self.cache(sha)
+
+        self.assertIsNone(cache.get(start_dir, "a.h"))
+        self.assertIsNone(cache.get(start_dir, "b.h"))
+        self.assertEqual(cache.get(start_dir, "dir/c.h"), EVENTS["dir/c.h"])
+        self.assertIsNone(cache.get(start_dir, "dir/x.h"))
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+    def test_new_inclusion_location(self):
+        start_dir = join(self.tmp_dir, "include")
+
+        cache = self.cache(self.base_sha)
+        for prefix, events in EVENTS.items():
+            cache.put(start_dir, prefix, events)
+
+        # "b.h" included by "dir/x.h" is looked up in "dir" first.
+        sha = self.commit({ "include/dir/b.h" : "#define B 4\n" })
+        cache = self.cache(sha)
+
+        self.assertEqual(cache.get(start_dir, "a.h"), EVENTS["a.h"])
+        self.assertIsNone(cache.get(start_dir, "dir/x.h"))
+
+    def build(self, sha, use_cache = True):
+        "Returns header DB and the cache used."
+        work_dir = git_export_paths(self.repo, sha, ["include"], "qdt-test")
+        cache = self.cache(sha, work_dir) if use_cache else None
+
+        stc = SourceTreeContainer()
+        prev = stc.set_cur_stc()
+        try:
+            callco(Header.co_build_inclusions(work_dir, INCLUDE_PATHS,
+                parse_cache = cache
+            ))
+        finally:
+            prev.set_cur_stc()
+            rmtree(work_dir)
+
+        return sorted_db(stc.create_header_db()), cache
+
+    @skipUnless(ply_has_events, "PLY without preprocessor events")
+    def test_reparse(self):
+        db, cache = self.build(self.base_sha)
+        self.assertEqual(cache.hits, 0)
+
+        self.assertEqual(self.build(self.base_sha)[1].misses, 0)
+
+        sha = self.commit({ "include/b.h" : "#define B 3\n" })
+        db, cache = self.build(sha)
+        # Only "dir/c.h" does not depend on "b.h". Headers analyzed as
+        # inclusions are not looked up. So, the number of misses varies.
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(db, self.build(sha, use_cache = False)[0])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+from unittest import (
+    TestCase,
+    main,
+    skipUnless
+)
+from source import (
+    HDB_HEADER_PATH,
+    SourceTreeContainer,
+    Header,
+    Macro,
+    Type
+)
+from source.model import (
+    _new_preprocessor
+)
+from common import (
+    callco,
+    git_export_paths
+)
+from qemu import (
+    QemuVersionCache,
+    QemuVersionDescription,
+    load_qvc_header_db,
+    save_qvc_file
+)
+from git import (
+    Actor,
+    Repo
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os import (
+    makedirs,
+    remove
+)
+from os.path import (
+    dirname,
+    exists,
+    join
+)
+
+
+def sorted_db(list_headers):
+    return sorted(list_headers, key = lambda dict_h : dict_h[HDB_HEADER_PATH])
+
+
+# Header analysis requires PLY with preprocessor events (see `ply` submodule).
+ply_has_events = hasattr(_new_preprocessor(".", []), "on_define")
+
+
+class LazyHeaderDBTest(TestCase):
+
+    def setUp(self):
+        self.prev = SourceTreeContainer().set_cur_stc()
+
+        top = Header("top.h")
+        mid = Header("dir/mid.h")
+        bottom = Header("bottom.h", is_global = True)
+        other = Header("other.h")
+
+        top.add_inclusion(mid)
+        mid.add_inclusion(bottom)
+
+        top.add_type(Macro("TOP"))
+        mid.add_type(Macro("MID", args = ["a", "b"], text = "a + b"))
+        bottom.add_type(Macro("BOTTOM", text = "1"))
+        other.add_type(Macro("OTHER"))
+
+        self.db = SourceTreeContainer.current.create_header_db()
+
+        self.stc = SourceTreeContainer()
+        self.stc.set_cur_stc()
+        callco(self.stc.co_load_header_db(self.db, lazy = True))
+
+    def tearDown(self):
+        self.prev.set_cur_stc()
+
+    def test_macro_lookup(self):
+        self.assertEqual(self.stc.reg_header, {})
+
+        mid = Type["MID"]
+        self.assertEqual(mid.args, ["a", "b"])
+        self.assertIs(mid.definer, Header["dir/mid.h"])
+
+        # inclusions are loaded too
+        self.assertIn(("bottom.h",), self.stc.reg_header)
+        self.assertIn("BOTTOM", Header["dir/mid.h"].types)
+        self.assertNotIn(("top.h",), self.stc.reg_header)
+        self.assertNotIn("OTHER", self.stc.reg_type)
+
+        self.assertFalse(Type.exists("NONE"))
+
+    def test_header_lookup(self):
+        top = Header["top.h"]
+        self.assertIn("BOTTOM", top.types)
+        self.assertIn(top, Header["dir/mid.h"].includers)
+
+        self.assertRaises(RuntimeError, Header, "other.h")
+
+    def test_full_load(self):
+        self.assertEqual(sorted_db(self.stc.create_header_db()),
+            sorted_db(self.db)
+        )
+
+
+HEADERS = {
+    "a.h" : """\
+#ifndef A_H
+#define A_H
+#include "b.h"
+#define A 1
+#define A_ARGS(x, y) ((x) + B)
+#endif
+""",
+    "b.h" : """\
+#define B 2
+#include "dir/c.h"
+""",
+    join("dir", "c.h") : """\
+#include <a.h>
+#define C(x) x
+""",
+    join("dir", "d.h") : """\
+#include "dir/c.h"
+#define D
+#define A 3
+""",
+    "e.h" : """\
+#define E "e"
+"""
+}
+
+
+@skipUnless(ply_has_events, "PLY without preprocessor events")
+class BuildInclusionsTest(TestCase):
+
+    def setUp(self):
+        self.work_dir = mkdtemp(prefix = "qdt-test-header-db-")
+        include = join(self.work_dir, "include")
+        makedirs(join(include, "dir"))
+        for path, content in HEADERS.items():
+            with open(join(include, path), "w") as f:
+                f.write(content)
+
+    def tearDown(self):
+        rmtree(self.work_dir)
+
+    def build(self, jobs):
+        stc = SourceTreeContainer()
+        prev = stc.set_cur_stc()
+        try:
+            callco(Header.co_build_inclusions(self.work_dir,
+                [("include", True)],
+                jobs = jobs
+            ))
+            return stc.create_header_db()
+        finally:
+            prev.set_cur_stc()
+
+    def test_parallel(self):
+        serial = sorted_db(self.build(1))
+        self.assertEqual(len(serial), len(HEADERS))
+        self.assertEqual(sorted_db(self.build(2)), serial)
+
+
+AUTHOR = Actor("QDT test", "qdt@example.com")
+
+BASE_FILES = {
+    "VERSION" : "2.12.0\n",
+    "include/a.h" : """\
+#include "b.h"
+#include "dir/c.h"
+#define A 1
+""",
+    "include/b.h" : """\
+#define B 2
+""",
+    "include/dir/c.h" : """\
+#define C(x) (x)
+""",
+    "include/dir/d.h" : """\
+#include "dir/c.h"
+#define D C(4)
+""",
+    "tcg/t.h" : """\
+#define T 5
+""",
+    # `tcg` is not analyzed recursively
+    "tcg/sub/s.h" : """\
+#define S 6
+"""
+}
+
+# `None` means removal
+CHANGED_FILES = {
+    "include/a.h" : """\
+#include "new.h"
+#include "dir/c.h"
+#define A 10
+#define A2 C(A)
+""",
+    "include/b.h" : None,
+    "include/new.h" : """\
+#define B 20
+""",
+    "tcg/sub/s.h" : """\
+#define S 60
+"""
+}
+
+
+@skipUnless(ply_has_events, "PLY without preprocessor events")
+class UpdateHeaderDBTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-header-db-update-")
+        src = join(self.tmp_dir, "qemu")
+        self.build_path = build_path = join(self.tmp_dir, "build")
+        makedirs(build_path)
+
+        with open(join(build_path, "config-host.mak"), "w") as f:
+            f.write("SRC_PATH=%s\nTARGET_DIRS=arm-softmmu\n" % src)
+
+        self.repo = Repo.init(src)
+        self.base_sha = self.commit(BASE_FILES)
+        self.sha = self.commit(CHANGED_FILES)
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def commit(self, files):
+        repo = self.repo
+        for path, content in files.items():
+            file_name = join(repo.working_tree_dir, *path.split("/"))
+            if content is None:
+                remove(file_name)
+                repo.index.remove([path])
+                continue
+
+            if not exists(dirname(file_name)):
+                makedirs(dirname(file_name))
+            with open(file_name, "w") as f:
+                f.write(content)
+            repo.index.add([path])
+
+        return repo.index.commit("test",
+            author = AUTHOR,
+            committer = AUTHOR
+        ).hexsha
+
+    def co_build(self, qvd, co_builder):
+        "Exports headers of `qvd` and builds header DB of its QVC."
+        work_dir = git_export_paths(self.repo, qvd.commit_sha,
+            list(path for path, _ in qvd.include_paths),
+            "qdt-test"
+        )
+        qvd.qvc = QemuVersionCache()
+        prev = qvd.qvc.stc.set_cur_stc()
+        try:
+            yield co_builder(work_dir)
+        finally:
+            prev.set_cur_stc()
+            rmtree(work_dir)
+
+        qvd.qvc.list_headers = qvd.qvc.stc.create_header_db()
+
+    def build(self, sha):
+        qvd = QemuVersionDescription(self.build_path, version = sha)
+        callco(self.co_build(qvd, lambda work_dir : Header.co_build_inclusions(
+            work_dir, qvd.include_paths
+        )))
+        return qvd
+
+    def test_update(self):
+        base = self.build(self.base_sha)
+        save_qvc_file(base.qvc, join(self.build_path, base.qvc_file_name))
+
+        qvd = QemuVersionDescription(self.build_path, version = self.sha)
+
+        base_sha, base_path = qvd.find_base_qvc()
+        self.assertEqual(base_sha, self.base_sha)
+
+        callco(self.co_build(qvd, lambda work_dir : qvd.co_update_header_db(
+            base_sha, load_qvc_header_db(base_path), work_dir
+        )))
+
+        self.assertEqual(sorted_db(qvd.qvc.list_headers),
+            sorted_db(self.build(self.sha).qvc.list_headers)
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+from unittest import (
+    TestCase,
+    main
+)
+from qemu import (
+    load_commit_heuristics,
+    save_heuristic_cache
+)
+from qemu.version import (
+    QVHDict,
+    calculate_qh_hash
+)
+from binascii import (
+    hexlify,
+    unhexlify
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os.path import (
+    join
+)
+
+
+SHAS = [
+    "11" * 20,
+    "0123456789abcdef0123456789abcdef01234567",
+    "fedcba9876543210fedcba9876543210fedcba98"
+]
+
+PARAMS = [
+    { "a" : 1, "f" : calculate_qh_hash },
+    {},
+    { "a" : 1, "l" : [1, 2], "s" : "str" }
+]
+
+
+class HeuristicCacheTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-heuristic-cache-")
+        self.file_name = join(self.tmp_dir, "heuristics")
+        save_heuristic_cache(self.file_name, "hash", SHAS, PARAMS)
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def load(self, sha, qh_hash = "hash"):
+        return load_commit_heuristics(self.file_name, qh_hash, sha)
+
+    def test_round_trip(self):
+        for sha, params in zip(SHAS, PARAMS):
+            raw = self.load(sha)
+            self.assertEqual(raw,
+                dict((k, QVHDict.pack(v)) for k, v in params.items())
+            )
+
+            qvh = QVHDict(raw)
+            for k, v in params.items():
+                self.assertEqual(qvh[k], v)
+
+    def test_no_parameters(self):
+        save_heuristic_cache(self.file_name, "hash", SHAS[:1], [{}])
+        self.assertEqual(self.load(SHAS[0]), {})
+
+    def test_unknown_commit(self):
+        self.assertIsNone(self.load("22" * 20))
+
+        # This SHA1 is found inside the table but not at a row boundary.
+        raw = b"".join(unhexlify(sha) for sha in SHAS)
+        self.assertIsNone(self.load(hexlify(raw[10:30]).decode("ascii")))
+
+    def test_invalidation(self):
+        # heuristic DB is changed
+        self.assertIsNone(self.load(SHAS[0], qh_hash = "other hash"))
+
+        # not a cache
+        with open(self.file_name, "wb") as f:
+            f.write(b"garbage")
+        self.assertIsNone(self.load(SHAS[0]))
+
+        # no cache
+        self.file_name = join(self.tmp_dir, "none")
+        self.assertIsNone(self.load(SHAS[0]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+from unittest import (
+    TestCase,
+    main
+)
+from common import (
+    PhBox,
+    PhSpatialHash
+)
+from random import (
+    Random
+)
+
+
+class PhSpatialHashTest(TestCase):
+
+    def setUp(self):
+        rnd = Random(0)
+        self.boxes = [
+            PhBox(
+                x = rnd.uniform(-500, 500),
+                y = rnd.uniform(-500, 500),
+                w = rnd.randint(0, 200),
+                h = rnd.randint(0, 200),
+                spacing = rnd.randint(0, 10)
+            ) for _ in range(200)
+        ]
+        self.hash = PhSpatialHash(cell_size = 64)
+        self.hash.sync(self.boxes)
+
+    def check_broad_phase(self):
+        boxes = self.boxes
+        for b in boxes:
+            near = self.hash.near(b)
+            self.assertEqual(near, sorted(near, key = boxes.index))
+            for b1 in boxes:
+                if b.overlaps_box(b1):
+                    self.assertIn(b1, near)
+
+    def test_broad_phase(self):
+        self.check_broad_phase()
+
+    def test_sync(self):
+        boxes = self.boxes
+        for b in boxes[::3]:
+            b.x += 150
+            b.y -= 70
+        removed = boxes.pop(1)
+        boxes.append(PhBox(x = 10, y = 10))
+
+        self.hash.sync(boxes)
+
+        self.check_broad_phase()
+        self.assertNotIn(removed, self.hash.ranges)
+        for cell in self.hash.cells.values():
+            self.assertTrue(cell)
+            self.assertNotIn(removed, cell)
+
+
+if __name__ == "__main__":
+    main()
@@ -27,8 +27,13 @@ from source import (
     Call,
     Pointer,
     Enumeration,
+    HeaderInclusion,
+    SourceFile,
     add_base_types
 )
+from source.model import (
+    ChunkReachability
+)
 from common import (
     ee
 )
@@ -39,6 +44,9 @@ from os.path import (
 from difflib import (
     unified_diff
 )
+from random import (
+    Random
+)
 
 
 MODEL_VERBOSE = ee("MODEL_VERBOSE")
@@ -930,5 +938,80 @@ typedef c *cpointer;
         ]
 
 
+class TestChunkReachability(TestCase):
+
+    def setUp(self):
+        Type.reg = {}
+        Header.reg = {}
+        disable_auto_lock_sources()
+
+        self.sf = SourceFile(Source("test.c"))
+
+    def new_chunks(self, count):
+        chunks = list(HeaderInclusion(Header("h%u.h" % i))
+            for i in range(count)
+        )
+        self.sf.add_chunks(chunks)
+        return chunks
+
+    def check(self, reachability):
+        chunks = list(self.sf.chunks)
+        for a in chunks:
+            for b in chunks:
+                self.assertEqual(reachability.after(a, b), a.after(b),
+                    "%s after %s" % (a.origin.path, b.origin.path)
+                )
+
+    def test_cycle(self):
+        a, b, c, d, e = self.new_chunks(5)
+        a.add_reference(b)
+        b.add_reference(c)
+        c.add_reference(a)
+        d.add_reference(a)
+        e.add_reference(e)
+
+        reachability = ChunkReachability()
+        self.assertTrue(reachability.after(a, a))
+        self.assertTrue(reachability.after(d, c))
+        self.assertFalse(reachability.after(d, d))
+        self.assertFalse(reachability.after(c, d))
+        self.assertTrue(reachability.after(e, e))
+        self.check(reachability)
+
+        # `c` is replaced with `e`. The cycle is broken.
+        self.sf.remove_dup_chunk(e, c)
+        reachability.remove_dup_chunk(e, c)
+        self.assertFalse(reachability.after(a, a))
+        self.assertTrue(reachability.after(d, e))
+        self.check(reachability)
+
+    def test_random(self):
+        rnd = Random(0)
+
+        for __ in range(20):
+            self.setUp()
+            chunks = self.new_chunks(12)
+            for ch in chunks:
+                for r in rnd.sample(chunks, rnd.randint(0, 3)):
+                    ch.add_reference(r)
+
+            reachability = ChunkReachability()
+            self.check(reachability)
+
+            for __ in range(4):
+                chunks = list(self.sf.chunks)
+                pairs = list((ch, ch_remove)
+                    for ch in chunks for ch_remove in chunks
+                    if ch is not ch_remove and not ch.after(ch_remove)
+                )
+                if not pairs:
+                    break
+                ch, ch_remove = rnd.choice(pairs)
+
+                self.sf.remove_dup_chunk(ch, ch_remove)
+                reachability.remove_dup_chunk(ch, ch_remove)
+                self.check(reachability)
+
+
 if __name__ == "__main__":
     main()
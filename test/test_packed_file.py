@@ -0,0 +1,116 @@
+from unittest import (
+    TestCase,
+    main
+)
+from common import (
+    PackedFormatError,
+    PackedWriter,
+    PackedReader,
+    NO_STRING
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os.path import (
+    join
+)
+
+
+MAGIC = b"QDTTEST"
+
+
+class PackedFileTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-packed-file-")
+        self.file_name = join(self.tmp_dir, "packed")
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def test_sections(self):
+        w = PackedWriter(MAGIC, 1)
+        w.records(b"RECS", "<Ii", [
+            (w.string(u"first"), -1),
+            (w.string(None), 2),
+            (w.string(u"\u0444irst"), 3),
+        ])
+        w.array(b"ARRS", "<I", [w.string(u"first"), 42])
+        w.write(self.file_name)
+
+        r = PackedReader(self.file_name, MAGIC, 1)
+
+        recs = r.records(b"RECS", "<Ii")
+        self.assertEqual(len(recs), 3)
+        self.assertEqual(r.string(recs[0][0]), u"first")
+        self.assertEqual(recs[0][1], -1)
+        self.assertEqual(recs[1][0], NO_STRING)
+        self.assertIsNone(r.string(recs[1][0]))
+        self.assertEqual(r.string(recs[-1][0]), u"\u0444irst")
+
+        self.assertEqual(list(r.array(b"ARRS", "<I")), [0, 42])
+
+        self.assertNotIn(b"NONE", r)
+        self.assertRaises(PackedFormatError, r.section, b"NONE")
+
+        r.close()
+
+    def test_value(self):
+        value = {
+            u"none" : None,
+            u"bools" : [True, False],
+            u"numbers" : (1, -1 << 40, 0.5),
+            u"strings" : set([u"a", u"b"]),
+            u"nested" : { 1 : [(u"b", u"value")] }
+        }
+
+        w = PackedWriter(MAGIC, 1)
+        w.value(b"VALS", value)
+        w.write(self.file_name)
+
+        r = PackedReader(self.file_name, MAGIC, 1)
+        self.assertEqual(r.value(b"VALS"), value)
+        r.close()
+
+    def test_format_check(self):
+        PackedWriter(MAGIC, 1).write(self.file_name)
+
+        self.assertRaises(PackedFormatError,
+            PackedReader, self.file_name, MAGIC, 2
+        )
+        self.assertRaises(PackedFormatError,
+            PackedReader, self.file_name, b"QDTOTHER", 1
+        )
+
+        with open(self.file_name, "wb"):
+            pass
+
+        self.assertRaises(PackedFormatError,
+            PackedReader, self.file_name, MAGIC, 1
+        )
+
+    def test_rewrite_mapped(self):
+        w = PackedWriter(MAGIC, 1)
+        w.value(b"VALS", u"old")
+        w.write(self.file_name)
+
+        r = PackedReader(self.file_name, MAGIC, 1)
+
+        w = PackedWriter(MAGIC, 1)
+        w.value(b"VALS", u"new")
+        w.write(self.file_name)
+
+        # previous version is still available to the reader
+        self.assertEqual(r.value(b"VALS"), u"old")
+        r.close()
+
+        r = PackedReader(self.file_name, MAGIC, 1)
+        self.assertEqual(r.value(b"VALS"), u"new")
+        r.close()
+
+
+if __name__ == "__main__":
+    main()
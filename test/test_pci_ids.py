@@ -0,0 +1,65 @@
+from unittest import (
+    TestCase,
+    main
+)
+from qemu import (
+    PCIClassification,
+    PCIDeviceId,
+    PCIId,
+    PCIVendorId
+)
+
+
+class PCIClassificationTest(TestCase):
+
+    def setUp(self):
+        self.saved_db = PCIId.db
+        self.db = PCIId.db = PCIClassification()
+
+        PCIVendorId("INTEL", "0x8086")
+        PCIVendorId("ZERO", "0x0")
+        PCIVendorId("AMD", "0x1022")
+        PCIVendorId("AMD_PRO", "0x1")
+
+    def tearDown(self):
+        PCIId.db = self.saved_db
+
+    def test_vendor_of_device_macro(self):
+        db = self.db
+
+        v, dev = db.vendor_of_device_macro("PCI_DEVICE_ID_INTEL_82441")
+        self.assertIs(v, db.vendors["INTEL"])
+        self.assertEqual(dev, "82441")
+
+        v, dev = db.vendor_of_device_macro("PCI_DEVICE_ID_AMD_PRO_X_Y")
+        self.assertIs(v, db.vendors["AMD_PRO"])
+        self.assertEqual(dev, "X_Y")
+
+        self.assertEqual(
+            db.vendor_of_device_macro("PCI_DEVICE_ID_AMD_"), (None, None)
+        )
+        self.assertEqual(
+            db.vendor_of_device_macro("PCI_DEVICE_ID_NONE_X"), (None, None)
+        )
+
+    def test_uniq_ids(self):
+        db = self.db
+
+        self.assertEqual(db.gen_uniq_vid(), "0x2")
+        PCIVendorId("V2", db.gen_uniq_vid())
+        self.assertEqual(db.gen_uniq_vid(), "0x3")
+
+        PCIDeviceId("INTEL", "A", "0x0")
+        PCIDeviceId("INTEL", "B", "0X1")
+        self.assertEqual(db.gen_uniq_did(), "0x2")
+
+    def test_lookup_by_id(self):
+        db = self.db
+        d = PCIDeviceId("INTEL", "A", "0x100")
+
+        self.assertIs(db.get_vendor(vid = "0X8086"), db.vendors["INTEL"])
+        self.assertIs(db.get_device(did = "256"), d)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,333 @@
+from unittest import (
+    TestCase,
+    main,
+    skipUnless
+)
+from source import (
+    HDB_HEADER_INCLUSIONS,
+    HDB_HEADER_IS_GLOBAL,
+    HDB_HEADER_MACROS,
+    HDB_HEADER_PATH,
+    HDB_MACRO_NAME,
+    SourceTreeContainer,
+    enable_auto_lock_sources
+)
+from common import (
+    callco
+)
+from qemu import (
+    GEN_STATE_FILE_NAME,
+    MachineDescription,
+    QProject,
+    SysBusDeviceDescription,
+    project
+)
+from qemu.project import (
+    get_start_method
+)
+from qemu.version import (
+    get_vp,
+    initialize_version,
+    qemu_heuristic_db
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os import (
+    makedirs,
+    stat,
+    utime,
+    walk
+)
+from os.path import (
+    isdir,
+    join,
+    relpath
+)
+
+
+# Headers (with macros) looked up by type definers and by generators of
+# `devices` and `machine`. It's a small part of the QEMU header DB.
+HEADERS = {
+    "byteswap.h" : [],
+    "chardev/char-fe.h" : [],
+    "disas/dis-asm.h" : [],
+    "disas/disas.h" : [],
+    "exec/address-spaces.h" : [],
+    "exec/cpu-defs.h" : [],
+    "exec/cpu_ldst.h" : [],
+    "exec/exec-all.h" : [],
+    "exec/gdbstub.h" : [],
+    "exec/gen-icount.h" : [],
+    "exec/hwaddr.h" : ["HWADDR_PRIx"],
+    "exec/ioport.h" : [],
+    "exec/log.h" : [],
+    "exec/memory.h" : [],
+    "hw/block/flash.h" : [],
+    "hw/boards.h" : ["MACHINE_CLASS", "MACHINE_TYPE_NAME", "TYPE_MACHINE"],
+    "hw/dma/i8257.h" : [],
+    "hw/ide/ahci.h" : [],
+    "hw/ide/internal.h" : [],
+    "hw/irq.h" : [],
+    "hw/isa/isa.h" : [],
+    "hw/pci/msi.h" : [],
+    "hw/pci/pci.h" : [],
+    "hw/pci/pci_bus.h" : [],
+    "hw/pci/pci_host.h" : [],
+    "hw/qdev-core.h" : ["DEFINE_PROP_END_OF_LIST", "DEVICE"],
+    "hw/qdev-properties.h" : ["DEFINE_PROP_CHR", "DEFINE_PROP_DRIVE"],
+    "hw/sysbus.h" : ["TYPE_SYS_BUS_DEVICE"],
+    "migration/vmstate.h" : ["VMSTATE_END_OF_LIST", "VMSTATE_TIMER_PTR"],
+    "net/net.h" : [],
+    "qapi/error.h" : [],
+    "qapi/qapi-types-net.h" : [],
+    "qemu/bswap.h" : [],
+    "qemu/log.h" : [],
+    "qemu/main-loop.h" : [],
+    "qemu/module.h" : ["type_init"],
+    "qemu/osdep.h" : ["PRIx64"],
+    "qemu/timer.h" : [],
+    "qemu/typedefs.h" : [],
+    "qom/cpu.h" : [],
+    "qom/object.h" : [],
+    "stdbool.h" : [],
+    "stddef.h" : [],
+    "stdint.h" : [],
+    "stdio.h" : [],
+    "stdlib.h" : [],
+    "string.h" : [],
+    "sysemu/block-backend.h" : [],
+    "sysemu/reset.h" : [],
+    "tcg-op.h" : [],
+    "tcg.h" : []
+}
+
+GLOBAL_HEADERS = set([
+    "stdbool.h",
+    "stddef.h",
+    "stdint.h",
+    "stdio.h",
+    "stdlib.h",
+    "string.h"
+])
+
+
+def header_db():
+    return list({
+        HDB_HEADER_PATH : path,
+        HDB_HEADER_IS_GLOBAL : path in GLOBAL_HEADERS,
+        HDB_HEADER_INCLUSIONS : [],
+        HDB_HEADER_MACROS : list({ HDB_MACRO_NAME : m } for m in macros)
+    } for path, macros in sorted(HEADERS.items()))
+
+
+def devices():
+    # Two devices share a directory. So, both write same `Makefile.objs`.
+    return [
+        SysBusDeviceDescription(
+            name = "a",
+            directory = "misc",
+            mmio_num = 2,
+            out_irq_num = 1,
+            timer_num = 1
+        ),
+        SysBusDeviceDescription(
+            name = "b",
+            directory = "char",
+            pio_num = 1,
+            char_num = 1
+        ),
+        SysBusDeviceDescription(
+            name = "c",
+            directory = "misc",
+            in_irq_num = 2,
+            block_num = 1
+        )
+    ]
+
+
+def machine():
+    return MachineDescription(name = "m", directory = "core")
+
+
+def tree_content(root):
+    "Returns relative paths of all files in `root` mapped to their content."
+    ret = {}
+    for dir_name, __, file_names in walk(root):
+        for file_name in file_names:
+            full_name = join(dir_name, file_name)
+            with open(full_name, "rb") as f:
+                ret[relpath(full_name, root)] = f.read()
+    return ret
+
+
+# A file written by a generation gets a new modification time.
+OLD_MTIME = 1000000
+
+
+def make_old(root):
+    "Sets `OLD_MTIME` for all files in `root`."
+    for path in tree_content(root):
+        utime(join(root, path), (OLD_MTIME, OLD_MTIME))
+
+
+def new_files(root):
+    "Returns relative paths of files in `root` modified after `make_old`."
+    return set(
+        path for path in tree_content(root)
+            if stat(join(root, path)).st_mtime != OLD_MTIME
+    )
+
+
+class GenerationTestHelper(object):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-project-")
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def generate(self, name, descriptions, **gen_kw):
+        """ Generates `descriptions` into `name` sub-directory in a new
+environment and returns the tree.
+        """
+        src = join(self.tmp_dir, name)
+        if not isdir(src):
+            makedirs(join(src, "hw"))
+            open(join(src, "hw", "Makefile.objs"), "w").close()
+
+        # Generation changes the models. So, each run gets own models.
+        stc = SourceTreeContainer()
+        prev = stc.set_cur_stc()
+        try:
+            # QEMU headers are locked like during QVC loading. Other tests may
+            # leave auto locking disabled.
+            enable_auto_lock_sources()
+            callco(stc.co_load_header_db(header_db(), lazy = True))
+
+            vp = {}
+            for params in qemu_heuristic_db.values():
+                for param in params:
+                    vp[param.name] = param.new_value
+            initialize_version(vp)
+            get_vp("qemu types definer")()
+            get_vp("msi_init type definer")()
+
+            callco(QProject(descriptions).co_gen_all(src, **gen_kw))
+        finally:
+            prev.set_cur_stc()
+
+        return tree_content(src)
+
+
+@skipUnless(get_start_method() == "fork", "workers do not fork")
+class ParallelGenerationTest(GenerationTestHelper, TestCase):
+
+    def test_same_output(self):
+        serial = self.generate("jobs1", devices(), jobs = 1)
+        # a header and a module per device
+        self.assertEqual(
+            len(list(p for p in serial if p.endswith((".c", ".h")))),
+            2 * len(devices())
+        )
+        self.assertEqual(self.generate("jobs2", devices(), jobs = 2), serial)
+
+
+class IncrementalGenerationTest(GenerationTestHelper, TestCase):
+
+    def setUp(self):
+        super(IncrementalGenerationTest, self).setUp()
+        self.src = join(self.tmp_dir, "src")
+        self.rendered = []
+
+        # Without a loaded QVC the environment is unknown and everything is
+        # generated. So, it's fixed.
+        self._gen_environment = project.gen_environment
+        project.gen_environment = lambda **gen_cfg : "env"
+
+        self._render_source = render_source = project.render_source
+
+        def render_and_account(s, *a, **kw):
+            self.rendered.append(s.path)
+            return render_source(s, *a, **kw)
+
+        project.render_source = render_and_account
+
+    def tearDown(self):
+        project.gen_environment = self._gen_environment
+        project.render_source = self._render_source
+        super(IncrementalGenerationTest, self).tearDown()
+
+    def generate(self, descriptions, incremental = True):
+        del self.rendered[:]
+        make_old(self.src)
+        return super(IncrementalGenerationTest, self).generate("src",
+            descriptions,
+            incremental = incremental
+        )
+
+    def check_rendered(self, *paths):
+        self.assertEqual(sorted(self.rendered), sorted(paths))
+
+    def test_unchanged(self):
+        first = self.generate(devices())
+        self.assertIn(GEN_STATE_FILE_NAME, first)
+        self.assertEqual(len(self.rendered), 2 * len(devices()))
+
+        # nothing is rendered and written
+        self.assertEqual(self.generate(devices()), first)
+        self.check_rendered()
+        self.assertEqual(new_files(self.src), set([GEN_STATE_FILE_NAME]))
+
+        # everything is rendered but unchanged files are not written
+        self.assertEqual(self.generate(devices(), incremental = False), first)
+        self.assertEqual(len(self.rendered), 2 * len(devices()))
+        self.assertEqual(new_files(self.src), set())
+
+    def test_changed_device(self):
+        first = self.generate(devices())
+
+        descriptions = devices()
+        descriptions[1].pio_num = 2
+        second = self.generate(descriptions)
+
+        # only the device is rendered and only its files are changed
+        self.check_rendered("hw/char/b.c", "include/hw/char/b.h")
+        changed = set(
+            path for path, content in second.items()
+                if first.get(path) != content
+        )
+        self.assertIn("hw/char/b.c", changed)
+        self.assertLessEqual(changed, set([
+            "hw/char/b.c",
+            "include/hw/char/b.h",
+            GEN_STATE_FILE_NAME
+        ]))
+        self.assertEqual(new_files(self.src), changed)
+
+    def test_machine(self):
+        first = self.generate(devices() + [machine()])
+        self.generate(devices() + [machine()])
+        self.check_rendered()
+
+        # The machine depends on all devices. So, all devices are rendered
+        # to generate it.
+        descriptions = devices()
+        descriptions[1].pio_num = 2
+        second = self.generate(descriptions + [machine()])
+
+        self.check_rendered(*(
+            path for path in first if path.endswith((".c", ".h"))
+        ))
+
+        self.assertEqual(new_files(self.src), set(
+            path for path, content in second.items()
+                if first.get(path) != content
+        ))
+
+
+if __name__ == "__main__":
+    main()
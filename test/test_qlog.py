@@ -0,0 +1,172 @@
+from unittest import (
+    TestCase,
+    main
+)
+from qemu import (
+    InInstr,
+    QEMULog,
+    TBCache,
+    TBSpill
+)
+from random import (
+    Random
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os.path import (
+    join
+)
+
+
+def instr(addr, size = 4, tb = 0):
+    i = InInstr("0x%08x:  insn_%x" % (addr, addr))
+    i.size = size
+    i.tb = tb
+    return i
+
+
+class TBCacheTest(TestCase):
+
+    def setUp(self):
+        self.c0 = c0 = TBCache(None)
+        c0.commit(instr(0x1000))
+        c0.commit(instr(0x1008))
+        c0.add_tb(0x1000, 0)
+
+        self.c1 = c1 = TBCache(c0)
+        c1.commit(instr(0x1002))
+        c1.add_tb(0x1002, 1)
+        c1.add_link(1, 0)
+
+    def test_overlaps(self):
+        c0 = self.c0
+        self.assertTrue(c0.overlaps(0x1000, 1))
+        self.assertTrue(c0.overlaps(0x1003, 1))
+        self.assertTrue(c0.overlaps(0x1006, 4))
+        self.assertFalse(c0.overlaps(0x1004, 4))
+        self.assertFalse(c0.overlaps(0x100C, 4))
+        self.assertFalse(c0.overlaps(0x0FFC, 4))
+
+    def test_versioned_lookup(self):
+        c0, c1 = self.c0, self.c1
+
+        i, c = c1.lookInstrDown(0x1002)
+        self.assertEqual((i.addr, c), (0x1002, c1))
+        # not overwritten instructions are looked up in backing cache
+        i, c = c1.lookInstrDown(0x1008)
+        self.assertEqual((i.addr, c), (0x1008, c0))
+
+        self.assertIsNone(c0.lookInstrDown(0x1002))
+        self.assertIsNone(c1.lookInstrDown(0x1004))
+
+        self.assertEqual(c1.lookTBDown(0x1000), (0, c0))
+        self.assertIsNone(c0.lookTBDown(0x1002))
+
+        self.assertEqual(c1.lookLinkDown(1), (0, c1))
+        self.assertIsNone(c0.lookLinkDown(1))
+
+
+class TBSpillTest(TestCase):
+
+    def test_identity(self):
+        c0 = TBCache(None)
+        held = instr(0x1000)
+        c0.commit(held)
+        c0.commit(instr(0x1004))
+        c0.compact()
+
+        spill = TBSpill(loaded_limit = 1)
+        spill.put(c0)
+
+        i = c0.lookInstrDown(0x1000)[0]
+        self.assertIs(i, held)
+        self.assertEqual(c0.lookInstrDown(0x1004)[0].addr, 0x1004)
+
+        # other generation pushes `c0` out of loaded ones
+        c1 = TBCache(c0)
+        c1.commit(instr(0x2000))
+        c1.compact()
+        spill.put(c1)
+        self.assertEqual(c1.lookInstrDown(0x2000)[0].addr, 0x2000)
+
+        self.assertIs(c0.lookInstrDown(0x1000)[0], held)
+        spill.close()
+
+
+def write_log(file_name, seed, steps = 600):
+    "Writes a random log with translations, overwrites, linking and traces."
+    rnd = Random(seed)
+    tbs = []
+
+    with open(file_name, "w") as f:
+        for step in range(steps):
+            r = rnd.random()
+            if r < 0.3 or not tbs:
+                addr = 0x1000 + rnd.randrange(32) * 8
+                f.write("IN: \n")
+                for k in range(rnd.randint(1, 4)):
+                    f.write("0x%08x:  insn_%u_%u\n" % (addr + k * 4, step, k))
+                f.write("\n")
+                tbs.append(addr)
+            elif r < 0.45:
+                f.write("Linking TBs 0x7f0000000000 [%08x] index 0 -> "
+                    "0x7f0000000100 [%08x]\n" % (
+                        rnd.choice(tbs), rnd.choice(tbs)
+                    )
+                )
+            else:
+                f.write("Trace 0: 0x7f0000000000 [00000000/%08x/00000000/"
+                    "00000000] \n" % rnd.choice(tbs)
+                )
+
+
+def log_tuple(qlog):
+    return list(
+        (i.addr, i.size, i.tb, i.first, str(i),
+            None if i.trace is None else str(i.trace)
+        ) for i in qlog.iter_instructions()
+    )
+
+
+# as in qlv.py
+LIMIT = 1000000
+
+
+class QEMULogTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-qlog-")
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def test_streaming(self):
+        for seed in range(4):
+            file_name = join(self.tmp_dir, "qemu%u.log" % seed)
+            write_log(file_name, seed)
+
+            normal = log_tuple(QEMULog(file_name, LIMIT))
+            self.assertTrue(normal)
+
+            self.assertEqual(
+                log_tuple(QEMULog(file_name, LIMIT, streaming = True)),
+                normal
+            )
+
+            # all retired generations are spilled
+            qlog = QEMULog(file_name, LIMIT,
+                streaming = True,
+                memory_limit = 0
+            )
+            self.assertEqual(log_tuple(qlog), normal)
+            self.assertIsNotNone(qlog.spill)
+            self.assertFalse(qlog.compacted)
+            qlog.spill.close()
+
+
+if __name__ == "__main__":
+    main()
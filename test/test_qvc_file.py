@@ -0,0 +1,155 @@
+from unittest import (
+    TestCase,
+    main
+)
+from source import (
+    HDB_HEADER_PATH,
+    SourceTreeContainer,
+    Header,
+    Macro
+)
+from common import (
+    pythonize
+)
+from qemu import (
+    PCIClassId,
+    PCIClassification,
+    PCIDeviceId,
+    PCIId,
+    PCIVendorId,
+    QemuVersionCache,
+    QType,
+    load_legacy_qvc_file,
+    load_qvc_file,
+    save_qvc_file
+)
+from qemu.version import (
+    QVHDict
+)
+from tempfile import (
+    mkdtemp
+)
+from shutil import (
+    rmtree
+)
+from os.path import (
+    join
+)
+
+
+def sorted_db(list_headers):
+    return sorted(list_headers, key = lambda dict_h : dict_h[HDB_HEADER_PATH])
+
+
+def tree_tuple(node):
+    return (
+        node.name,
+        list(node.macros),
+        sorted(node.arches),
+        sorted(tree_tuple(c) for c in node.children.values())
+    )
+
+
+def pci_tables(pci_c):
+    return (
+        sorted((v.name, v.id) for v in pci_c.vendors.values()),
+        sorted((k, d.vendor.name, d.name, d.id)
+            for k, d in pci_c.devices.items()
+        ),
+        sorted((c.name, c.id) for c in pci_c.classes.values()),
+        pci_c.built
+    )
+
+
+class QVCFileTest(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp(prefix = "qdt-test-qvc-file-")
+
+        prev_stc = SourceTreeContainer().set_cur_stc()
+        try:
+            top = Header("top.h")
+            bottom = Header("dir/bottom.h", is_global = True)
+            top.add_inclusion(bottom)
+            top.add_type(Macro("TOP"))
+            bottom.add_type(Macro("BOTTOM", args = ["a"], text = "(a)"))
+            list_headers = SourceTreeContainer.current.create_header_db()
+        finally:
+            prev_stc.set_cur_stc()
+
+        root = QType("device")
+        QType("sys-bus-device",
+            parent = root,
+            macros = ["TYPE_SYS_BUS_DEVICE"],
+            arches = set(["arm", "i386"])
+        )
+        QType("pci-device", parent = root, macros = ["TYPE_PCI_DEVICE"])
+
+        pci_c = PCIClassification(built = True)
+        prev_db, PCIId.db = PCIId.db, pci_c
+        try:
+            PCIVendorId("INTEL", "0x8086")
+            PCIDeviceId("INTEL", "82441", "0x1237")
+            PCIDeviceId("AMD", "LANCE", "0x2000")
+            PCIClassId("BRIDGE_HOST", "0x0600")
+        finally:
+            PCIId.db = prev_db
+
+        version_desc = QVHDict()
+        version_desc["qh_hash"] = "0123456789abcdef"
+        version_desc["machine_init_params"] = 2
+
+        self.qvc = QemuVersionCache(
+            list_headers = list_headers,
+            device_tree = root,
+            known_targets = { "arm" : ["arm-softmmu"] },
+            version_desc = version_desc,
+            pci_classes = pci_c
+        )
+
+    def tearDown(self):
+        rmtree(self.tmp_dir)
+
+    def check_loaded(self, kw):
+        qvc = self.qvc
+
+        self.assertEqual(sorted_db(kw["list_headers"]),
+            sorted_db(qvc.list_headers)
+        )
+        self.assertEqual(tree_tuple(kw["device_tree"]),
+            tree_tuple(qvc.device_tree)
+        )
+        self.assertEqual(kw["known_targets"], qvc.known_targets)
+        self.assertEqual(QVHDict(kw["version_desc"]), qvc.version_desc)
+        self.assertEqual(pci_tables(kw["pci_classes"]), pci_tables(qvc.pci_c))
+
+    def test_round_trip(self):
+        file_name = join(self.tmp_dir, "qvc.qvc")
+        save_qvc_file(self.qvc, file_name)
+        self.check_loaded(load_qvc_file(file_name))
+
+    def test_empty(self):
+        file_name = join(self.tmp_dir, "empty.qvc")
+        save_qvc_file(QemuVersionCache(), file_name)
+        kw = load_qvc_file(file_name)
+
+        self.assertIsNone(kw["list_headers"])
+        self.assertIsNone(kw["device_tree"])
+        self.assertEqual(pci_tables(kw["pci_classes"]),
+            pci_tables(PCIClassification())
+        )
+
+    def test_legacy_conversion(self):
+        legacy_file_name = join(self.tmp_dir, "qvc.py")
+        pythonize(self.qvc, legacy_file_name)
+
+        # as `QemuVersionDescription.co_init_cache` does
+        qvc = load_legacy_qvc_file(legacy_file_name)
+        file_name = join(self.tmp_dir, "qvc.qvc")
+        save_qvc_file(qvc, file_name)
+
+        self.check_loaded(load_qvc_file(file_name))
+
+
+if __name__ == "__main__":
+    main()
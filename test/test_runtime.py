@@ -0,0 +1,126 @@
+from unittest import (
+    TestCase,
+    main
+)
+from debug import (
+    Runtime
+)
+
+
+class FakeTarget(object):
+    "Emulates memory access of `pyrsp.rsp.RemoteTarget`."
+
+    registers = ["r0", "pc"]
+    pc_reg = "pc"
+    arch = dict(bitsize = 32, endian = False)
+
+    def __init__(self, start, memory, short = False):
+        self.start = start
+        self.memory = memory
+        # reading beyond the memory returns available bytes, not an error
+        self.short = short
+        self.requests = []
+
+    def dump(self, size, addr):
+        self.requests.append((addr, size))
+
+        offset = addr - self.start
+        memory = self.memory
+        if offset < 0 or offset + size > len(memory):
+            if self.short and 0 <= offset < len(memory):
+                return memory[offset:]
+            raise RuntimeError("Cannot read 0x%x bytes at 0x%x" % (size, addr))
+        return memory[offset:offset + size]
+
+
+START = 0x1000
+# not aligned to blocks
+MEMORY = bytes(bytearray(i & 0xFF for i in range(0x108)))
+
+
+class ReadMemoryTest(TestCase):
+
+    def setUp(self):
+        self.target = FakeTarget(START, MEMORY)
+        self.rt = Runtime(self.target, None, mem_block_size = 0x10)
+
+    def read(self, addr, size):
+        data = self.rt.read_memory(addr, size)
+        self.assertEqual(data, MEMORY[addr - START:addr - START + size])
+
+    def check_requests(self, *requests):
+        self.assertEqual(self.target.requests, list(requests))
+        del self.target.requests[:]
+
+    def test_blocks(self):
+        self.read(0x1004, 8)
+        self.check_requests((0x1000, 0x10))
+
+        # cached
+        self.read(0x1008, 4)
+        self.read(0x1000, 0x10)
+        self.check_requests()
+
+        # only absent block is read
+        self.read(0x100C, 8)
+        self.check_requests((0x1010, 0x10))
+
+        # adjacent absent blocks are read by one request per run
+        self.read(0x1030, 1)
+        self.check_requests((0x1030, 0x10))
+        self.read(0x1024, 0x30)
+        self.check_requests((0x1020, 0x10), (0x1040, 0x20))
+        self.read(0x1000, 0x60)
+        self.check_requests()
+
+    def test_failing_read_ahead(self):
+        # the block exceeds the memory
+        self.read(0x1100, 4)
+        self.check_requests((0x1100, 0x10), (0x1100, 4))
+
+        # nothing is cached
+        self.read(0x1102, 2)
+        self.check_requests((0x1100, 0x10), (0x1102, 2))
+
+        # a run of blocks fails as a whole
+        self.read(0x10F8, 0x10)
+        self.check_requests((0x10F0, 0x20), (0x10F8, 0x10))
+
+        # the block before is read and cached normally
+        self.read(0x10F0, 0x10)
+        self.check_requests((0x10F0, 0x10))
+        self.read(0x10F4, 4)
+        self.check_requests()
+
+    def test_short_read_ahead(self):
+        self.target.short = True
+
+        self.read(0x1104, 4)
+        self.check_requests((0x1100, 0x10), (0x1104, 4))
+
+        self.read(0x1104, 4)
+        self.check_requests((0x1100, 0x10), (0x1104, 4))
+
+    def test_on_resume(self):
+        self.read(0x1000, 4)
+        self.check_requests((0x1000, 0x10))
+
+        # the target changes the memory while running
+        self.target.memory = memory = MEMORY[::-1]
+        self.rt.on_resume()
+        self.assertFalse(self.rt.mem_cache)
+
+        self.assertEqual(self.rt.read_memory(0x1000, 4), memory[:4])
+        self.check_requests((0x1000, 0x10))
+
+    def test_no_cache(self):
+        self.rt.mem_block_size = 0
+
+        self.read(0x1004, 4)
+        self.read(0x1004, 4)
+        self.check_requests((0x1004, 4), (0x1004, 4))
+        self.assertFalse(self.rt.mem_cache)
+
+
+if __name__ == "__main__":
+    main()
@@ -46,10 +46,12 @@ from os.path import (
     splitext
 )
 from common import (
+    PRIORITY_GUI,
     bidict,
     find_empty_aabb,
     PhBox,
     PhCircle,
+    PhSpatialHash,
     Vector,
     Segment,
     Polygon,
@@ -479,6 +481,12 @@ class MachineDiagramWidget(CanvasDnD, TkPopupHelper):
 
         self.current_ph_iteration = None
 
+        # Broad phase of collision detection. Spacing of lines is ignored.
+        self.ph_box_hash = PhSpatialHash()
+        self.ph_bus_hash = PhSpatialHash(spaced = False)
+        self.ph_conn_hash = PhSpatialHash(spaced = False)
+        self.ph_circle_hash = PhSpatialHash()
+
         self.var_physical_layout = BooleanVar()
         self.var_physical_layout.trace_variable("w",
             self.on_var_physical_layout)
@@ -2558,8 +2566,26 @@ IRQ line creation
 
         nbl = self.nodes + self.buslabels
 
+        box_hash = self.ph_box_hash
+        bus_hash = self.ph_bus_hash
+        conn_hash = self.ph_conn_hash
+        circle_hash = self.ph_circle_hash
+
+        box_hash.sync(nbl)
+        bus_hash.sync(self.buses)
+        conn_hash.sync(self.conns)
+        circle_hash.sync(self.circles)
+
+        yield
+
+        box_order = box_hash.order
+
         for idx, n in enumerate(nbl):
-            for n1 in nbl[idx + 1:]:
+            for n1 in box_hash.near(n):
+                # each pair is handled once
+                if box_order[n1] <= idx:
+                    continue
+
                 if not n.overlaps_box(n1):
                     continue
 
@@ -2619,7 +2645,7 @@ IRQ line creation
 
             yield
 
-            for b in self.buses:
+            for b in bus_hash.near(n):
                 if not n.touches_vline(b):
                     continue
 
@@ -2647,7 +2673,7 @@ IRQ line creation
 
             yield
 
-            for c in self.conns:
+            for c in conn_hash.near(n):
                 if n.conn == c:
                     continue
 
@@ -2667,7 +2693,7 @@ IRQ line creation
 
             yield
 
-            for hub in self.circles:
+            for hub in circle_hash.near(n):
                 if not hub.overlaps_box(n):
                     continue
 
@@ -2716,8 +2742,13 @@ IRQ line creation
 
             yield
 
+        circle_order = circle_hash.order
+
         for idx, h in enumerate(self.circles):
-            for h1 in self.circles[idx + 1:]:
+            for h1 in circle_hash.near(h):
+                if circle_order[h1] <= idx:
+                    continue
+
                 # if (bool(isinstance(h1, IRQPathCircle))
                 #  != bool(isinstance(h, IRQPathCircle))
                 # ):
@@ -3016,6 +3047,8 @@ IRQ line creation
         else:
             self._ph_run = self.co_ph_task()
             self.task_manager.enqueue(self._ph_run)
+            # the layout is animated while a user edits the diagram
+            self.task_manager.set_priority(self._ph_run, PRIORITY_GUI)
 
     def ph_is_running(self):
         return "_ph_run" in self.__dict__
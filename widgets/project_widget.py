@@ -21,6 +21,7 @@ from six.moves.tkinter import (
     PanedWindow
 )
 from common import (
+    PRIORITY_BACKGROUND,
     CoTask,
     mlget as _
 )
@@ -71,7 +72,8 @@ class ReloadBuildPathTask(CoTask):
         CoTask.__init__(
             self,
             self.main(),
-            description = _("QVD loading")
+            description = _("QVD loading"),
+            priority = PRIORITY_BACKGROUND
         )
 
     def main(self):